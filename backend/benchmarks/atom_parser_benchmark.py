@@ -0,0 +1,135 @@
+"""
+Compare the tree-based and streaming arXiv Atom feed parsers.
+
+Builds a synthetic feed with the shape of an arXiv API response and parses
+it with each parser in a fresh subprocess, reporting entries/sec and the
+peak RSS of that process. Run from the backend directory:
+
+    python -m benchmarks.atom_parser_benchmark --entries 20000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+from modules.api import AtomFeedParser
+
+NAMESPACE = {'atom': 'http://www.w3.org/2005/Atom',
+             'arxiv': 'http://arxiv.org/schemas/atom',
+             'opensearch': 'http://a9.com/-/spec/opensearch/1.1/'}
+
+ENTRY = """  <entry>
+    <id>http://arxiv.org/abs/2411.{index:05d}v1</id>
+    <updated>2024-11-14T18:59:59Z</updated>
+    <published>2024-11-14T18:59:59Z</published>
+    <title>Synthetic paper {index} on stellar
+      rotation and magnetic activity</title>
+    <summary>  {abstract}
+</summary>
+{authors}
+    <arxiv:comment xmlns:arxiv="http://arxiv.org/schemas/atom">12 pages, 8 figures</arxiv:comment>
+    <link href="http://arxiv.org/abs/2411.{index:05d}v1" rel="alternate" type="text/html"/>
+    <link title="pdf" href="http://arxiv.org/pdf/2411.{index:05d}v1" rel="related" type="application/pdf"/>
+    <arxiv:primary_category xmlns:arxiv="http://arxiv.org/schemas/atom" term="astro-ph.SR" scheme="http://arxiv.org/schemas/atom"/>
+    <category term="astro-ph.SR" scheme="http://arxiv.org/schemas/atom"/>
+  </entry>
+"""
+
+
+def write_fixture(path: str, entries: int) -> None:
+    """Write a feed with `entries` entries, each with a ~1.5kB abstract and several authors."""
+    abstract = ("We present observations of rotation periods and activity cycles in a sample of "
+                "solar-type stars and compare them with dynamo models.\n") * 10
+    authors = "\n".join(f"    <author>\n      <name>Author {i}</name>\n    </author>" for i in range(6))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<feed xmlns="http://www.w3.org/2005/Atom">\n')
+        f.write('  <title type="html">ArXiv Query: search_query=cat:astro-ph.SR</title>\n')
+        f.write(f'  <opensearch:totalResults xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">'
+                f'{entries}</opensearch:totalResults>\n')
+        for index in range(entries):
+            f.write(ENTRY.format(index=index, abstract=abstract, authors=authors))
+        f.write('</feed>\n')
+
+
+def tree_parse(path: str) -> int:
+    """The previous implementation: read the whole body, build the tree, find() per field."""
+    with open(path, 'rb') as f:
+        response_data = f.read()
+    root = ET.fromstring(response_data)
+    papers = []
+    for entry in root.findall('atom:entry', NAMESPACE):
+        papers.append({
+            'id': entry.find('atom:id', NAMESPACE).text,
+            'title': entry.find('atom:title', NAMESPACE).text.strip().replace('\n', ' '),
+            'authors': [author.find('atom:name', NAMESPACE).text for author in entry.findall('atom:author', NAMESPACE)],
+            'published': entry.find('atom:published', NAMESPACE).text,
+            'abstract': entry.find('atom:summary', NAMESPACE).text.strip().replace('\n', ' '),
+            'link': entry.find('atom:id', NAMESPACE).text,
+            'primary_category': entry.find('arxiv:primary_category', NAMESPACE).attrib['term']
+        })
+    return len(papers)
+
+
+def stream_parse(path: str) -> int:
+    # papers are consumed one at a time, as a harvest would
+    count = 0
+    with open(path, 'rb') as f:
+        for _ in AtomFeedParser(f):
+            count += 1
+    return count
+
+
+PARSERS = {'tree': tree_parse, 'stream': stream_parse}
+
+
+def run_one(name: str, path: str) -> None:
+    """Subprocess body: parse once and print the measurements as JSON."""
+    start = time.perf_counter()
+    entries = PARSERS[name](path)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in kB on Linux
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'entries': entries, 'seconds': elapsed, 'peak_rss_kb': peak_rss_kb}))
+
+
+def measure(name: str, path: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.atom_parser_benchmark", "--run", name, "--fixture", path],
+        check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    print(f"{name:<7} {result['entries']:>7} entries in {result['seconds']:6.2f}s  -> "
+          f"{result['entries'] / result['seconds']:9.0f} entries/sec, peak RSS {result['peak_rss_kb'] / 1024:7.1f} MB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=20000, help="Entries in the synthetic feed")
+    parser.add_argument("--run", choices=sorted(PARSERS), help=argparse.SUPPRESS)
+    parser.add_argument("--fixture", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_one(args.run, args.fixture)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "feed.xml")
+        write_fixture(path, args.entries)
+        print(f"fixture: {args.entries} entries, {os.path.getsize(path) / 1024 ** 2:.1f} MB")
+
+        before = measure("tree", path)
+        after = measure("stream", path)
+    print(f"throughput: {(after['entries'] / after['seconds']) / (before['entries'] / before['seconds']):.2f}x, "
+          f"peak RSS: {after['peak_rss_kb'] / before['peak_rss_kb']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
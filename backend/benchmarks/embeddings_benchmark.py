@@ -0,0 +1,70 @@
+"""
+Compare per-chunk and batched embedding throughput of EmbeddingsManager.
+
+Run from the backend directory:
+
+    python -m benchmarks.embeddings_benchmark --documents 20 --batch-size 64
+"""
+import argparse
+import json
+import tempfile
+import time
+
+from modules.embeddings import EmbeddingsManager
+
+
+def load_documents(path: str, count: int, repeat: int):
+    """Build synthetic paper texts from the stored abstracts."""
+    with open(path, 'r', encoding='utf-8') as f:
+        papers = json.load(f)
+    abstracts = [paper['abstract'] for paper in papers]
+    documents = []
+    for i in range(count):
+        text = "\n\n".join(abstracts[(i + j) % len(abstracts)] for j in range(repeat))
+        documents.append((text, f"http://arxiv.org/abs/bench.{i:05d}v1"))
+    return documents
+
+
+def per_chunk(manager: EmbeddingsManager, documents) -> int:
+    """The previous implementation: one encode call and one list per chunk."""
+    total = 0
+    for text, _ in documents:
+        for chunk in manager.text_splitter.split_text(text):
+            manager.model.encode(chunk).tolist()
+            total += 1
+    return total
+
+
+def batched(manager: EmbeddingsManager, documents) -> int:
+    return sum(len(data["chunks"]) for data in manager.create_embeddings_batch(documents))
+
+
+def measure(name: str, func, manager, documents):
+    start = time.perf_counter()
+    chunks = func(manager, documents)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<10} {chunks:>6} chunks in {elapsed:7.2f}s  -> {chunks / elapsed:8.1f} chunks/sec")
+    return chunks / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", default="./data/results.json", help="Papers used to build the synthetic corpus")
+    parser.add_argument("--documents", type=int, default=20, help="Number of synthetic documents")
+    parser.add_argument("--repeat", type=int, default=30, help="Abstracts concatenated per document")
+    parser.add_argument("--batch-size", type=int, default=64, help="Batch size of the batched path")
+    args = parser.parse_args()
+
+    documents = load_documents(args.results, args.documents, args.repeat)
+    with tempfile.TemporaryDirectory() as path:
+        manager = EmbeddingsManager(path=path, batch_size=args.batch_size)
+        # warm up the model so the first measurement isn't penalised
+        manager.encode(["warm up"])
+
+        before = measure("per-chunk", per_chunk, manager, documents)
+        after = measure("batched", batched, manager, documents)
+    print(f"speedup: {after / before:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Measure BM25 query latency of the lexical index on a large synthetic corpus.
+
+Builds (or reuses) an index of `--chunks` chunks of ~500 characters drawn
+from a Zipf-distributed vocabulary, sprinkled with catalog identifiers and
+instrument names, then times a mix of identifier, topical and common-word
+queries. Run from the backend directory:
+
+    python -m benchmarks.lexical_index_benchmark --chunks 1000000
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from modules.lexical import LexicalIndex
+
+COMMON = ("the of and in to a we is for that with are on by this as at from be an which our these it "
+          "star stars stellar model data observed observations results mass using two than between").split()
+INSTRUMENTS = ["TESS", "Kepler", "Gaia", "JWST", "HARPS", "ESPRESSO", "ALMA", "LAMOST", "APOGEE", "SDSS"]
+
+QUERIES = [
+    "KIC 8462852 dimming",
+    "TESS light curve of TIC 25155310",
+    "HARPS radial velocity of HD 209458",
+    "rotation period gyrochronology",
+    "what do the observations of the stars show",
+    "Gaia DR3 parallax of Gaia 4295806720",
+    "magnetic activity cycle in solar-type stars",
+    "the mass of the star",
+    # long-tail words of the synthetic vocabulary, from ~1500 matching chunks down to ~150
+    "term5000",
+    "term20000 term30000 term45000",
+    "stellar term8000 term12000 KIC",
+]
+
+
+def build(index: LexicalIndex, chunks: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    vocabulary = COMMON + [f"term{i}" for i in range(50000)]
+    # Zipf-like weights: the common words dominate, the long tail is rare
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(vocabulary))))
+    per_doc = 40
+    start = time.perf_counter()
+    for doc in range(chunks // per_doc):
+        texts = []
+        for _ in range(per_doc):
+            words = rng.choices(vocabulary, cum_weights=cum_weights, k=80)
+            if rng.random() < 0.3:
+                words.insert(rng.randrange(len(words)), rng.choice(INSTRUMENTS))
+            if rng.random() < 0.2:
+                words.insert(rng.randrange(len(words)), f"KIC {rng.randrange(10 ** 7):07d}")
+            texts.append(" ".join(words))
+        ids = [f"doc{doc}-{i}" for i in range(per_doc)]
+        index.add_document(f"doc{doc}", f"http://arxiv.org/abs/{doc}", ids, texts)
+        if doc % 2500 == 0 and doc:
+            print(f"  indexed {len(index)} chunks ({time.perf_counter() - start:.0f}s)")
+    # the query mix also needs one exact identifier that is known to exist
+    index.add_document("known", "http://arxiv.org/abs/known", ["known-0"],
+                       ["Dimming events of KIC 8462852 observed by Kepler and TESS"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1_000_000, help="Chunks in the synthetic corpus")
+    parser.add_argument("--index", help="Index file to build or reuse (a temporary file by default)")
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.index or os.path.join(directory, "lexical.db")
+        index = LexicalIndex(path)
+        if len(index) < args.chunks:
+            print(f"building a {args.chunks}-chunk index at {path}")
+            build(index, args.chunks)
+        print(f"index: {len(index)} chunks, {os.path.getsize(path) / 1024 ** 2:.0f} MB")
+
+        for query in QUERIES:
+            index.search(query, top_k=args.top_k)  # warm the page cache
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = index.search(query, top_k=args.top_k)
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"{query[:45]:<45} {len(results):>3} hits  median {statistics.median(timings):6.2f} ms  "
+                  f"max {max(timings):6.2f} ms")
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            index.search("KIC 8462852 dimming", top_k=args.top_k, doc_id="known")
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{'(filtered to one paper)':<45}      median {statistics.median(timings):6.2f} ms  "
+              f"max {max(timings):6.2f} ms")
+        print(index.stats())
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
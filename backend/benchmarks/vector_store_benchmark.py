@@ -0,0 +1,194 @@
+"""
+Compare the vector store backends on build time, size, startup time, query latency, RSS and recall.
+
+Generates a clustered synthetic corpus of 384-dim embeddings (the shape of
+all-MiniLM-L6-v2 output), stores it in each backend in documents of 40
+chunks, then opens each store in a fresh subprocess and times queries.
+Recall@k is measured against exact float32 NumPy search; "loss" is the
+recall given up against the mmap-f32 store with the same index settings,
+i.e. the cost of quantized storage. Chroma is skipped when chromadb is not
+installed. Run from the backend directory:
+
+    python -m benchmarks.vector_store_benchmark --chunks 200000
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from modules.vectorstore import get_vector_store
+
+DIM = 384
+CHUNKS_PER_DOC = 40
+BACKENDS = {
+    'mmap-f32': ('mmap', {'dtype': 'float32'}),
+    'mmap-f16': ('mmap', {'dtype': 'float16'}),
+    'mmap-f16-rescore': ('mmap', {'dtype': 'float16', 'rescore': 4}),
+    'mmap-int8': ('mmap', {'dtype': 'int8'}),
+    'mmap-int8-rescore': ('mmap', {'dtype': 'int8', 'rescore': 4}),
+    'mmap-f32-exact': ('mmap', {'dtype': 'float32', 'exact_threshold': 10 ** 12}),
+    'mmap-int8-exact': ('mmap', {'dtype': 'int8', 'exact_threshold': 10 ** 12}),
+    'chroma': ('chroma', {}),
+}
+
+
+def write_fixture(directory: str, chunks: int, queries: int, seed: int = 0) -> None:
+    """Vectors around 2000 topic centroids, and queries perturbed from stored vectors."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((2000, DIM)).astype(np.float32)
+    vectors = np.lib.format.open_memmap(os.path.join(directory, "vectors.npy"), mode='w+',
+                                        dtype=np.float32, shape=(chunks, DIM))
+    for start in range(0, chunks, 100_000):
+        end = min(chunks, start + 100_000)
+        topics = rng.integers(len(centroids), size=end - start)
+        block = centroids[topics] + 0.6 * rng.standard_normal((end - start, DIM)).astype(np.float32)
+        vectors[start:end] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    vectors.flush()
+    picks = rng.integers(chunks, size=queries)
+    query_vectors = vectors[picks] + 0.02 * rng.standard_normal((queries, DIM)).astype(np.float32)
+    np.save(os.path.join(directory, "queries.npy"), query_vectors.astype(np.float32))
+
+
+def exact_top_k(directory: str, k: int) -> list:
+    vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode='r')
+    queries = np.load(os.path.join(directory, "queries.npy"))
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = np.concatenate([queries @ vectors[start:start + 100_000].T
+                             for start in range(0, len(vectors), 100_000)], axis=1)
+    return [list(np.argsort(-row)[:k]) for row in scores]
+
+
+def peak_rss_mb() -> float:
+    # VmHWM starts afresh at exec; ru_maxrss can carry over the parent's peak from the fork
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def open_store(name: str, path: str):
+    backend, kwargs = BACKENDS[name]
+    return get_vector_store(backend, path=path, **kwargs)
+
+
+def run_build(name: str, directory: str) -> dict:
+    """Subprocess body: store every vector, then make sure any approximate index covers them all."""
+    vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode='r')
+    store = open_store(name, os.path.join(directory, name))
+    start = time.perf_counter()
+    for first in range(0, len(vectors), CHUNKS_PER_DOC):
+        rows = range(first, min(len(vectors), first + CHUNKS_PER_DOC))
+        store.upsert_document(f"doc{first}", f"http://arxiv.org/abs/{first}", [str(row) for row in rows],
+                              np.asarray(vectors[rows.start:rows.stop]), [f"chunk {row}" for row in rows])
+    insert_seconds = time.perf_counter() - start
+    index_seconds = 0.0
+    if hasattr(store, 'build_index') and store.count() > store.exact_threshold:
+        thread = store._index_thread
+        if thread is not None:
+            thread.join()
+        start = time.perf_counter()
+        store.build_index()
+        index_seconds = time.perf_counter() - start
+    stats = store.stats()
+    store.close()
+    return {'insert_seconds': insert_seconds, 'index_seconds': index_seconds,
+            'bytes_per_vector': stats.get('bytes_per_vector'), 'file_mb': stats.get('file_mb')}
+
+
+def run_query(name: str, directory: str, k: int) -> dict:
+    """Subprocess body: open the store, query it, report timings, RSS and the returned ids."""
+    queries = np.load(os.path.join(directory, "queries.npy"))
+    start = time.perf_counter()
+    store = open_store(name, os.path.join(directory, name))
+    store.query(queries[0], k)
+    startup_seconds = time.perf_counter() - start
+
+    timings, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = store.query(query, k)
+        timings.append((time.perf_counter() - start) * 1000)
+        results.append([int(hit['id']) for hit in hits])
+
+    document = f"doc{(int(results[0][0]) // CHUNKS_PER_DOC) * CHUNKS_PER_DOC}"
+    start = time.perf_counter()
+    for query in queries[:100]:
+        store.query(query, k, doc_id=document)
+    filtered_ms = (time.perf_counter() - start) * 1000 / min(100, len(queries))
+    store.close()
+    return {
+        'startup_seconds': startup_seconds,
+        'median_ms': statistics.median(timings),
+        'p95_ms': sorted(timings)[int(len(timings) * 0.95)],
+        'filtered_ms': filtered_ms,
+        'peak_rss_mb': peak_rss_mb(),
+        'results': results
+    }
+
+
+def subprocess_json(*args: str) -> dict:
+    output = subprocess.run([sys.executable, "-m", "benchmarks.vector_store_benchmark", *args],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200_000, help="Chunks in the synthetic corpus")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--build", help=argparse.SUPPRESS)
+    parser.add_argument("--query", help=argparse.SUPPRESS)
+    parser.add_argument("--fixture", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.build:
+        print(json.dumps(run_build(args.build, args.fixture)))
+        return
+    if args.query:
+        print(json.dumps(run_query(args.query, args.fixture, args.top_k)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixture(directory, args.chunks, args.queries)
+        truth = exact_top_k(directory, args.top_k)
+        print(f"fixture: {args.chunks} chunks x {DIM} dims, {args.queries} queries, top_k={args.top_k}")
+        print(f"{'backend':<18} {'insert s':>9} {'index s':>8} {'B/vec':>6} {'disk MB':>8} {'startup s':>10} "
+              f"{'median ms':>10} {'p95 ms':>8} {'per-doc ms':>11} {'RSS MB':>8} {'recall':>7} {'loss':>6}")
+        recalls = {}
+        for name in args.backends:
+            if BACKENDS[name][0] == 'chroma':
+                try:
+                    import chromadb  # noqa: F401
+                except ImportError:
+                    print(f"{name:<18} skipped: chromadb is not installed")
+                    continue
+            build = subprocess_json("--build", name, "--fixture", directory)
+            query = subprocess_json("--query", name, "--fixture", directory, "--top-k", str(args.top_k))
+            recall = statistics.mean(len(set(got) & set(expected)) / args.top_k
+                                     for got, expected in zip(query['results'], truth))
+            recalls[name] = recall
+            # the float32 store with the same index settings, if it ran
+            baseline = recalls.get('mmap-f32-exact' if name.endswith('-exact') else 'mmap-f32')
+            loss = f"{baseline - recall:>6.3f}" if baseline is not None and name.startswith('mmap') else f"{'-':>6}"
+            size = (f"{build['bytes_per_vector'] or '-':>6} "
+                    f"{build['file_mb'] if build['file_mb'] is not None else '-':>8}")
+            print(f"{name:<18} {build['insert_seconds']:>9.1f} {build['index_seconds']:>8.1f} {size} "
+                  f"{query['startup_seconds']:>10.3f} {query['median_ms']:>10.2f} {query['p95_ms']:>8.2f} "
+                  f"{query['filtered_ms']:>11.2f} {query['peak_rss_mb']:>8.0f} {recall:>7.3f} {loss}")
+
+
+if __name__ == '__main__':
+    main()
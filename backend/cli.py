@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import logging
+
+from dotenv import load_dotenv
+
+from modules.config import get_settings
+from modules.store import get_paper_store, import_json_files
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+RESULTS_FILE_PATH = "./data/results.json"
+SUMMARIES_FILE_PATH = "./data/summaries.json"
+LOCAL_VECTORSTORE_PATH = "./data/db/chromadb_storage"
+
+
+def import_json(args: argparse.Namespace):
+    """Import the legacy JSON result files into the configured paper store."""
+    settings = get_settings()
+    store = get_paper_store(backend=settings.PAPER_STORE_BACKEND, path=settings.PAPER_STORE_PATH)
+    try:
+        papers, summaries = import_json_files(store, args.results, args.summaries)
+        print(f"Imported {papers} papers and {summaries} summaries into {settings.PAPER_STORE_PATH}")
+    finally:
+        store.close()
+
+
+def compact_embeddings(args: argparse.Namespace):
+    """Remove duplicate chunks from the vector store."""
+    from modules.embeddings import EmbeddingsManager
+    from modules.lexical import LexicalIndex
+    from modules.vectorstore import get_vector_store
+
+    settings = get_settings()
+    backend = args.backend or settings.VECTOR_STORE_BACKEND
+    if backend == "chroma":
+        vector_store = get_vector_store(backend, path=args.path or LOCAL_VECTORSTORE_PATH)
+    else:
+        vector_store = get_vector_store(backend, path=args.path or settings.MMAP_VECTOR_STORE_PATH,
+                                        dtype=settings.VECTOR_STORE_DTYPE, rescore=settings.VECTOR_RESCORE)
+    lexical_index = LexicalIndex(path=settings.LEXICAL_INDEX_PATH)
+    manager = EmbeddingsManager(vector_store=vector_store, lexical_index=lexical_index)
+    try:
+        before = vector_store.count()
+        removed = manager.compact()
+        print(f"Removed {removed} duplicate chunks ({before} -> {vector_store.count()})")
+    finally:
+        lexical_index.close()
+        vector_store.close()
+
+
+def vector_recall(args: argparse.Namespace):
+    """Report the recall@k that quantized storage and the IVF index cost on the mmap vector store."""
+    from modules.vectorstore import get_vector_store
+
+    settings = get_settings()
+    vector_store = get_vector_store(
+        "mmap",
+        path=args.path or settings.MMAP_VECTOR_STORE_PATH,
+        dtype=settings.VECTOR_STORE_DTYPE,
+        exact_threshold=settings.VECTOR_EXACT_THRESHOLD,
+        nprobe=settings.VECTOR_NPROBE,
+        rescore=settings.VECTOR_RESCORE
+    )
+    try:
+        report = vector_store.measure_recall(queries=args.queries, top_k=args.top_k)
+        if not report['queries']:
+            print("The vector store is empty")
+            return
+        stats = vector_store.stats()
+        print(f"{stats['chunks']} chunks, {stats['dtype']} ({stats['bytes_per_vector']} bytes per vector), "
+              f"rescore={stats['rescore']}")
+        print(f"recall@{report['top_k']} over {report['queries']} queries: {report['recall']:.3f}")
+        if 'first_pass_recall' in report:
+            print(f"before re-scoring: {report['first_pass_recall']:.3f}")
+    except ValueError as e:
+        print(f"Cannot measure recall: {e}")
+    finally:
+        vector_store.close()
+
+
+def backfill(args: argparse.Namespace):
+    """List every paper of the categories submitted in a date range and process them, resumably."""
+    from modules.api import iter_search, submitted_date_query
+    from modules.backfill import BackfillCheckpoint, run_backfill
+    from modules.utils import arxiv_id_from_link
+
+    params = {'categories': sorted(args.categories), 'from': args.date_from, 'to': args.date_to, 'limit': args.limit}
+    checkpoint = BackfillCheckpoint(args.checkpoint, params)
+    if args.fresh:
+        checkpoint.remove()
+
+    if checkpoint.load():
+        print(f"Resuming backfill from {args.checkpoint} ({len(checkpoint.status)} papers already finished)")
+    else:
+        query = submitted_date_query(args.categories, args.date_from, args.date_to)
+        print(f"Listing papers for: {query}")
+        papers, seen = [], set()
+        for paper in iter_search(query, page_size=args.page_size):
+            arxiv_id = arxiv_id_from_link(paper['link'])
+            if arxiv_id in seen:
+                continue
+            seen.add(arxiv_id)
+            papers.append(paper)
+            if args.limit and len(papers) >= args.limit:
+                break
+        checkpoint.save_listing(papers)
+        print(f"Listed {len(papers)} papers")
+
+    # the server module wires up the stores, caches, LLM client and pipeline from the same settings
+    import main as server
+
+    server.pipeline.wait_for_embeddings = True
+    try:
+        report = asyncio.run(run_backfill(
+            server.pipeline, server.paper_index, checkpoint,
+            parallel=args.parallel, retry_failed=not args.skip_failed
+        ))
+    finally:
+        server.pipeline.shutdown()
+        server.embedding_worker.shutdown(wait=True)
+        server.pdf_parser.close()
+        server.llm_cache.close()
+
+    print(f"\nListed {report['listed']} papers: {report['processed']} processed, {report['failed']} failed, "
+          f"{report['skipped']} already in the store, {report['resumed']} finished in earlier runs")
+    print(f"Elapsed {report['seconds']:.1f}s -> {report['papers_per_minute']:.1f} papers/min")
+    if report['stages']:
+        print(f"\n{'stage':<10} {'total s':>10} {'s/paper':>9} {'share':>7}")
+        for stage, times in sorted(report['stages'].items(), key=lambda item: -item[1]['seconds']):
+            print(f"{stage:<10} {times['seconds']:>10.1f} {times['per_paper']:>9.2f} {times['share']:>7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="arxiv-feed backend maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import-json", help="Import results.json/summaries.json into the paper store")
+    import_parser.add_argument("--results", default=RESULTS_FILE_PATH, help="Path to the legacy results file")
+    import_parser.add_argument("--summaries", default=SUMMARIES_FILE_PATH, help="Path to the legacy summaries file")
+    import_parser.set_defaults(func=import_json)
+
+    compact_parser = subparsers.add_parser("compact-embeddings", help="Remove duplicate chunks from the vector store")
+    compact_parser.add_argument("--backend", choices=["chroma", "mmap"],
+                                help="Vector store backend (VECTOR_STORE_BACKEND by default)")
+    compact_parser.add_argument("--path", help="Vector store directory (the backend's configured path by default)")
+    compact_parser.set_defaults(func=compact_embeddings)
+
+    recall_parser = subparsers.add_parser(
+        "vector-recall", help="Measure mmap vector store recall@k against exact full-precision search"
+    )
+    recall_parser.add_argument("--path", help="Vector store directory (MMAP_VECTOR_STORE_PATH by default)")
+    recall_parser.add_argument("--queries", type=int, default=200, help="Stored chunks sampled as queries")
+    recall_parser.add_argument("--top-k", type=int, default=10)
+    recall_parser.set_defaults(func=vector_recall)
+
+    backfill_parser = subparsers.add_parser(
+        "backfill", help="Process every paper submitted to the given categories in a date range"
+    )
+    backfill_parser.add_argument("--categories", nargs="+", required=True, help="arXiv categories, e.g. astro-ph.SR")
+    backfill_parser.add_argument("--from", dest="date_from", required=True, help="First submission day (YYYY-MM-DD)")
+    backfill_parser.add_argument("--to", dest="date_to", required=True, help="Last submission day (YYYY-MM-DD)")
+    backfill_parser.add_argument("--limit", type=int, default=None, help="Process at most this many papers")
+    backfill_parser.add_argument("--parallel", type=int, default=8, help="Papers in flight at once")
+    backfill_parser.add_argument("--page-size", type=int, default=200, help="Entries per arXiv API request")
+    backfill_parser.add_argument("--checkpoint", default="./data/backfill/checkpoint.json",
+                                 help="Checkpoint file; an interrupted run with the same arguments resumes from it")
+    backfill_parser.add_argument("--fresh", action="store_true", help="Discard the checkpoint and start over")
+    backfill_parser.add_argument("--skip-failed", action="store_true",
+                                 help="Don't retry papers that failed in a previous run")
+    backfill_parser.set_defaults(func=backfill)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,29 @@
-from fastapi import FastAPI, HTTPException, status, Request, BackgroundTasks
+from fastapi import FastAPI, HTTPException, status, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
-from typing import Optional, List
-import os
+from typing import Optional, List, Dict, Tuple
+import asyncio
 import json
+import os
 
-from modules.api import get_papers
+from modules.api import get_papers, get_papers_multi, ArxivHarvester
 from modules.summarization import PaperSummarizer
-from modules.data_extractor import extract_metadata
-from modules.embeddings import EmbeddingsManager
-from modules.chat import generate_response
-from modules.utils import download_pdf, save_results, save_summaries
+from modules.embeddings import EmbeddingsManager, EmbeddingWorker
+from modules.lexical import LexicalIndex
+from modules.vectorstore import get_vector_store
+from modules.chat import Chat
+from modules.llm import LLMCache, get_llm_provider, with_cache
+from modules.llm_client import LLMClient
+from modules.reducer import InputReducer
+from modules.utils import arxiv_id_from_link
+from modules.store import get_paper_store, import_json_files, PaperIndex
+from modules.config import get_settings
+from modules.pipeline import PaperPipeline
+from modules.pdf_cache import PDFCache
+from modules.parsing import ParseCache, get_parser
+from modules.jobs import JobStore, JobManager, JOB_COMPLETED, JOB_FAILED, PAPER_DONE
 
 from dotenv import load_dotenv
 import time
@@ -72,10 +83,106 @@ app.add_middleware(
     allow_headers=get_cors_headers(),
 )
 
-summarizer = PaperSummarizer()
+settings = get_settings()
 
-summarizer = PaperSummarizer()
-embeddings_manager = EmbeddingsManager(config=yaml_config, path=LOCAL_VECTORSTORE_PATH)
+paper_store = get_paper_store(
+    backend=settings.PAPER_STORE_BACKEND,
+    path=settings.PAPER_STORE_PATH,
+    results_path=RESULTS_FILE_PATH,
+    summaries_path=SUMMARIES_FILE_PATH
+)
+if settings.PAPER_STORE_BACKEND != "json" and paper_store.count() == 0:
+    # one-time migration of the legacy JSON files into the indexed store
+    import_json_files(paper_store, RESULTS_FILE_PATH, SUMMARIES_FILE_PATH)
+paper_index = PaperIndex(paper_store)
+
+parse_cache = ParseCache(settings.PARSE_CACHE_DIR)
+if settings.PDF_PARSER == "local":
+    pdf_parser = get_parser("local", workers=settings.LOCAL_PARSER_WORKERS)
+else:
+    pdf_parser = get_parser(settings.PDF_PARSER)
+# every LLM call site shares one client, so the quota and concurrency limits are global
+llm_provider = LLMClient(
+    get_llm_provider(settings.LLM_PROVIDER, settings.LLM_MODEL),
+    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    max_retries=settings.LLM_MAX_RETRIES,
+    request_timeout=settings.LLM_CALL_TIMEOUT
+)
+llm_cache = LLMCache(
+    path=settings.LLM_CACHE_PATH,
+    max_bytes=settings.LLM_CACHE_MAX_MB * 1024 * 1024,
+    ttls=settings.LLM_CACHE_TTLS,
+    bypass=settings.LLM_CACHE_BYPASS
+)
+chat = Chat(model_name=settings.LLM_MODEL, provider=with_cache(llm_provider, llm_cache, "chat"))
+# an empty policy set sends every prompt the full text
+input_reducer = InputReducer(
+    policies=None if settings.INPUT_REDUCTION_ENABLED else {},
+    budgets=settings.INPUT_TOKEN_BUDGETS
+)
+summarizer = PaperSummarizer(
+    model_name=settings.LLM_MODEL,
+    call_timeout=settings.LLM_CALL_TIMEOUT,
+    summary_timeout=settings.LLM_SUMMARY_TIMEOUT,
+    parse_cache=parse_cache,
+    parser=pdf_parser,
+    provider=llm_provider,
+    llm_cache=llm_cache,
+    single_pass_tokens=settings.SUMMARY_SINGLE_PASS_TOKENS,
+    chunk_tokens=settings.SUMMARY_CHUNK_TOKENS,
+    map_concurrency=settings.SUMMARY_MAP_CONCURRENCY,
+    reducer=input_reducer
+)
+lexical_index = LexicalIndex(path=settings.LEXICAL_INDEX_PATH, max_postings=settings.LEXICAL_MAX_POSTINGS)
+# None keeps the ChromaDB collection at LOCAL_VECTORSTORE_PATH
+vector_store = None
+if settings.VECTOR_STORE_BACKEND != "chroma":
+    vector_store = get_vector_store(
+        backend=settings.VECTOR_STORE_BACKEND,
+        path=settings.MMAP_VECTOR_STORE_PATH,
+        dtype=settings.VECTOR_STORE_DTYPE,
+        exact_threshold=settings.VECTOR_EXACT_THRESHOLD,
+        nprobe=settings.VECTOR_NPROBE,
+        rescore=settings.VECTOR_RESCORE
+    )
+embeddings_manager = EmbeddingsManager(
+    config=yaml_config,
+    path=LOCAL_VECTORSTORE_PATH,
+    batch_size=settings.EMBEDDING_BATCH_SIZE,
+    query_cache_bytes=settings.QUERY_CACHE_MAX_MB * 1024 * 1024,
+    query_cache_ttl=settings.QUERY_CACHE_TTL,
+    lexical_index=lexical_index,
+    hybrid=settings.HYBRID_SEARCH_ENABLED,
+    hybrid_candidates=settings.HYBRID_CANDIDATES,
+    vector_store=vector_store
+)
+embedding_worker = EmbeddingWorker(
+    embeddings_manager,
+    workers=settings.EMBEDDING_WORKERS,
+    max_queue=settings.EMBEDDING_QUEUE_SIZE
+)
+pdf_cache = PDFCache(
+    directory=settings.PDF_CACHE_DIR,
+    max_bytes=settings.PDF_CACHE_MAX_MB * 1024 * 1024,
+    base_url=settings.PDF_BASE_URL
+)
+harvester = ArxivHarvester(
+    paper_store,
+    page_size=settings.HARVEST_PAGE_SIZE,
+    delay=settings.ARXIV_API_DELAY,
+    initial_limit=settings.HARVEST_INITIAL_LIMIT,
+    max_attempts=settings.HARVEST_MAX_ATTEMPTS
+)
+pipeline = PaperPipeline(
+    summarizer,
+    paper_index,
+    embedding_worker,
+    pdf_cache=pdf_cache,
+    concurrency=settings.pipeline_concurrency,
+    parse_attempts=settings.PIPELINE_PARSE_ATTEMPTS
+)
 
 class ErrorResponse(BaseModel):
     detail: str
@@ -104,16 +211,44 @@ class PaperResponse(BaseModel):
             }
         }
 
+class MultiCategoryRequest(BaseModel):
+    categories: List[str] = Field(..., min_length=1, max_length=20, description="arXiv categories to fetch")
+    max_results: int = Field(default=10, ge=1, le=10, description="Papers to fetch per category")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "categories": ["astro-ph.SR", "astro-ph.GA", "astro-ph.EP"],
+                "max_results": 10
+            }
+        }
+
+class CategoryFetch(BaseModel):
+    category: str
+    fetched: int
+    seconds: float
+    error: Optional[str] = None
+
+class MultiCategoryResponse(BaseModel):
+    papers: List[PaperResponse]
+    categories: List[CategoryFetch]
+    failed: List[str] = Field(default_factory=list, description="Links of papers that could not be processed")
+    fetch_seconds: float
+    process_seconds: float
+
 class SearchRequest(BaseModel):
     query: str = Field(..., description="Search query or prompt", min_length=1, max_length=500)
     paper_url: Optional[str] = Field(default=None, description="Optional URL to filter search results")
     top_k: int = Field(default=5, ge=1, le=10, description="Number of top results to return")
+    hybrid: Optional[bool] = Field(default=None, description="Fuse keyword (BM25) and vector search; "
+                                                             "the server default if omitted")
 
 class SearchResult(BaseModel):
     chunk_text: str
-    distance: float
+    distance: Optional[float]
     doc_id: str
     paper_url: str
+    score: Optional[float] = Field(default=None, description="Reciprocal-rank fusion score, for hybrid search")
 
     class Config:
         json_schema_extra = {
@@ -144,6 +279,157 @@ class ChatResponse(BaseModel):
             }
         }
 
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+
+class JobPaperStatus(BaseModel):
+    arxiv_id: str
+    link: str
+    title: Optional[str]
+    stage: str
+    error: Optional[str]
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    params: Dict
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+    papers: List[JobPaperStatus]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "job_id": "3f2b8c1e9a4d4f6b8e0c2a7d5b9e1f34",
+                "status": "running",
+                "params": {"max_results": 10, "category": "astro-ph.SR"},
+                "error": None,
+                "created_at": 1731500000.0,
+                "updated_at": 1731500042.5,
+                "papers": [
+                    {
+                        "arxiv_id": "2411.09566v1",
+                        "link": "http://arxiv.org/abs/2411.09566v1",
+                        "title": "Example Research Paper",
+                        "stage": "extract",
+                        "error": None
+                    }
+                ]
+            }
+        }
+
+async def process_fetched_papers(papers: List[Dict], on_progress=None) -> Tuple[List[Dict], List[Tuple[Dict, Exception]]]:
+    """
+    Serve already processed papers from the index and run the rest through the pipeline
+
+    Returns:
+        tuple: Processed papers in the order of `papers`, and (paper, error) pairs for failures
+    """
+    # check for existing results
+    cached_papers, pending_papers = paper_index.partition(papers)
+    if not pending_papers:
+        logger.info("Returning existing results and summaries.")
+        return cached_papers, []
+    logger.info(f"{len(cached_papers)} papers already processed, processing {len(pending_papers)} new papers")
+
+    processed_papers = []
+    failures = []
+    for paper, result in zip(pending_papers, await pipeline.process(pending_papers, on_progress=on_progress)):
+        if isinstance(result, Exception):
+            logger.error(f"Error processing paper {paper['link']}: {str(result)}", exc_info=result)
+            failures.append((paper, result))
+        else:
+            processed_papers.append(result)
+
+    logger.info(f"Successfully processed {len(processed_papers)}/{len(pending_papers)} papers")
+
+    # keep the arXiv ordering of the fetched papers
+    results = {arxiv_id_from_link(paper['link']): paper for paper in cached_papers + processed_papers}
+    ordered_results = [
+        results[arxiv_id_from_link(paper['link'])]
+        for paper in papers
+        if arxiv_id_from_link(paper['link']) in results
+    ]
+    return ordered_results, failures
+
+async def run_processing_job(job_id: str, params: Dict, store: JobStore) -> Optional[str]:
+    """
+    Job body for /jobs: fetch papers and run them through the same steps as /process_papers
+
+    An incremental job completes even when some papers fail: the watermark
+    moves over the whole pass and the failed papers are kept by the harvester,
+    which hands them out again in the next incremental jobs. Each failure also
+    stays recorded, with its error, in the job's papers. Returns a note on the
+    failures for the job's status.
+    """
+    incremental = params.get('incremental', False)
+    if incremental:
+        # the watermark only moves once the papers went through, so an interrupted job is harvested again
+        papers = await asyncio.to_thread(
+            harvester.harvest_new, params['category'], limit=params.get('limit'), commit=False
+        )
+        if not papers:
+            logger.info(f"No new papers in {params['category']} since the last harvest")
+            return
+    else:
+        papers = await asyncio.to_thread(get_papers, max_results=params['max_results'], category=params['category'])
+        if not papers:
+            raise RuntimeError("No papers found")
+
+    store.add_papers(job_id, papers)
+    cached_papers, _ = paper_index.partition(papers)
+    for paper in cached_papers:
+        store.set_paper_stage(job_id, paper['link'], PAPER_DONE)
+
+    def on_progress(link: str, stage: str, error: Optional[str] = None):
+        store.set_paper_stage(job_id, link, stage, error)
+
+    _, failures = await process_fetched_papers(papers, on_progress=on_progress)
+    if not incremental:
+        if failures:
+            raise RuntimeError(f"{len(failures)} of {len(papers)} papers failed")
+        return None
+
+    # a paper that always fails (a withdrawn or unparsable PDF) must not hold the watermark back for good,
+    # so the failures are kept for the next jobs instead, which retry them up to HARVEST_MAX_ATTEMPTS times
+    given_up = await asyncio.to_thread(
+        harvester.record_outcome,
+        params['category'],
+        papers,
+        {arxiv_id_from_link(paper['link']): str(error) for paper, error in failures}
+    )
+    if failures:
+        failed_ids = sorted(arxiv_id_from_link(paper['link']) for paper, _ in failures)
+        logger.warning(f"Job {job_id}: {len(failures)} of {len(papers)} papers failed, the next incremental "
+                       f"jobs retry them: {', '.join(failed_ids)}")
+        note = f"{len(failures)} of {len(papers)} papers failed; see the job's papers for the errors"
+        if given_up:
+            note += f". Gave up on {', '.join(given_up)} after {settings.HARVEST_MAX_ATTEMPTS} attempts"
+        return note
+    return None
+
+job_manager = JobManager(JobStore(settings.JOB_STORE_PATH), run_processing_job, workers=settings.JOB_WORKERS)
+
+@app.on_event("startup")
+async def start_job_workers():
+    await job_manager.start()
+    if embeddings_manager.lexical_index is not None and not len(lexical_index) \
+            and embeddings_manager.vector_store.count():
+        # a collection filled before hybrid search existed; index it without holding up startup
+        asyncio.get_running_loop().run_in_executor(None, embeddings_manager.sync_lexical_index)
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_manager.stop()
+    pipeline.shutdown()
+    pdf_parser.close()
+    embedding_worker.shutdown(wait=False)
+    llm_cache.close()
+    lexical_index.close()
+    embeddings_manager.vector_store.close()
+
 @app.post("/process_papers", 
     response_model=List[PaperResponse],
     responses={
@@ -155,7 +441,7 @@ class ChatResponse(BaseModel):
     description="Downloads and processes research papers, generating summaries and extracting metadata."
 )
 
-async def process_papers(background_tasks: BackgroundTasks, max_results: int = 10, category: str = "astro-ph.SR"):
+async def process_papers(max_results: int = 10, category: str = "astro-ph.SR"):
     try:
         logger.info(f"Starting to process {max_results} papers from category: {category}")
         
@@ -166,7 +452,8 @@ async def process_papers(background_tasks: BackgroundTasks, max_results: int = 1
                 detail="max_results must be between 1 and 10"
             )
 
-        papers = get_papers(max_results=max_results, category=category)
+        # get_papers sleeps between arXiv calls to respect the API's rate limit
+        papers = await asyncio.to_thread(get_papers, max_results=max_results, category=category)
         if not papers:
             logger.warning("No papers found")
             raise HTTPException(
@@ -176,92 +463,15 @@ async def process_papers(background_tasks: BackgroundTasks, max_results: int = 1
         
         logger.info(f"Found {len(papers)} papers to process")
         
-        # check for existing results
-        existing_results = []
-        for paper in papers:
-            if os.path.exists(RESULTS_FILE_PATH):
-                with open(RESULTS_FILE_PATH, 'r') as results_file:
-                    existing_data = json.load(results_file)
-                    if paper in existing_data:
-                        existing_results.append(paper)
-
-        if existing_results:
-            summaries_exist = True
-            for paper in existing_results:
-                if not os.path.exists(SUMMARIES_FILE_PATH):
-                    summaries_exist = False
-                    break
-                with open(SUMMARIES_FILE_PATH, 'r') as summaries_file:
-                    summaries_data = json.load(summaries_file)
-                    if paper['link'] not in summaries_data:
-                        summaries_exist = False
-                        break
-            
-            if summaries_exist:
-                logger.info("Returning existing results and summaries.")
-                for paper in existing_results:
-                    paper['summary'] = summaries_data[paper['link']]['summary']
-                    paper['insight'] = summaries_data[paper['link']]['insight']
-                return existing_results
-
-        processed_papers = []
-        for index, paper in enumerate(papers, 1):
-            while True:
-                try:
-                    logger.info(f"Processing paper {index}/{len(papers)}: {paper.get('title', 'Unknown Title')}")
-                    
-                    pdf_path = download_pdf(paper['link'])
-                    if not pdf_path:
-                        logger.error(f"Failed to download paper: {paper['link']}")
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=f"Failed to download paper: {paper['link']}"
-                        )
-                    
-                    logger.debug(f"Successfully downloaded PDF to {pdf_path}")
-                    parsed_content = summarizer.parse_pdf(pdf_path)
-                    if not parsed_content:
-                        logger.error(f"Failed to parse paper: {paper['link']}")
-                        continue  # Retry parsing the same paper
-                    
-                    logger.debug("Successfully parsed PDF content")
-                    metadata = extract_metadata(parsed_content)
-                    paper.update({
-                        'conclusion': metadata['conclusion'],
-                        'ref_count': metadata['ref_count']
-                    })
-                    save_results([paper], RESULTS_FILE_PATH)
-                    logger.debug("Saved paper results")
-
-                    summary, insight, full_text = summarizer.summarize_paper(parsed_content)
-                    save_summaries(paper['link'], summary, insight, full_text, SUMMARIES_FILE_PATH)
-                    logger.debug("Saved paper summaries")
-
-                    background_tasks.add_task(
-                        embeddings_manager.store_document_embeddings, 
-                        text=full_text, 
-                        url=paper['link']
-                    )
-                    logger.debug("Embedding task added to background")
-
-                    processed_papers.append(paper)
-                    logger.info(f"Successfully processed paper {index}/{len(papers)}")
-                    break  # Exit the retry loop on success
-            
-                except Exception as e:
-                    logger.error(f"Error processing paper {paper['link']}: {str(e)}", exc_info=True)
-                    if "LlamaParse" in str(e):
-                        logger.warning("Retrying due to LlamaParse communication issue...")
-                        continue  # Retry if LlamaParse fails
-                    else:
-                        raise HTTPException(
-                            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                            detail=f"Failed to process paper: {paper['link']} - {str(e)}"
-                        )
-        
-        logger.info(f"Successfully processed all {len(processed_papers)} papers")
+        results, failures = await process_fetched_papers(papers)
+        if failures:
+            paper, error = failures[0]
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to process paper: {paper['link']} - {str(error)}"
+            )
 
-        return processed_papers
+        return results
     
     except Exception as e:
         logger.error(f"Error in process_papers: {str(e)}", exc_info=True)
@@ -270,6 +480,135 @@ async def process_papers(background_tasks: BackgroundTasks, max_results: int = 1
             detail=f"Failed to process papers - {str(e)}"
         )
 
+@app.post("/process_papers/multi",
+    response_model=MultiCategoryResponse,
+    responses={
+        200: {"description": "Successfully processed papers from every category"},
+        404: {"model": ErrorResponse, "description": "No papers found"},
+        500: {"model": ErrorResponse, "description": "Internal server error"}
+    },
+    summary="Process research papers from several categories",
+    description="Fetches every category concurrently, merges and dedupes the papers by arXiv id and processes "
+                "the combined set once. Returns per-category fetch timings alongside the processed papers."
+)
+async def process_papers_multi(request: MultiCategoryRequest):
+    logger.info(f"Starting to process papers from categories: {request.categories}")
+
+    start = time.perf_counter()
+    papers, timings = await asyncio.to_thread(get_papers_multi, request.categories, request.max_results)
+    fetch_seconds = time.perf_counter() - start
+    if not papers:
+        logger.warning("No papers found")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No papers found"
+        )
+
+    logger.info(f"Found {len(papers)} unique papers to process")
+    start = time.perf_counter()
+    try:
+        results, failures = await process_fetched_papers(papers)
+    except Exception as e:
+        logger.error(f"Error in process_papers_multi: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process papers - {str(e)}"
+        )
+
+    return MultiCategoryResponse(
+        papers=results,
+        categories=[CategoryFetch(**timing) for timing in timings],
+        failed=[paper['link'] for paper, _ in failures],
+        fetch_seconds=fetch_seconds,
+        process_seconds=time.perf_counter() - start
+    )
+
+@app.post("/jobs",
+    response_model=JobSubmitResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        202: {"description": "Job queued"},
+        400: {"model": ErrorResponse, "description": "Bad request"}
+    },
+    summary="Submit a paper processing job",
+    description="Queues the same work as /process_papers and returns immediately with a job id to poll. "
+                "With incremental=true the job processes every paper submitted to the category since the last "
+                "incremental job (the newest `limit` papers, 100 by default, on the first run) instead of the newest max_results, "
+                "plus the papers that failed in earlier incremental jobs, up to HARVEST_MAX_ATTEMPTS times each."
+)
+async def submit_job(max_results: int = 10, category: str = "astro-ph.SR", incremental: bool = False,
+                     limit: Optional[int] = None):
+    if incremental:
+        # catch up on everything submitted since the last incremental job for this category
+        job_id = job_manager.submit({'category': category, 'incremental': True, 'limit': limit})
+        return JobSubmitResponse(job_id=job_id, status="queued")
+
+    if max_results <= 0 or max_results > 10:
+        logger.warning(f"Invalid max_results value: {max_results}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="max_results must be between 1 and 10"
+        )
+
+    job_id = job_manager.submit({'max_results': max_results, 'category': category})
+    return JobSubmitResponse(job_id=job_id, status="queued")
+
+def get_job_or_404(job_id: str) -> Dict:
+    job = job_manager.store.get_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job not found: {job_id}"
+        )
+    return job
+
+@app.get("/jobs/{job_id}",
+    response_model=JobStatusResponse,
+    responses={
+        200: {"description": "Job status with per-paper stage progress"},
+        404: {"model": ErrorResponse, "description": "Job not found"}
+    },
+    summary="Get job status"
+)
+async def get_job_status(job_id: str):
+    job = get_job_or_404(job_id)
+    return JobStatusResponse(
+        job_id=job['id'],
+        status=job['status'],
+        params=job['params'],
+        error=job['error'],
+        created_at=job['created_at'],
+        updated_at=job['updated_at'],
+        papers=[JobPaperStatus(**paper) for paper in job['papers']]
+    )
+
+@app.get("/jobs/{job_id}/results",
+    responses={
+        200: {"description": "Finished papers as newline-delimited JSON", "content": {"application/x-ndjson": {}}},
+        404: {"model": ErrorResponse, "description": "Job not found"}
+    },
+    summary="Stream job results",
+    description="Streams each paper as soon as it has been processed, until the job finishes."
+)
+async def stream_job_results(job_id: str, poll_interval: float = 1.0):
+    get_job_or_404(job_id)
+
+    async def finished_papers():
+        sent = set()
+        while True:
+            job = job_manager.store.get_job(job_id)
+            for paper in job['papers']:
+                if paper['stage'] == PAPER_DONE and paper['arxiv_id'] not in sent:
+                    entry = paper_index.get(paper['arxiv_id'])
+                    if entry is not None:
+                        sent.add(paper['arxiv_id'])
+                        yield json.dumps(entry, ensure_ascii=False) + "\n"
+            if job['status'] in (JOB_COMPLETED, JOB_FAILED):
+                break
+            await asyncio.sleep(max(0.1, poll_interval))
+
+    return StreamingResponse(finished_papers(), media_type="application/x-ndjson")
+
 @app.post("/chat", 
     response_model=ChatResponse,
     responses={
@@ -290,10 +629,13 @@ async def search_similar_chunks(search_request: SearchRequest):
                 detail="Query must not be empty"
             )
 
-        results = embeddings_manager.search_similar_chunks(
-            query=search_request.query, 
-            top_k=search_request.top_k, 
-            url=search_request.paper_url or ""
+        # search and generation block (embedding, rate limiting, retry backoff), so they run off the event loop
+        results = await asyncio.to_thread(
+            embeddings_manager.search_similar_chunks,
+            query=search_request.query,
+            top_k=search_request.top_k,
+            url=search_request.paper_url or "",
+            hybrid=search_request.hybrid
         )
         
         search_results = [
@@ -301,7 +643,8 @@ async def search_similar_chunks(search_request: SearchRequest):
                 chunk_text=result['chunk_text'],
                 distance=result['distance'],
                 doc_id=result['doc_id'],
-                paper_url=result['paper_url']
+                paper_url=result['paper_url'],
+                score=result.get('score')
             ) for result in results
         ]
         
@@ -310,7 +653,7 @@ async def search_similar_chunks(search_request: SearchRequest):
         
         try:
             logger.info("Generating LLM response using context")
-            response = generate_response(search_request.query, context)
+            response = await asyncio.to_thread(chat.generate_response, search_request.query, context)
             logger.debug("Successfully generated LLM response")
             
         except Exception as e:
@@ -332,6 +675,64 @@ async def search_similar_chunks(search_request: SearchRequest):
             detail=f"Failed to process chat request - {str(e)}"
         )
 
+@app.post("/chat/stream",
+    responses={
+        200: {"description": "Similar chunks followed by the response text, as newline-delimited JSON",
+              "content": {"application/x-ndjson": {}}},
+        400: {"model": ErrorResponse, "description": "Bad request"}
+    },
+    summary="Search similar text chunks and stream the response",
+    description="Like /chat, but the retrieved chunks are sent first and the LLM response is streamed as it is generated. "
+                "Each line is a JSON event: 'chunks', then 'token' events, then 'done' (or 'error')."
+)
+async def stream_chat(search_request: SearchRequest):
+    if not search_request.query:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Query must not be empty"
+        )
+
+    logger.info(f"Streaming chat response for prompt: {search_request.query}")
+    try:
+        results = await asyncio.to_thread(
+            embeddings_manager.search_similar_chunks,
+            query=search_request.query,
+            top_k=search_request.top_k,
+            url=search_request.paper_url or "",
+            hybrid=search_request.hybrid
+        )
+    except Exception as e:
+        logger.error(f"Error searching similar chunks: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process chat request - {str(e)}"
+        )
+
+    search_results = [
+        SearchResult(
+            chunk_text=result['chunk_text'],
+            distance=result['distance'],
+            doc_id=result['doc_id'],
+            paper_url=result['paper_url'],
+            score=result.get('score')
+        ) for result in results
+    ]
+    context = "\n\n".join([result.chunk_text for result in search_results])
+
+    def events():
+        # a sync generator is iterated in the threadpool, so the blocking model stream doesn't stall the event loop
+        yield json.dumps({"type": "chunks", "similar_chunks": [result.model_dump() for result in search_results]}) + "\n"
+        try:
+            for text in chat.stream_response(search_request.query, context):
+                yield json.dumps({"type": "token", "text": text}, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error(f"Error streaming LLM response: {e}", exc_info=True)
+            yield json.dumps({"type": "error", "detail": f"Failed to generate response - {str(e)}"}) + "\n"
+            return
+        yield json.dumps({"type": "done"}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     start_time = time.time()
@@ -342,6 +743,24 @@ async def add_process_time_header(request: Request, call_next):
     logger.info(f"Request processed in {process_time:.2f} seconds")
     return response
 
+@app.get("/stats",
+    response_model=dict,
+    summary="Processing statistics",
+    description="Returns cache hit/miss counters and embedding queue metrics"
+)
+async def get_stats():
+    return {
+        "pdf_cache": pdf_cache.stats(),
+        "parse_cache": parse_cache.stats(),
+        "embeddings": embedding_worker.stats(),
+        "query_cache": embeddings_manager.cache_stats(),
+        "lexical_index": lexical_index.stats(),
+        "vector_store": embeddings_manager.vector_store.stats(),
+        "llm_cache": llm_cache.stats(),
+        "llm_client": llm_provider.stats(),
+        "input_reducer": input_reducer.stats()
+    }
+
 @app.get("/",
     response_model=dict,
     summary="Health Check",
@@ -373,4 +792,8 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 if __name__ == '__main__':
     import uvicorn
+    if settings.PDF_PARSER == "local":
+        # the parser's worker processes re-import the script they were started from
+        logger.warning("Run the server with `uvicorn main:app` when PDF_PARSER=local, or every parser "
+                       "worker process builds its own copy of the app")
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,76 +1,168 @@
-import urllib.request
+import io
 import urllib.parse
-from utils import save_results
 import xml.etree.ElementTree as ET
-from datetime import datetime, timedelta
+import threading
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from modules.utils import arxiv_id_from_link, get_http_session
 
 logger = logging.getLogger(__name__)
 
+BASE_URL = 'http://export.arxiv.org/api/query?'
+ATOM = '{http://www.w3.org/2005/Atom}'
+ARXIV = '{http://arxiv.org/schemas/atom}'
+OPENSEARCH = '{http://a9.com/-/spec/opensearch/1.1/}'
+
+# arXiv asks API clients to wait 3 seconds between consecutive requests
+POLITE_DELAY = 3.0
+_last_request = 0.0
+_request_lock = threading.Lock()
+
+
+@contextmanager
+def _open_feed(url: str, delay: float = POLITE_DELAY, timeout: float = 60.0):
+    """
+    Open an API response for streaming over the shared connection pool
+
+    Requests from this process are started at least `delay` seconds apart;
+    concurrent callers queue up and their downloads overlap.
+    """
+    global _last_request
+    with _request_lock:
+        wait = _last_request + delay - time.monotonic()
+        if wait > 0:
+            logger.debug(f"Waiting {wait:.1f}s before the next arXiv API request")
+            time.sleep(wait)
+        _last_request = time.monotonic()
+    with get_http_session().get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        yield response.raw
+
+
+def _query_url(search_query: str, start: int, max_results: int) -> str:
+    query_params = {
+        'search_query': search_query,
+        'start': start,
+        'max_results': max_results,
+        'sortBy': 'submittedDate',
+        'sortOrder': 'descending'
+    }
+    return BASE_URL + urllib.parse.urlencode(query_params)
+
+
+def _entry_to_paper(entry: ET.Element) -> Dict:
+    """Build a paper dictionary from a completed <entry> element in a single pass over its children."""
+    fields = {}
+    authors = []
+    for child in entry:
+        tag = child.tag
+        if tag == f'{ATOM}author':
+            name = child.find(f'{ATOM}name')
+            authors.append(name.text if name is not None else None)
+        elif tag == f'{ARXIV}primary_category':
+            fields['primary_category'] = child.attrib['term']
+        elif tag in (f'{ATOM}id', f'{ATOM}title', f'{ATOM}published', f'{ATOM}summary'):
+            fields[tag[len(ATOM):]] = child.text
+
+    missing = [name for name in ('id', 'title', 'published', 'summary', 'primary_category') if fields.get(name) is None]
+    if missing:
+        raise AttributeError(f"entry is missing {', '.join(missing)}")
+    return {
+        'id': fields['id'],
+        'title': fields['title'].strip().replace('\n', ' '),
+        'authors': authors,
+        'published': fields['published'],
+        'abstract': fields['summary'].strip().replace('\n', ' '),
+        'link': fields['id'],
+        'primary_category': fields['primary_category']
+    }
+
+
+class AtomFeedParser:
+    """
+    Streaming parser for arXiv API Atom feeds.
+
+    Iterating over it yields a paper dictionary as soon as each <entry> has
+    been read from `source` (a file-like object such as an HTTP response).
+    Completed entries are cleared from the tree, so memory use stays flat
+    however many entries the page holds. `total_results` is set once the
+    feed's opensearch:totalResults element has been read, which arXiv sends
+    before the entries.
+    """
+
+    def __init__(self, source: BinaryIO):
+        self.source = source
+        self.total_results: Optional[int] = None
+
+    def __iter__(self) -> Iterator[Dict]:
+        root = None
+        for event, elem in ET.iterparse(self.source, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = elem
+                continue
+
+            if elem.tag == f'{ATOM}entry':
+                try:
+                    yield _entry_to_paper(elem)
+                except (AttributeError, KeyError) as e:
+                    logger.error(f"Error parsing paper entry: {e}", exc_info=True)
+                # the entry is done: drop it and everything the root has accumulated so far
+                root.clear()
+            elif elem.tag == f'{OPENSEARCH}totalResults' and elem.text:
+                self.total_results = int(elem.text)
+
+
+def parse_feed(response_data: bytes) -> Tuple[List[Dict], Optional[int]]:
+    """
+    Parse a complete arXiv API Atom feed held in memory
+
+    Parameters:
+        response_data (bytes): Raw response body
+
+    Returns:
+        tuple: List of paper dictionaries and the feed's total result count (None if missing)
+    """
+    feed = AtomFeedParser(io.BytesIO(response_data))
+    papers = list(feed)
+    logger.debug(f"Found {len(papers)} entries in XML response")
+    return papers, feed.total_results
+
+
+def _fetch_category(category: str, max_results: int) -> List[Dict]:
+    url = _query_url(f'cat:{category}', start=0, max_results=max_results)
+    logger.debug(f"Making request to arXiv API: {url}")
+    with _open_feed(url) as response:
+        logger.debug("Successfully received response from arXiv")
+        return list(AtomFeedParser(response))
+
+
 def get_papers(max_results: int = 10, category: str = "astro-ph.SR"):
     """
     Fetch recent papers from arXiv based on the specified category.
-    
+
     Parameters:
         max_results (int): Maximum number of results to return
         category (str): Category of papers to fetch (default is 'astro-ph.SR')
-        
+
     Returns:
         list: List of dictionaries containing paper information
     """
     logger.info(f"Fetching {max_results} papers from arXiv category: {category}")
-    
-    # Base API URL
-    base_url = 'http://export.arxiv.org/api/query?'
-    
-    search_query = f'cat:{category}'  # Use the category parameter
-    
-    yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
-    query_params = {
-        'search_query': search_query,
-        'max_results': max_results,
-        'sortBy': 'submittedDate',
-        'sortOrder': 'descending'
-    }
-    
-    encoded_params = urllib.parse.urlencode(query_params)
-    url = base_url + encoded_params
-    logger.debug(f"Making request to arXiv API: {url}")
-    
+
     try:
-        with urllib.request.urlopen(url) as response:
-            response_data = response.read()
-        logger.debug("Successfully received response from arXiv")
-        
-        root = ET.fromstring(response_data)
-        
-        namespace = {'atom': 'http://www.w3.org/2005/Atom',
-                    'arxiv': 'http://arxiv.org/schemas/atom'}
-
-        papers = []
-        entries = root.findall('atom:entry', namespace)
-        logger.debug(f"Found {len(entries)} entries in XML response")
-        
-        for entry in entries:
-            try:
-                paper = {
-                    'id': entry.find('atom:id', namespace).text,
-                    'title': entry.find('atom:title', namespace).text.strip().replace('\n', ' '),
-                    'authors': [author.find('atom:name', namespace).text for author in entry.findall('atom:author', namespace)],
-                    'published': entry.find('atom:published', namespace).text,
-                    'abstract': entry.find('atom:summary', namespace).text.strip().replace('\n', ' '),
-                    'link': entry.find('atom:id', namespace).text,
-                    'primary_category': entry.find('arxiv:primary_category', namespace).attrib['term']
-                }
-                papers.append(paper)
-            except AttributeError as e:
-                logger.error(f"Error parsing paper entry: {e}", exc_info=True)
-                continue
-        
+        papers = _fetch_category(category, max_results)
         logger.info(f"Successfully fetched {len(papers)} papers")
         return papers
-        
-    except urllib.error.URLError as e:
+
+    except requests.RequestException as e:
         logger.error(f"Failed to fetch papers from arXiv: {e}", exc_info=True)
         return []
     except ET.ParseError as e:
@@ -81,6 +173,265 @@ def get_papers(max_results: int = 10, category: str = "astro-ph.SR"):
         return []
 
 
+def get_papers_multi(categories: List[str], max_results: int = 10) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Fetch recent papers from several arXiv categories concurrently
+
+    Papers cross-listed in more than one of the categories are returned once
+    (the first occurrence, in category order).
+
+    Parameters:
+        categories (list): Categories to fetch
+        max_results (int): Maximum number of results per category
+
+    Returns:
+        tuple: Merged list of unique papers, and per-category stats
+            ('category', 'fetched', 'seconds' and 'error' if the fetch failed)
+    """
+    categories = list(dict.fromkeys(categories))
+    logger.info(f"Fetching {max_results} papers from each of {len(categories)} arXiv categories")
+
+    def fetch(category: str) -> Tuple[List[Dict], Dict]:
+        start = time.perf_counter()
+        try:
+            papers = _fetch_category(category, max_results)
+            error = None
+        except Exception as e:
+            logger.error(f"Failed to fetch papers from {category}: {e}", exc_info=True)
+            papers, error = [], str(e)
+        return papers, {
+            'category': category,
+            'fetched': len(papers),
+            'seconds': time.perf_counter() - start,
+            'error': error
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(categories), 16)), thread_name_prefix="arxiv-fetch") as executor:
+        results = list(executor.map(fetch, categories))
+
+    merged, seen = [], set()
+    for papers, _ in results:
+        for paper in papers:
+            arxiv_id = arxiv_id_from_link(paper['link'])
+            if arxiv_id not in seen:
+                seen.add(arxiv_id)
+                merged.append(paper)
+
+    timings = [timing for _, timing in results]
+    logger.info(f"Fetched {sum(t['fetched'] for t in timings)} papers, {len(merged)} unique")
+    return merged, timings
+
+
+def submitted_date_query(categories: List[str], date_from: str, date_to: str) -> str:
+    """
+    Search query for papers in any of `categories` submitted between two dates
+
+    Parameters:
+        categories (list): arXiv categories
+        date_from (str): First day, YYYY-MM-DD or YYYYMMDD
+        date_to (str): Last day (inclusive), YYYY-MM-DD or YYYYMMDD
+
+    Returns:
+        str: Value for the API's search_query parameter
+    """
+    start, end = date_from.replace('-', ''), date_to.replace('-', '')
+    categories_query = ' OR '.join(f'cat:{category}' for category in categories)
+    if len(categories) > 1:
+        categories_query = f'({categories_query})'
+    return f'{categories_query} AND submittedDate:[{start}0000 TO {end}2359]'
+
+
+def iter_search(search_query: str, page_size: int = 100, delay: float = POLITE_DELAY,
+                empty_page_retries: int = 3) -> Iterator[Dict]:
+    """
+    Yield every result of an API query, newest first, paging with `start` offsets
+
+    Papers are yielded as each page streams in. Pages that come back empty
+    before the end of the result set (which the API occasionally does) are
+    retried.
+
+    Parameters:
+        search_query (str): Value for the API's search_query parameter
+        page_size (int): Entries requested per API call
+        delay (float): Minimum seconds between API calls
+        empty_page_retries (int): Retries for an empty page
+
+    Yields:
+        dict: Paper dictionaries in the same format as get_papers
+
+    Raises:
+        RuntimeError: If a page before the end of the result set is still empty
+            after every retry, so callers never take a cut-short listing as complete
+    """
+    start = 0
+    while True:
+        url = _query_url(search_query, start=start, max_results=page_size)
+        count, total_results = 0, None
+        for attempt in range(empty_page_retries + 1):
+            logger.debug(f"Requesting arXiv page at offset {start}: {url}")
+            with _open_feed(url, delay=delay) as response:
+                feed = AtomFeedParser(response)
+                for paper in feed:
+                    count += 1
+                    yield paper
+            total_results = feed.total_results
+            if count or total_results is None or start >= total_results:
+                break
+            if attempt < empty_page_retries:
+                logger.warning(f"Empty arXiv page at offset {start} of {total_results}, retrying")
+
+        start += count
+        if not count and total_results is not None and start < total_results:
+            raise RuntimeError(f"arXiv returned no entries at offset {start} of {total_results} "
+                               f"after {empty_page_retries + 1} attempts")
+        if not count or (total_results is not None and start >= total_results):
+            return
+
+
+class ArxivHarvester:
+    """
+    Incremental harvester that only returns papers newer than the last harvest.
+
+    Each category has a watermark in the paper store: the newest submission
+    date seen and the ids submitted at exactly that time. A harvest pages
+    through the API newest first with `start` offsets, yielding entries as
+    each page arrives, and stops at the first entry at or below the
+    watermark. The watermark is advanced once the pass has been fully
+    consumed, so an interrupted pass is repeated on the next run.
+
+    Papers that fail to process are kept in the store with their number of
+    attempts and handed out again after the new papers of the next passes,
+    until they went through or failed `max_attempts` times.
+    """
+
+    def __init__(self, store, page_size: int = 100, delay: float = POLITE_DELAY, initial_limit: int = 100,
+                 empty_page_retries: int = 3, max_attempts: int = 3):
+        """
+        Parameters:
+            store (PaperStore): Where the per-category watermarks and failed papers are kept
+            page_size (int): Entries requested per API call
+            delay (float): Minimum seconds between API calls
+            initial_limit (int): Papers to take for a category that has no watermark yet
+            empty_page_retries (int): Retries for pages that come back empty before the end of the results
+            max_attempts (int): Passes a failing paper is part of before it is no longer retried
+        """
+        self.store = store
+        self.page_size = page_size
+        self.delay = delay
+        self.initial_limit = initial_limit
+        self.empty_page_retries = empty_page_retries
+        self.max_attempts = max_attempts
+
+    def harvest(self, category: str, limit: Optional[int] = None, commit: bool = True) -> Iterator[Dict]:
+        """
+        Yield papers submitted since the category's watermark, newest first, then the
+        papers of earlier passes that failed and are still being retried
+
+        Parameters:
+            category (str): arXiv category
+            limit (int): Stop after this many new papers; older ones are skipped for good. Defaults to
+                `initial_limit` for a new category and to no limit otherwise
+            commit (bool): Advance the watermark, and drop the retried papers from the failures, at the
+                end of the pass. Disable it to report the outcome yourself with `record_outcome` once
+                the papers have been processed
+
+        Yields:
+            dict: Paper dictionaries in the same format as get_papers
+        """
+        watermark = self.store.get_watermark(category)
+        if watermark is None:
+            limit = limit or self.initial_limit
+            logger.info(f"No watermark for {category}, harvesting the newest {limit} papers")
+        else:
+            logger.info(f"Harvesting {category} since {watermark['published']}")
+        seen_ids = set(watermark['ids']) if watermark else set()
+
+        harvested = []
+        search = iter_search(f'cat:{category}', page_size=self.page_size, delay=self.delay,
+                             empty_page_retries=self.empty_page_retries)
+        with closing(search) as papers:
+            for paper in papers:
+                if watermark is not None and (
+                    paper['published'] < watermark['published']
+                    or (paper['published'] == watermark['published'] and paper['id'] in seen_ids)
+                ):
+                    break
+
+                harvested.append(paper)
+                yield paper
+                if limit is not None and len(harvested) >= limit:
+                    break
+
+        logger.info(f"Harvested {len(harvested)} new papers from {category}")
+
+        harvested_ids = {arxiv_id_from_link(paper['link']) for paper in harvested}
+        retried = [
+            failure['paper'] for failure in self.store.get_harvest_failures(category)
+            if failure['attempts'] < self.max_attempts
+            and arxiv_id_from_link(failure['paper']['link']) not in harvested_ids
+        ]
+        if retried:
+            logger.info(f"Retrying {len(retried)} papers from {category} that failed before")
+        for paper in retried:
+            yield paper
+
+        if commit:
+            self.store.clear_harvest_failures(category, [arxiv_id_from_link(paper['link']) for paper in retried])
+            self.advance_watermark(category, harvested)
+
+    def advance_watermark(self, category: str, papers: List[Dict]) -> None:
+        """Move the category's watermark to the newest of `papers` (never backwards)."""
+        if not papers:
+            return
+        newest = max(paper['published'] for paper in papers)
+        ids = {paper['id'] for paper in papers if paper['published'] == newest}
+
+        watermark = self.store.get_watermark(category)
+        if watermark is not None:
+            if watermark['published'] > newest:
+                return
+            if watermark['published'] == newest:
+                ids |= set(watermark['ids'])
+        self.store.set_watermark(category, newest, sorted(ids))
+
+    def record_outcome(self, category: str, papers: List[Dict], failures: Dict[str, str]) -> List[str]:
+        """
+        Advance the watermark over a processed pass and keep its failed papers for the next passes
+
+        The failures are stored before the watermark moves, so a paper below the
+        watermark is never lost: it is retried until it goes through or has
+        failed `max_attempts` times.
+
+        Parameters:
+            category (str): arXiv category
+            papers (List[Dict]): Every paper of the pass, as returned by `harvest` with commit=False
+            failures (Dict[str, str]): Error message per arXiv id, for the papers that failed
+
+        Returns:
+            List[str]: Ids of the papers that have now failed `max_attempts` times and are given up on
+        """
+        given_up = []
+        for paper in papers:
+            arxiv_id = arxiv_id_from_link(paper['link'])
+            if arxiv_id not in failures:
+                continue
+            attempts = self.store.record_harvest_failure(category, paper, failures[arxiv_id])
+            if attempts >= self.max_attempts:
+                logger.warning(f"Giving up on {arxiv_id} from {category} after {attempts} failed attempts")
+                given_up.append(arxiv_id)
+
+        self.store.clear_harvest_failures(category, [
+            arxiv_id_from_link(paper['link']) for paper in papers
+            if arxiv_id_from_link(paper['link']) not in failures
+        ])
+        self.advance_watermark(category, papers)
+        return given_up
+
+    def harvest_new(self, category: str, limit: Optional[int] = None, commit: bool = True) -> List[Dict]:
+        """Run a full harvest pass and return its papers, new and retried, as a list."""
+        return list(self.harvest(category, limit=limit, commit=commit))
+
+
 # if __name__ == "__main__":
 #     papers = get_papers(max_results=10)
     
@@ -0,0 +1,201 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.store import has_analysis
+from modules.utils import arxiv_id_from_link
+
+logger = logging.getLogger(__name__)
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+
+class BackfillCheckpoint:
+    """
+    On-disk progress of a backfill run.
+
+    `path` holds the run parameters and the full paper listing, written once
+    after the listing has been fetched. `{path}.log` is an append-only JSON
+    lines file with one record per finished paper, flushed to disk as soon as
+    the paper finishes, so a crashed run loses at most the papers that were
+    in flight. A record cut short by a crash is dropped on load.
+    """
+
+    def __init__(self, path: str, params: Dict[str, Any]):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.params = params
+        self.papers: Optional[List[Dict]] = None
+        self.status: Dict[str, str] = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def load(self) -> bool:
+        """
+        Load an existing checkpoint for the same parameters
+
+        Returns:
+            bool: Whether a checkpoint was found
+
+        Raises:
+            ValueError: If the checkpoint was written for different parameters
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        if state['params'] != self.params:
+            raise ValueError(
+                f"Checkpoint {self.path} belongs to a backfill with different parameters: {state['params']}"
+            )
+        self.papers = state['papers']
+
+        try:
+            with open(self.log_path, 'rb+') as f:
+                complete = 0
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"Ignoring incomplete checkpoint record: {line[:80]!r}")
+                        break
+                    self.status[record['arxiv_id']] = record['status']
+                    complete += len(line)
+                # drop a record cut short by a crash so new records start on a fresh line
+                f.truncate(complete)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def save_listing(self, papers: List[Dict]) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'params': self.params, 'papers': papers, 'listed_at': time.time()}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.papers = papers
+
+    def record(self, arxiv_id: str, status: str, error: Optional[str] = None,
+               seconds: Optional[float] = None) -> None:
+        entry = {'arxiv_id': arxiv_id, 'status': status, 'error': error, 'seconds': seconds, 'at': time.time()}
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.status[arxiv_id] = status
+
+    def remove(self) -> None:
+        for path in (self.path, self.log_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class StageTimer:
+    """
+    Pipeline progress callback that adds up the time papers spend in each stage.
+
+    A paper's time in a stage runs from the report of that stage to the
+    paper's next report, so retried downloads and parses are counted in full.
+    """
+
+    def __init__(self):
+        self.totals: Dict[str, float] = defaultdict(float)
+        self._current: Dict[str, Tuple[str, float]] = {}
+
+    def __call__(self, link: str, stage: str, error: Optional[str] = None) -> None:
+        now = time.perf_counter()
+        previous = self._current.pop(link, None)
+        if previous is not None:
+            self.totals[previous[0]] += now - previous[1]
+        if stage not in (STATUS_DONE, STATUS_FAILED):
+            self._current[link] = (stage, now)
+
+
+async def run_backfill(pipeline, paper_index, checkpoint: BackfillCheckpoint, parallel: int = 8,
+                       retry_failed: bool = True, log_every: int = 25) -> Dict[str, Any]:
+    """
+    Take every paper of a checkpoint's listing through the pipeline
+
+    Papers already finished in the checkpoint, or already stored in the
+    index with a summary and insights, are skipped. Every other paper is
+    checkpointed as soon as it finishes, and only counts as done when its
+    saved analysis is real, so failed papers are retried (or skipped with
+    retry_failed=False) instead of being taken as finished.
+
+    Parameters:
+        pipeline (PaperPipeline): Pipeline to run the papers through
+        paper_index (PaperIndex): Index of already processed papers
+        checkpoint (BackfillCheckpoint): Loaded checkpoint with a paper listing
+        parallel (int): Papers in flight at once
+        retry_failed (bool): Run papers that failed in a previous attempt again
+        log_every (int): Log progress every this many finished papers
+
+    Returns:
+        dict: Counts, elapsed time, throughput and per-stage time breakdown
+    """
+    finished = {STATUS_DONE, STATUS_SKIPPED} if retry_failed else {STATUS_DONE, STATUS_SKIPPED, STATUS_FAILED}
+    remaining = [paper for paper in checkpoint.papers
+                 if checkpoint.status.get(arxiv_id_from_link(paper['link'])) not in finished]
+    resumed = len(checkpoint.papers) - len(remaining)
+
+    cached, pending = paper_index.partition(remaining)
+    for paper in cached:
+        checkpoint.record(arxiv_id_from_link(paper['link']), STATUS_SKIPPED)
+    logger.info(f"Backfill: {len(checkpoint.papers)} papers listed, {resumed} finished in a previous run, "
+                f"{len(cached)} already processed, {len(pending)} to process")
+
+    timer = StageTimer()
+    semaphore = asyncio.Semaphore(max(1, parallel))
+    counts = {STATUS_DONE: 0, STATUS_FAILED: 0}
+    start = time.perf_counter()
+
+    async def process(paper: Dict) -> None:
+        arxiv_id = arxiv_id_from_link(paper['link'])
+        async with semaphore:
+            paper_start = time.perf_counter()
+            try:
+                processed = await pipeline.process_paper(paper, on_progress=timer)
+                if not has_analysis(processed):
+                    raise RuntimeError(f"No summary or insights were saved for {paper['link']}")
+                checkpoint.record(arxiv_id, STATUS_DONE, seconds=time.perf_counter() - paper_start)
+                counts[STATUS_DONE] += 1
+            except Exception as e:
+                logger.error(f"Backfill failed for {paper['link']}: {e}")
+                checkpoint.record(arxiv_id, STATUS_FAILED, error=str(e), seconds=time.perf_counter() - paper_start)
+                counts[STATUS_FAILED] += 1
+
+        finished_now = counts[STATUS_DONE] + counts[STATUS_FAILED]
+        if finished_now % log_every == 0:
+            elapsed = time.perf_counter() - start
+            logger.info(f"Backfill progress: {finished_now}/{len(pending)} papers, "
+                        f"{counts[STATUS_DONE] / elapsed * 60:.1f} papers/min")
+
+    await asyncio.gather(*(process(paper) for paper in pending))
+    elapsed = time.perf_counter() - start
+
+    stage_total = sum(timer.totals.values())
+    return {
+        'listed': len(checkpoint.papers),
+        'resumed': resumed,
+        'skipped': len(cached),
+        'processed': counts[STATUS_DONE],
+        'failed': counts[STATUS_FAILED],
+        'seconds': elapsed,
+        'papers_per_minute': counts[STATUS_DONE] / elapsed * 60 if elapsed > 0 else 0.0,
+        'stages': {
+            stage: {
+                'seconds': seconds,
+                'per_paper': seconds / len(pending) if pending else 0.0,
+                'share': seconds / stage_total if stage_total else 0.0
+            }
+            for stage, seconds in timer.totals.items()
+        }
+    }
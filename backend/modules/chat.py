@@ -1,24 +1,21 @@
-import google.generativeai as genai
-import os
-from dotenv import load_dotenv
-load_dotenv()
+from typing import Iterator, Optional
 
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-genai.configure(api_key=GOOGLE_API_KEY)
+from modules.llm import LLMProvider, GeminiProvider
+from modules.llm_client import LLMClient
 
 import logging
 
 logger = logging.getLogger(__name__)
 
 class Chat:
-    def __init__(self, model_name: str = "gemini-1.5-flash-8b") -> None:
+    def __init__(self, model_name: str = "gemini-1.5-flash-8b", provider: Optional[LLMProvider] = None) -> None:
         self.model_name = model_name
 
-        self.model = genai.GenerativeModel(self.model_name)
-        logger.debug("PaperSummarizer initialization complete")
+        self.provider = provider or LLMClient(GeminiProvider(self.model_name))
+        logger.debug("Chat initialization complete")
 
-    def generate_response(self, query: str, context: str):
-        prompt = f"""Provide a comprehensive and accurate response to the user's query based on the provided context from research papers.
+    def build_prompt(self, query: str, context: str) -> str:
+        return f"""Provide a comprehensive and accurate response to the user's query based on the provided context from research papers.
 
                             Use the following details to guide your response:
 
@@ -66,5 +63,10 @@ class Chat:
                             Context from relevant papers:
                             {context}
                             """
-        response = self.model.generate_content(prompt)
-        return response.text
\ No newline at end of file
+
+    def generate_response(self, query: str, context: str) -> str:
+        return self.provider.generate(self.build_prompt(query, context))
+
+    def stream_response(self, query: str, context: str) -> Iterator[str]:
+        """Yield the response text as the model produces it"""
+        return self.provider.stream(self.build_prompt(query, context))
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 from functools import lru_cache
 
 class Settings(BaseSettings):
@@ -15,6 +15,93 @@ class Settings(BaseSettings):
     CORS_HEADERS: str = "*"
     ALLOW_CREDENTIALS: bool = True
 
+    # Storage Settings
+    PAPER_STORE_BACKEND: str = "sqlite"
+    PAPER_STORE_PATH: str = "./data/papers.db"
+
+    # PDF Cache Settings
+    PDF_CACHE_DIR: str = "./data/cache/pdfs"
+    PDF_CACHE_MAX_MB: int = 2048
+    PDF_BASE_URL: str = "https://arxiv.org/pdf"
+
+    # Parsing Settings
+    PDF_PARSER: str = "llamaparse"
+    LOCAL_PARSER_WORKERS: int = 4
+    PARSE_CACHE_DIR: str = "./data/cache/parsed"
+
+    # Embedding Settings
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_WORKERS: int = 1
+    EMBEDDING_QUEUE_SIZE: int = 32
+    QUERY_CACHE_MAX_MB: int = 64
+    QUERY_CACHE_TTL: float = 3600.0
+    # fuse BM25 over chunk text with dense search in /chat
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_CANDIDATES: int = 4
+    LEXICAL_INDEX_PATH: str = "./data/lexical_index.db"
+    LEXICAL_MAX_POSTINGS: int = 1000
+    # 'chroma' or 'mmap' (in-process memory-mapped matrix, exact search up to
+    # VECTOR_EXACT_THRESHOLD chunks and an IVF index above)
+    VECTOR_STORE_BACKEND: str = "chroma"
+    MMAP_VECTOR_STORE_PATH: str = "./data/db/mmap_vectors"
+    # 'float32', 'float16' or 'int8' (2x / 4x smaller); with VECTOR_RESCORE > 0 the best
+    # top_k * VECTOR_RESCORE candidates are re-scored against a float32 copy kept on disk
+    VECTOR_STORE_DTYPE: str = "float32"
+    VECTOR_RESCORE: int = 0
+    VECTOR_EXACT_THRESHOLD: int = 50000
+    VECTOR_NPROBE: int = 32
+
+    # Pipeline Settings
+    PIPELINE_DOWNLOAD_CONCURRENCY: int = 4
+    PIPELINE_PARSE_CONCURRENCY: int = 4
+    PIPELINE_EXTRACT_CONCURRENCY: int = 4
+    PIPELINE_EMBED_CONCURRENCY: int = 1
+    PIPELINE_PARSE_ATTEMPTS: int = 3
+    LLM_CALL_TIMEOUT: float = 120.0
+    # overall budget for a paper's summary, which with map-reduce spans many LLM calls
+    LLM_SUMMARY_TIMEOUT: float = 900.0
+    # papers longer than this many (estimated) tokens are summarized with map-reduce
+    SUMMARY_SINGLE_PASS_TOKENS: int = 32000
+    SUMMARY_CHUNK_TOKENS: int = 8000
+    SUMMARY_MAP_CONCURRENCY: int = 4
+    # drop back matter and table markup from the paper text before each prompt
+    INPUT_REDUCTION_ENABLED: bool = True
+    # token budget per prompt type, overriding the reducer's defaults
+    INPUT_TOKEN_BUDGETS: Dict[str, int] = {"insights": 16000, "conclusion": 12000}
+
+    # LLM Settings
+    LLM_PROVIDER: str = "gemini"
+    LLM_MODEL: str = "gemini-1.5-flash-8b"
+    LLM_REQUESTS_PER_MINUTE: float = 15
+    LLM_TOKENS_PER_MINUTE: float = 1_000_000
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_MAX_RETRIES: int = 5
+    LLM_CACHE_PATH: str = "./data/llm_cache.db"
+    LLM_CACHE_MAX_MB: int = 256
+    # seconds per call site; sites that are not listed never expire
+    LLM_CACHE_TTLS: Dict[str, float] = {"chat": 86400}
+    LLM_CACHE_BYPASS: bool = False
+
+    # arXiv Harvesting Settings
+    ARXIV_API_DELAY: float = 3.0
+    HARVEST_PAGE_SIZE: int = 100
+    HARVEST_INITIAL_LIMIT: int = 100
+    # incremental jobs that a failing paper is retried in before it is given up on
+    HARVEST_MAX_ATTEMPTS: int = 3
+
+    # Job Settings
+    JOB_STORE_PATH: str = "./data/jobs.db"
+    JOB_WORKERS: int = 2
+
+    @property
+    def pipeline_concurrency(self) -> Dict[str, int]:
+        return {
+            "download": self.PIPELINE_DOWNLOAD_CONCURRENCY,
+            "parse": self.PIPELINE_PARSE_CONCURRENCY,
+            "extract": self.PIPELINE_EXTRACT_CONCURRENCY,
+            "embed": self.PIPELINE_EMBED_CONCURRENCY,
+        }
+
     @property
     def cors_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
@@ -29,6 +116,7 @@ class Settings(BaseSettings):
 
     class Config:
         env_file = ".env"
+        extra = "ignore"
 
 @lru_cache()
 def get_settings() -> Settings:
@@ -1,30 +1,28 @@
-import google.generativeai as genai
-import os
-import re
-from typing import Dict
+import threading
+from typing import Callable, Dict, Optional
 import logging
 
 from langchain.prompts import PromptTemplate
 
-from dotenv import load_dotenv
+from modules.llm import LLMProvider, GeminiProvider
+from modules.llm_client import LLMClient
+from modules.sections import count_references, find_conclusion_section
 
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-if not GOOGLE_API_KEY:
-    logger.error("GOOGLE_API_KEY not found in environment variables")
-    raise ValueError("GOOGLE_API_KEY is required")
-
-genai.configure(api_key=GOOGLE_API_KEY)
-
 model_name = "gemini-1.5-flash-8b"
-model = genai.GenerativeModel(model_name)
-logger.info(f"Initialized Gemini model: {model_name}")
-
-def _find_conclusion(content: str) -> str:
-    """Extract conclusions from research paper content."""
+_default_llm: Optional[LLMProvider] = None
+_default_llm_lock = threading.Lock()
+
+def _get_default_llm() -> LLMProvider:
+    global _default_llm
+    with _default_llm_lock:
+        if _default_llm is None:
+            _default_llm = LLMClient(GeminiProvider(model_name))
+        return _default_llm
+
+def find_conclusion(content: str, llm: Optional[LLMProvider] = None) -> str:
+    """Extract conclusions from research paper content, using `llm` (Gemini by default)."""
     logger.info("Starting conclusion extraction")
     
     try:
@@ -51,37 +49,50 @@ def _find_conclusion(content: str) -> str:
         prompt = prompt_template.format(content=content)
         logger.debug("Generated prompt for conclusion extraction")
         
-        response = model.generate_content(prompt)
-        logger.debug("Successfully received response from Gemini")
+        response = (llm or _get_default_llm()).generate(prompt)
+        logger.debug("Successfully received response from the LLM")
         
-        return response.text
+        return response
     except Exception as e:
         logger.error(f"Error extracting conclusion: {e}", exc_info=True)
         return ""
 
-def extract_metadata(parsed_content: Dict) -> Dict:
-    """Extract metadata from parsed paper content."""
+def get_conclusion(content: str, llm: Optional[LLMProvider] = None,
+                   reduce: Optional[Callable[[str], str]] = None) -> str:
+    """
+    Conclusions of a paper, read from its section headings when possible
+
+    The LLM is only asked (see `find_conclusion`) when no Conclusions,
+    Summary or Discussion section can be found in the parsed text. `reduce`,
+    if given, is applied to the text before it is sent to the LLM.
+    """
+    conclusion = find_conclusion_section(content)
+    if conclusion:
+        logger.info(f"Conclusion taken from the paper's sections ({len(conclusion)} chars)")
+        return conclusion
+    logger.info("No conclusion section found, falling back to the LLM")
+    return find_conclusion(reduce(content) if reduce else content, llm=llm)
+
+def extract_metadata(parsed_content: Dict, conclusion: Optional[str] = None,
+                     llm: Optional[LLMProvider] = None) -> Dict:
+    """
+    Extract metadata from parsed paper content.
+
+    Pass `conclusion` when it has already been extracted (e.g. alongside the
+    summary calls) to skip the extraction.
+    """
     logger.info("Starting metadata extraction")
     
     try:
         content = '\n\n'.join([doc.text for doc in parsed_content])
         logger.debug("Combined parsed content for processing")
         
-        conclusion = _find_conclusion(content)
+        if conclusion is None:
+            conclusion = get_conclusion(content, llm=llm)
         if not conclusion:
             logger.warning("No conclusion was extracted")
         
-        ref_patterns = [
-            r'\[\d+\]',
-            r'\(\w+\s*(?:et\s+al\.?)?\s*,\s*\d{4}\w?\)',
-            r'(?<!\w)(?:20)\d{2}[a-z]?(?!\d)'
-        ]
-        
-        ref_count = 0
-        for pattern in ref_patterns:
-            refs = re.findall(pattern, content)
-            ref_count = max(ref_count, len(set(refs)))
-        
+        ref_count = count_references(content)
         logger.debug(f"Found {ref_count} references")
         
         metadata = {
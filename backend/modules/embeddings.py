@@ -1,22 +1,53 @@
 from sentence_transformers import SentenceTransformer
 import hashlib
-from typing import List, Dict, Any
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import List, Dict, Any, Optional, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-import chromadb
-import uuid
+import numpy as np
+
+from modules.cache import LRUCache
+from modules.lexical import LexicalIndex, reciprocal_rank_fusion
+from modules.vectorstore import ChromaVectorStore, VectorStore
+
+logger = logging.getLogger(__name__)
 
 class EmbeddingsManager:
-    def __init__(self, collection_name: str = "arxiv_papers", path: str = "./chroma_storage"):
+    def __init__(self, collection_name: str = "arxiv_papers", path: str = "./chroma_storage",
+                 config: Optional[Dict[str, Any]] = None, batch_size: int = 64,
+                 query_cache_bytes: int = 64 * 1024 * 1024, query_cache_ttl: Optional[float] = 3600.0,
+                 lexical_index: Optional[LexicalIndex] = None, hybrid: bool = True, hybrid_candidates: int = 4,
+                 rrf_k: int = 60, vector_store: Optional[VectorStore] = None):
+        config = config or {}
         self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        self.chroma_client = chromadb.PersistentClient(path=path)
-        self.collection_name = collection_name
-        
-        self.collection = self.chroma_client.get_or_create_collection(
-            name=self.collection_name,
-            metadata={"hnsw:space": "cosine"}
+        self.batch_size = batch_size
+
+        # query text -> embedding, and (embedding hash, top_k, doc_id filter) -> results;
+        # the memory budget is split evenly between the two
+        self.query_embedding_cache = LRUCache(
+            max_bytes=query_cache_bytes // 2,
+            sizeof=lambda embedding: embedding.nbytes
+        )
+        self.search_cache = LRUCache(
+            max_bytes=query_cache_bytes // 2,
+            ttl=query_cache_ttl,
+            sizeof=lambda results: sum(len(result['chunk_text'].encode('utf-8')) + 256 for result in results)
         )
         
+        # BM25 side of hybrid search, kept in step with the collection; None for dense-only search
+        self.lexical_index = lexical_index
+        self.hybrid = hybrid and lexical_index is not None
+        self.hybrid_candidates = max(1, hybrid_candidates)
+        self.rrf_k = rrf_k
+
+        self.collection_name = config.get("collection_name", collection_name)
+        # ChromaDB at `path` unless another backend is passed in
+        self.vector_store = vector_store or ChromaVectorStore(path=path, collection_name=self.collection_name)
+        
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=500,
             chunk_overlap=50,
@@ -29,71 +60,391 @@ class EmbeddingsManager:
         content = f"{url}".encode('utf-8')
         return hashlib.sha256(content).hexdigest()
 
-    def create_embeddings(self, text: str, url: str) -> List[Dict[str, Any]]:
-        """Create embeddings for text chunks"""
-        chunks = self.text_splitter.split_text(text)
-        
-        doc_id = self.generate_doc_id(url)
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts in batches into a float32 matrix of shape (len(texts), dim)"""
+        if not texts:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+    def create_embeddings(self, text: str, url: str) -> Dict[str, Any]:
+        """Create embeddings for the text chunks of a single document"""
+        return self.create_embeddings_batch([(text, url)])[0]
+
+    def create_embeddings_batch(self, documents: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Create embeddings for the chunks of several documents with a single encode call
+
+        Parameters:
+            documents (list): (text, url) pairs
+
+        Returns:
+            list: One dict per document with 'doc_id', 'paper_url', 'chunks' and
+                  'embeddings' (float32 array, one row per chunk)
+        """
+        chunked = [(url, self.text_splitter.split_text(text)) for text, url in documents]
+        embeddings = self.encode([chunk for _, chunks in chunked for chunk in chunks])
         
-        embeddings = []
-        for chunk in chunks:
-            embedding = self.model.encode(chunk).tolist()
-            embeddings.append({
-                "doc_id": doc_id,
+        results = []
+        offset = 0
+        for url, chunks in chunked:
+            results.append({
+                "doc_id": self.generate_doc_id(url),
                 "paper_url": url,
-                "chunk_text": chunk,
-                "embedding": embedding
+                "chunks": chunks,
+                "embeddings": embeddings[offset:offset + len(chunks)]
             })
+            offset += len(chunks)
         
-        return embeddings
+        return results
 
-    async def store_document_embeddings(self, text: str, url: str):
-        """Store document embeddings in ChromaDB"""
-        embeddings_data = self.create_embeddings(text, url)
-        
-        ids = [str(uuid.uuid4()) for _ in embeddings_data]
-        embeddings = [data["embedding"] for data in embeddings_data]
-        documents = [data["chunk_text"] for data in embeddings_data]
-        metadatas = [
-            {
-                "doc_id": data["doc_id"],
-                "paper_url": data["paper_url"]
-            } 
-            for data in embeddings_data
+    def generate_chunk_id(self, doc_id: str, index: int, chunk: str) -> str:
+        """Deterministic chunk ID, so storing the same document twice upserts instead of duplicating"""
+        content_hash = hashlib.sha256(chunk.encode('utf-8')).hexdigest()[:16]
+        return f"{doc_id}-{index}-{content_hash}"
+
+    def is_embedded(self, url: str) -> bool:
+        """Whether any chunk of the document at `url` is already stored"""
+        return self.vector_store.has_document(self.generate_doc_id(url))
+
+    def store_document_embeddings(self, text: str, url: str, force: bool = False):
+        """Store document embeddings in the vector store (blocking, run it off the event loop)"""
+        return self.store_batch_embeddings([(text, url)], force=force)[0]
+
+    def store_batch_embeddings(self, documents: List[Tuple[str, str]], force: bool = False) -> List[int]:
+        """
+        Embed several (text, url) documents in one batch and store them in the vector store
+
+        Documents that are already embedded are skipped unless `force` is set, in
+        which case their chunks replace the ones stored before.
+
+        Returns:
+            list: Number of stored chunks per document (0 for skipped documents)
+        """
+        pending = [
+            (position, (text, url)) for position, (text, url) in enumerate(documents)
+            if force or not self.is_embedded(url)
         ]
-        
-        self.collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            documents=documents,
-            metadatas=metadatas
+        stored_chunks = [0] * len(documents)
+        if len(pending) < len(documents):
+            logger.info(f"Skipping {len(documents) - len(pending)} already embedded documents")
+
+        for (position, _), data in zip(pending, self.create_embeddings_batch([document for _, document in pending])):
+            stored_chunks[position] = len(data["chunks"])
+            if not data["chunks"]:
+                continue
+            
+            ids = [self.generate_chunk_id(data["doc_id"], i, chunk) for i, chunk in enumerate(data["chunks"])]
+            self.vector_store.upsert_document(data["doc_id"], data["paper_url"], ids, data["embeddings"], data["chunks"])
+            if self.lexical_index is not None:
+                self.lexical_index.add_document(data["doc_id"], data["paper_url"], ids, data["chunks"])
+            self.invalidate_search_cache(data["doc_id"])
+        return stored_chunks
+
+    def compact(self, page_size: int = 1000) -> int:
+        """
+        Remove duplicate chunks from the collection
+
+        Chunks are duplicates when they belong to the same document and have the
+        same text. For each group the deterministic ID is kept if present,
+        otherwise the first one seen. Afterwards the vector store reclaims the
+        space of deleted chunks, for backends that need it.
+
+        Returns:
+            int: Number of deleted chunks
+        """
+        keep: Dict[Tuple[str, str], str] = {}
+        duplicates: List[str] = []
+        for ids, texts, metadatas in self.vector_store.iter_chunks(page_size):
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                doc_id = metadata.get('doc_id', '')
+                key = (doc_id, hashlib.sha256((text or '').encode('utf-8')).hexdigest())
+                kept_id = keep.get(key)
+                if kept_id is None:
+                    keep[key] = chunk_id
+                elif kept_id.startswith(f"{doc_id}-") and not chunk_id.startswith(f"{doc_id}-"):
+                    duplicates.append(chunk_id)
+                else:
+                    duplicates.append(kept_id)
+                    keep[key] = chunk_id
+
+        for start in range(0, len(duplicates), page_size):
+            self.vector_store.delete(duplicates[start:start + page_size])
+        if self.lexical_index is not None and duplicates:
+            self.lexical_index.delete_chunks(duplicates)
+        self.vector_store.vacuum()
+        logger.info(f"Compaction removed {len(duplicates)} duplicate chunks, {len(keep)} chunks remain")
+        return len(duplicates)
+
+    def sync_lexical_index(self, page_size: int = 1000) -> int:
+        """
+        Index every stored document in the lexical index
+
+        Only needed once for a collection that was filled before the lexical
+        index existed; new documents are indexed as they are stored.
+
+        Returns:
+            int: Number of indexed chunks
+        """
+        if self.lexical_index is None:
+            return 0
+        documents: Dict[str, Dict[str, Any]] = {}
+        for ids, texts, metadatas in self.vector_store.iter_chunks(page_size):
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                document = documents.setdefault(
+                    metadata.get('doc_id', ''),
+                    {'paper_url': metadata.get('paper_url', ''), 'ids': [], 'chunks': []}
+                )
+                document['ids'].append(chunk_id)
+                document['chunks'].append(text)
+
+        for doc_id, document in documents.items():
+            self.lexical_index.add_document(doc_id, document['paper_url'], document['ids'], document['chunks'])
+        indexed = sum(len(document['ids']) for document in documents.values())
+        logger.info(f"Indexed {indexed} chunks of {len(documents)} documents in the lexical index")
+        self.search_cache.clear()
+        return indexed
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Query embedding, served from the query cache when the same text was seen before"""
+        embedding = self.query_embedding_cache.get(query)
+        if embedding is None:
+            embedding = self.encode([query])[0]
+            self.query_embedding_cache.set(query, embedding)
+        return embedding
+
+    def invalidate_search_cache(self, doc_id: str) -> int:
+        """Drop cached results that new chunks of `doc_id` could change: unfiltered ones and ones filtered on it"""
+        return self.search_cache.invalidate(lambda key: key[2] is None or key[2] == doc_id)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {
+            'query_embeddings': self.query_embedding_cache.stats(),
+            'search_results': self.search_cache.stats()
+        }
+
+    def _distances(self, query_embedding: np.ndarray, chunk_ids: List[str]) -> Dict[str, float]:
+        """Cosine distance from the query to stored chunks, for hits that only the lexical search found"""
+        if not chunk_ids:
+            return {}
+        found_ids, embeddings = self.vector_store.get_embeddings(chunk_ids)
+        if not len(embeddings):
+            return {}
+        similarity = embeddings @ query_embedding / (
+            np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query_embedding) + 1e-12
         )
+        return {chunk_id: float(1.0 - value) for chunk_id, value in zip(found_ids, similarity)}
+
+    def _fuse(self, query: str, query_embedding: np.ndarray, dense: Dict[str, Dict[str, Any]], top_k: int,
+              doc_id: Optional[str]) -> List[Dict[str, Any]]:
+        """Merge dense and BM25 candidates with reciprocal-rank fusion and keep the best top_k"""
+        lexical = {
+            hit['chunk_id']: hit
+            for hit in self.lexical_index.search(query, top_k=top_k * self.hybrid_candidates, doc_id=doc_id)
+        }
+        fused = reciprocal_rank_fusion([list(dense), list(lexical)], k=self.rrf_k)[:top_k]
+        distances = self._distances(query_embedding, [key for key, _ in fused if key not in dense])
+
+        chunks = []
+        for key, score in fused:
+            chunk = dense.get(key)
+            if chunk is None:
+                hit = lexical[key]
+                chunk = {
+                    "doc_id": hit['doc_id'],
+                    "paper_url": hit['paper_url'],
+                    "chunk_text": hit['chunk_text'],
+                    "distance": distances.get(key)
+                }
+            chunks.append(dict(chunk, score=score))
+        return chunks
+
+    def search_similar_chunks(self, query: str, top_k: int = 5, url: str = "",
+                              hybrid: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """
+        Search for text chunks relevant to the query
 
-    def search_similar_chunks(self, query: str, top_k: int = 5, url: str = "") -> List[Dict[str, Any]]:
-        """Search for similar text chunks using the query"""
+        Dense search alone, or hybrid: the dense and BM25 top
+        `top_k * hybrid_candidates` are fused with reciprocal-rank fusion, so
+        exact identifiers (star names, catalog IDs, instruments) that embed
+        poorly are still found.
 
-        query_embedding = self.model.encode(query).tolist()
+        Parameters:
+            query (str): Search query
+            top_k (int): Number of chunks to return
+            url (str): Only search the chunks of this paper
+            hybrid (bool): Override the manager's default search mode
+
+        Returns:
+            list: Dicts with 'doc_id', 'paper_url', 'chunk_text', 'distance' and,
+                  for hybrid search, the fused 'score'
+        """
+        hybrid = self.hybrid if hybrid is None else hybrid and self.lexical_index is not None
+
+        query_embedding = self.embed_query(query)
         doc_id = self.generate_doc_id(url) if url else None
 
-        filter = {"doc_id": doc_id} if doc_id else {}
-        
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where=filter
+        cache_key = (hashlib.sha1(query_embedding.tobytes()).hexdigest(), top_k, doc_id, hybrid)
+        # chunks stored while this search runs invalidate the cache; the result is then not cached
+        generation = self.search_cache.generation
+        cached_chunks = self.search_cache.get(cache_key)
+        if cached_chunks is not None:
+            return [dict(chunk) for chunk in cached_chunks]
+
+        results = self.vector_store.query(
+            query_embedding,
+            top_k * self.hybrid_candidates if hybrid else top_k,
+            doc_id=doc_id
         )
         
-        similar_chunks = []
-        for i in range(len(results['ids'][0])):
-            similar_chunks.append({
-                "doc_id": results['metadatas'][0][i].get('doc_id', ''),
-                "paper_url": results['metadatas'][0][i].get('paper_url', ''),
-                "chunk_text": results['documents'][0][i],
-                "distance": results['distances'][0][i]
-            })
+        dense = {}
+        for result in results:
+            dense[result['id']] = {
+                "doc_id": result['doc_id'],
+                "paper_url": result['paper_url'],
+                "chunk_text": result['chunk_text'],
+                "distance": result['distance']
+            }
+
+        if hybrid:
+            similar_chunks = self._fuse(query, query_embedding, dense, top_k, doc_id)
+        else:
+            similar_chunks = list(dense.values())
         
+        self.search_cache.set(cache_key, [dict(chunk) for chunk in similar_chunks], generation=generation)
         return similar_chunks
 
+class EmbeddingWorker:
+    """
+    Dedicated executor for document embedding.
+
+    Documents are queued in a bounded queue and embedded by background
+    threads, so ingestion never runs on the event loop that serves /chat.
+    When the queue is full `submit` blocks (or times out), which pushes
+    back on the producer instead of letting the backlog grow without bound.
+    Each worker drains up to `max_batch` queued documents and embeds them
+    with a single batched encode call.
+    """
+
+    def __init__(self, manager: EmbeddingsManager, workers: int = 1, max_queue: int = 32,
+                 max_batch: int = 8, window_seconds: float = 60.0):
+        self.manager = manager
+        self.max_queue = max_queue
+        self.max_batch = max(1, max_batch)
+        self.window_seconds = window_seconds
+
+        self._queue: "queue.Queue[Optional[Tuple[str, str, Future]]]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._chunks = 0
+        self._busy_seconds = 0.0
+        # (finished_at, documents, chunks) per batch, for windowed throughput
+        self._recent: deque = deque()
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"embedding-worker-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, text: str, url: str, timeout: Optional[float] = None) -> Future:
+        """
+        Queue a document for embedding
+
+        Parameters:
+            text (str): Full text of the document
+            url (str): Paper URL the chunks belong to
+            timeout (float): Seconds to wait for queue space, waits indefinitely if None
+
+        Returns:
+            Future: Resolves to the number of stored chunks
+
+        Raises:
+            queue.Full: If the queue stayed full for `timeout` seconds
+        """
+        future = Future()
+        self._queue.put((text, url, future), timeout=timeout)
+        return future
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    # keep the sentinel for this thread's next iteration
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._embed(batch)
+
+    def _embed(self, batch: List[Tuple[str, str, Future]]) -> None:
+        with self._lock:
+            self._in_flight += len(batch)
+        start = time.monotonic()
+        try:
+            chunk_counts = self.manager.store_batch_embeddings([(text, url) for text, url, _ in batch])
+        except Exception as e:
+            logger.error(f"Failed to embed {len(batch)} documents: {e}", exc_info=True)
+            with self._lock:
+                self._in_flight -= len(batch)
+                self._failed += len(batch)
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        finished = time.monotonic()
+        chunks = sum(chunk_counts)
+        with self._lock:
+            self._in_flight -= len(batch)
+            self._completed += len(batch)
+            self._chunks += chunks
+            self._busy_seconds += finished - start
+            self._recent.append((finished, len(batch), chunks))
+        logger.info(f"Embedded {len(batch)} documents ({chunks} chunks) in {finished - start:.2f}s")
+        for (_, _, future), count in zip(batch, chunk_counts):
+            future.set_result(count)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0][0] > self.window_seconds:
+                self._recent.popleft()
+            recent_documents = sum(documents for _, documents, _ in self._recent)
+            recent_chunks = sum(chunks for _, _, chunks in self._recent)
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'completed_documents': self._completed,
+                'failed_documents': self._failed,
+                'embedded_chunks': self._chunks,
+                'busy_seconds': round(self._busy_seconds, 3),
+                'documents_per_minute': recent_documents * 60.0 / self.window_seconds,
+                'chunks_per_second': recent_chunks / self.window_seconds
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
 # if __name__ == "__main__":
 #     # Create an instance of EmbeddingsManager
 #     manager = EmbeddingsManager()
@@ -102,8 +453,7 @@ class EmbeddingsManager:
 #     sample_url = "http://example.com/sample-document"
 
 #     # Store document embeddings
-#     import asyncio
-#     asyncio.run(manager.store_document_embeddings(sample_text, sample_url))
+#     manager.store_document_embeddings(sample_text, sample_url)
 
 #     # Search for similar chunks
 #     query = "sample document"
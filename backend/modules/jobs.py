@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from modules.utils import arxiv_id_from_link
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+PAPER_DONE = "done"
+PAPER_FAILED = "failed"
+
+
+class JobStore:
+    """
+    Persistent job queue backed by SQLite.
+
+    Jobs and the per-paper progress of each job are written through on every
+    change, so a restarted server can pick up queued or interrupted jobs.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            params TEXT NOT NULL,
+            error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+
+        CREATE TABLE IF NOT EXISTS job_papers (
+            job_id TEXT NOT NULL,
+            arxiv_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            link TEXT NOT NULL,
+            title TEXT,
+            stage TEXT NOT NULL,
+            error TEXT,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (job_id, arxiv_id)
+        );
+    """
+
+    def __init__(self, path: str = "./data/jobs.db"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+
+    def create_job(self, params: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, params, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, json.dumps(params), now, now)
+            )
+        return job_id
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id)
+            )
+
+    def add_papers(self, job_id: str, papers: List[Dict], stage: str = "pending") -> None:
+        now = time.time()
+        rows = [
+            (job_id, arxiv_id_from_link(paper['link']), position, paper['link'], paper.get('title'), stage, now)
+            for position, paper in enumerate(papers)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO job_papers (job_id, arxiv_id, position, link, title, stage, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(job_id, arxiv_id) DO UPDATE SET stage = excluded.stage, updated_at = excluded.updated_at
+                """,
+                rows
+            )
+
+    def set_paper_stage(self, job_id: str, link: str, stage: str, error: Optional[str] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE job_papers SET stage = ?, error = ?, updated_at = ? WHERE job_id = ? AND arxiv_id = ?",
+                (stage, error, time.time(), job_id, arxiv_id_from_link(link))
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            papers = self._conn.execute(
+                "SELECT arxiv_id, link, title, stage, error FROM job_papers WHERE job_id = ? ORDER BY position",
+                (job_id,)
+            ).fetchall()
+        job = dict(job)
+        job['params'] = json.loads(job['params'])
+        job['papers'] = [dict(paper) for paper in papers]
+        return job
+
+    def unfinished_jobs(self) -> List[str]:
+        """Queued jobs and jobs that were running when the server stopped, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (JOB_QUEUED, JOB_RUNNING)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobManager:
+    """
+    Runs queued jobs on a pool of asyncio workers.
+
+    `runner` is the job body: it receives the job id, the submitted parameters
+    and the JobStore, and is expected to record per-paper progress itself. It
+    may return a note (e.g. on papers that failed), which a completed job
+    keeps in its `error` field.
+    """
+
+    def __init__(self, store: JobStore, runner: Callable[[str, Dict[str, Any], JobStore], Awaitable[Optional[str]]],
+                 workers: int = 2):
+        self.store = store
+        self.runner = runner
+        self.workers = max(1, workers)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        resumed = self.store.unfinished_jobs()
+        for job_id in resumed:
+            self.store.set_status(job_id, JOB_QUEUED)
+            self._queue.put_nowait(job_id)
+        if resumed:
+            logger.info(f"Resuming {len(resumed)} unfinished jobs")
+
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} job workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, params: Dict[str, Any]) -> str:
+        job_id = self.store.create_job(params)
+        self._queue.put_nowait(job_id)
+        logger.info(f"Queued job {job_id} with params {params}")
+        return job_id
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = self.store.get_job(job_id)
+            if job is None:
+                continue
+
+            logger.info(f"Worker {worker_id} running job {job_id}")
+            self.store.set_status(job_id, JOB_RUNNING)
+            try:
+                note = await self.runner(job_id, job['params'], self.store)
+                self.store.set_status(job_id, JOB_COMPLETED, error=note)
+                logger.info(f"Job {job_id} completed")
+            except asyncio.CancelledError:
+                # left as running so it is resumed on the next start
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+                self.store.set_status(job_id, JOB_FAILED, error=str(e))
@@ -0,0 +1,227 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence
+
+from modules.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+QUERY_TOKEN = re.compile(r'\w+')
+
+
+def _query_terms(query: str) -> List[str]:
+    """Distinct query tokens, folded the way FTS5's unicode61 tokenizer folds indexed text."""
+    folded = unicodedata.normalize('NFKD', query.lower())
+    folded = ''.join(char for char in folded if not unicodedata.combining(char))
+    return list(dict.fromkeys(QUERY_TOKEN.findall(folded)))
+
+
+class LexicalIndex:
+    """
+    Persistent BM25 index over chunk text, backed by SQLite FTS5.
+
+    Chunks are keyed by the same IDs as in the vector store, so lexical and
+    dense results can be fused. `chunks` maps the FTS rowid to the chunk and
+    its document.
+
+    Ranking costs a few microseconds per matching chunk, so a query only
+    searches for its rarest terms, as many as fit in `max_postings` matching
+    chunks together. Common terms are what the dense side is good at anyway;
+    the lexical side is there for rare identifiers (star names, catalog IDs),
+    whose posting lists are short. A query with nothing but common terms gets
+    no lexical results. Terms found to be common are remembered, so they are
+    only counted once.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS chunks (
+            rowid INTEGER PRIMARY KEY,
+            chunk_id TEXT NOT NULL UNIQUE,
+            doc_id TEXT NOT NULL,
+            paper_url TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_chunks_doc_id ON chunks(doc_id);
+        CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+            chunk_text, tokenize = 'unicode61 remove_diacritics 2'
+        );
+    """
+
+    def __init__(self, path: str = "./data/lexical_index.db", max_postings: int = 1000,
+                 common_terms_cache: int = 100_000):
+        """
+        Parameters:
+            path (str): SQLite database file
+            max_postings (int): Matching chunks a query may rank, summed over its terms
+            common_terms_cache (int): Common terms remembered, so they are not counted again
+        """
+        self.path = path
+        self.max_postings = max_postings
+        self._common_terms = LRUCache(max_entries=common_terms_cache)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+            self._count = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        self.queries = 0
+        self.skipped_terms = 0
+        logger.info(f"Opened lexical index at {path} ({self._count} chunks)")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _delete_rowids(self, rowids: List[int]) -> None:
+        # called with the lock held, inside a transaction
+        for start in range(0, len(rowids), 500):
+            batch = rowids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            self._conn.execute(f"DELETE FROM chunks_fts WHERE rowid IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM chunks WHERE rowid IN ({placeholders})", batch)
+        self._count -= len(rowids)
+
+    def add_document(self, doc_id: str, paper_url: str, chunk_ids: Sequence[str], chunks: Sequence[str]) -> None:
+        """Index a document's chunks, replacing whatever was indexed for it before."""
+        with self._lock, self._conn:
+            rowids = [row[0] for row in self._conn.execute("SELECT rowid FROM chunks WHERE doc_id = ?", (doc_id,))]
+            self._delete_rowids(rowids)
+            for chunk_id, chunk in zip(chunk_ids, chunks):
+                # a chunk ID shared with another document is moved here
+                existing = self._conn.execute("SELECT rowid FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+                if existing:
+                    self._delete_rowids([existing[0]])
+                cursor = self._conn.execute(
+                    "INSERT INTO chunks (chunk_id, doc_id, paper_url) VALUES (?, ?, ?)", (chunk_id, doc_id, paper_url)
+                )
+                self._conn.execute("INSERT INTO chunks_fts (rowid, chunk_text) VALUES (?, ?)",
+                                   (cursor.lastrowid, chunk))
+                self._count += 1
+
+    def delete_chunks(self, chunk_ids: Sequence[str]) -> int:
+        """Remove chunks by ID; returns how many were indexed."""
+        rowids = []
+        with self._lock, self._conn:
+            for chunk_id in chunk_ids:
+                row = self._conn.execute("SELECT rowid FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+                if row:
+                    rowids.append(row[0])
+            self._delete_rowids(rowids)
+        # with fewer chunks a term may no longer be common
+        self._common_terms.clear()
+        return len(rowids)
+
+    def _postings(self, term: str, limit: int) -> int:
+        """Chunks containing the term, counted up to limit + 1 (called with the lock held)."""
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM (SELECT rowid FROM chunks_fts WHERE chunks_fts MATCH ? LIMIT ?)",
+            (f'"{term}"', limit + 1)
+        ).fetchone()[0]
+
+    def _match_expression(self, query: str) -> Optional[str]:
+        # called with the lock held
+        counted = []
+        for term in _query_terms(query):
+            if self._common_terms.get(term):
+                self.skipped_terms += 1
+                continue
+            postings = self._postings(term, self.max_postings)
+            if postings > self.max_postings:
+                self._common_terms.set(term, True)
+                self.skipped_terms += 1
+            elif postings:
+                counted.append((postings, term))
+
+        # rarest first, as many as the postings budget allows
+        terms, total = [], 0
+        for postings, term in sorted(counted):
+            if total + postings > self.max_postings:
+                self.skipped_terms += 1
+                continue
+            terms.append(term)
+            total += postings
+        if not terms:
+            return None
+        return " OR ".join(f'"{term}"' for term in terms)
+
+    def search(self, query: str, top_k: int = 20, doc_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Best BM25 matches for a query
+
+        Parameters:
+            query (str): Free-text query; every term is optional (OR)
+            top_k (int): Number of chunks to return
+            doc_id (str): Only search the chunks of this document
+
+        Returns:
+            list: Dicts with 'chunk_id', 'doc_id', 'paper_url', 'chunk_text' and 'score'
+                  (FTS5 bm25, lower is better), best first
+        """
+        with self._lock:
+            self.queries += 1
+            expression = self._match_expression(query)
+            if expression is None:
+                return []
+            if doc_id:
+                sql = """
+                    SELECT c.chunk_id, c.doc_id, c.paper_url, f.chunk_text, f.rank
+                    FROM chunks_fts f JOIN chunks c ON c.rowid = f.rowid
+                    WHERE chunks_fts MATCH ? AND f.rowid IN (SELECT rowid FROM chunks WHERE doc_id = ?)
+                    ORDER BY f.rank LIMIT ?
+                """
+                params = (expression, doc_id, top_k)
+            else:
+                # ORDER BY rank directly on the FTS table lets FTS5 keep only the best top_k
+                sql = """
+                    SELECT c.chunk_id, c.doc_id, c.paper_url, f.chunk_text, f.rank
+                    FROM (SELECT rowid, chunk_text, rank FROM chunks_fts
+                          WHERE chunks_fts MATCH ? ORDER BY rank LIMIT ?) f
+                    JOIN chunks c ON c.rowid = f.rowid
+                    ORDER BY f.rank
+                """
+                params = (expression, top_k)
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {'chunk_id': chunk_id, 'doc_id': doc, 'paper_url': paper_url or '', 'chunk_text': text, 'score': score}
+            for chunk_id, doc, paper_url, text, score in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'chunks': self._count, 'queries': self.queries, 'skipped_terms': self.skipped_terms}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60,
+                           weights: Optional[Sequence[float]] = None) -> List[tuple]:
+    """
+    Fuse several rankings of the same items
+
+    Each item scores sum(weight / (k + rank)) over the rankings it appears in
+    (rank starting at 1), so items ranked well by several retrievers rise to
+    the top without having to calibrate their scores against each other.
+
+    Parameters:
+        rankings (list): Lists of item keys, best first
+        k (int): Damping constant; larger values flatten the contribution of top ranks
+        weights (list): Weight per ranking, 1.0 each by default
+
+    Returns:
+        list: (key, fused score) pairs, best first
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
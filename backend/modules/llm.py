@@ -0,0 +1,283 @@
+import hashlib
+import os
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterator, Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class LLMProvider:
+    """Text generation backend used by the chat, summarization and extraction steps."""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Yield the response in pieces as they are produced; defaults to a single piece."""
+        yield self.generate(prompt, timeout=timeout)
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini through google-generativeai."""
+
+    def __init__(self, model_name: str = "gemini-1.5-flash-8b"):
+        super().__init__(model_name)
+        import google.generativeai as genai
+
+        api_key = os.getenv('GOOGLE_API_KEY')
+        if not api_key:
+            logger.error("GOOGLE_API_KEY not found in environment variables")
+            raise ValueError("GOOGLE_API_KEY is required")
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+        logger.info(f"Initialized Gemini model: {model_name}")
+
+    def _request_options(self, timeout: Optional[float]) -> Dict[str, float]:
+        return {'timeout': timeout} if timeout else {}
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        return self.model.generate_content(prompt, request_options=self._request_options(timeout)).text
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        for chunk in self.model.generate_content(prompt, stream=True, request_options=self._request_options(timeout)):
+            # chunks without candidates (e.g. safety/usage metadata) have no text
+            if chunk.parts:
+                yield chunk.text
+
+
+class FakeProvider(LLMProvider):
+    """
+    Deterministic local model for tests and offline development.
+
+    Returns `response` (or an echo of the end of the prompt) word by word,
+    optionally pausing between words to mimic generation latency.
+    """
+
+    def __init__(self, model_name: str = "fake", response: Optional[str] = None, delay: float = 0.0):
+        super().__init__(model_name)
+        self.response = response
+        self.delay = delay
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        return self.response if self.response is not None else f"Echo: {prompt.strip()[-200:]}"
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        words = self.generate(prompt).split(' ')
+        for i, word in enumerate(words):
+            if self.delay:
+                time.sleep(self.delay)
+            yield word if i == len(words) - 1 else f"{word} "
+
+
+class LLMCache:
+    """
+    Persistent cache of LLM completions backed by SQLite.
+
+    Entries are keyed by model name and the SHA-256 of the prompt, and tagged
+    with the call site ("summary", "insights", "chat", ...) that produced them.
+    Each call site can have its own TTL; sites without one never expire. The
+    cache is bounded by the total size of the stored responses and evicts the
+    least recently used entries first. Every entry remembers how long the
+    original call took, which is reported as latency saved on each hit.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            site TEXT NOT NULL,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            latency REAL NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at);
+    """
+
+    def __init__(self, path: str = "./data/llm_cache.db", max_bytes: Optional[int] = 256 * 1024 ** 2,
+                 ttls: Optional[Dict[str, float]] = None, bypass: bool = False):
+        """
+        Parameters:
+            path (str): SQLite database file
+            max_bytes (int): Size budget for all stored responses
+            ttls (dict): Seconds before an entry expires, per call site
+            bypass (bool): Skip lookups (responses are still stored, refreshing the cache)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(ttls or {})
+        self.bypass = bypass
+
+        self.evictions = 0
+        self._site_stats: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {'hits': 0, 'misses': 0, 'bypassed': 0, 'latency_saved': 0.0}
+        )
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+            self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\x00{prompt}".encode('utf-8')).hexdigest()
+
+    def get(self, model: str, prompt: str, site: str = "default", bypass: bool = False) -> Optional[str]:
+        """Cached response for the prompt, or None on a miss, an expired entry or a bypassed lookup."""
+        if bypass or self.bypass:
+            with self._lock:
+                self._site_stats[site]['bypassed'] += 1
+            return None
+
+        key = self.make_key(model, prompt)
+        now = time.time()
+        ttl = self.ttls.get(site)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response, size, latency, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and ttl is not None and now - row[3] > ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._bytes -= row[1]
+                row = None
+            if row is None:
+                self._site_stats[site]['misses'] += 1
+                return None
+
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._site_stats[site]['hits'] += 1
+            self._site_stats[site]['latency_saved'] += row[2]
+        logger.debug(f"LLM cache hit for {site} ({model})")
+        return row[0]
+
+    def put(self, model: str, prompt: str, response: str, site: str = "default", latency: float = 0.0) -> None:
+        key = self.make_key(model, prompt)
+        size = len(response.encode('utf-8'))
+        now = time.time()
+        with self._lock, self._conn:
+            previous = self._conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO llm_cache (key, model, site, response, size, latency, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, model, site, response, size, latency, now, now)
+            )
+            self._bytes += size - (previous[0] if previous else 0)
+            self._evict()
+
+    def _evict(self) -> None:
+        if self.max_bytes is None or self._bytes <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at").fetchall()
+        removed = []
+        for key, size in rows:
+            if self._bytes <= self.max_bytes:
+                break
+            removed.append((key,))
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", removed)
+        self.evictions += len(removed)
+        logger.debug(f"Evicted {len(removed)} entries from the LLM cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            sites = {site: dict(counts) for site, counts in self._site_stats.items()}
+        hits = sum(counts['hits'] for counts in sites.values())
+        misses = sum(counts['misses'] for counts in sites.values())
+        return {
+            'entries': entries,
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'latency_saved': sum(counts['latency_saved'] for counts in sites.values()),
+            'evictions': self.evictions,
+            'sites': sites
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedProvider(LLMProvider):
+    """
+    Wraps a provider so its completions go through an LLMCache under one call site.
+
+    Only successful responses are stored; errors always reach the caller.
+    A cache hit on `stream` yields the whole cached response as one piece.
+    """
+
+    def __init__(self, provider: LLMProvider, cache: LLMCache, site: str):
+        super().__init__(provider.model_name)
+        self.provider = provider
+        self.cache = cache
+        self.site = site
+
+    def generate(self, prompt: str, timeout: Optional[float] = None, bypass: bool = False) -> str:
+        cached = self.cache.get(self.model_name, prompt, site=self.site, bypass=bypass)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        response = self.provider.generate(prompt, timeout=timeout)
+        self.cache.put(self.model_name, prompt, response, site=self.site, latency=time.perf_counter() - start)
+        return response
+
+    def stream(self, prompt: str, timeout: Optional[float] = None, bypass: bool = False) -> Iterator[str]:
+        cached = self.cache.get(self.model_name, prompt, site=self.site, bypass=bypass)
+        if cached is not None:
+            yield cached
+            return
+
+        start = time.perf_counter()
+        pieces = []
+        for piece in self.provider.stream(prompt, timeout=timeout):
+            pieces.append(piece)
+            yield piece
+        self.cache.put(self.model_name, prompt, ''.join(pieces), site=self.site, latency=time.perf_counter() - start)
+
+
+def with_cache(provider: LLMProvider, cache: Optional[LLMCache], site: str) -> LLMProvider:
+    """Route a provider's calls through `cache` under `site`; returns the provider unchanged without a cache."""
+    if cache is None:
+        return provider
+    return CachedProvider(provider, cache, site)
+
+
+def get_llm_provider(provider: str = "gemini", model_name: str = "gemini-1.5-flash-8b") -> LLMProvider:
+    """
+    Create an LLM provider
+
+    Parameters:
+        provider (str): 'gemini' or 'fake'
+        model_name (str): Model to use
+
+    Returns:
+        LLMProvider: Provider instance
+    """
+    if provider == "gemini":
+        return GeminiProvider(model_name)
+    if provider == "fake":
+        return FakeProvider(model_name)
+    raise ValueError(f"Unknown LLM provider: {provider}")
@@ -0,0 +1,233 @@
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from modules.llm import LLMProvider
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses (and google.api_core exception names) worth retrying: quota, overload and transient server errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'InternalServerError',
+    'DeadlineExceeded', 'GatewayTimeout', 'Aborted'
+}
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """A request could not be completed (including waiting for quota and retries) before its deadline."""
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError)) and not isinstance(error, LLMDeadlineExceeded):
+        return True
+    code = getattr(error, 'code', None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS:
+        return True
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for quota accounting."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute` units per minute up to `capacity`. Not thread-safe on its own."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available, assuming the bucket was just refilled."""
+        missing = amount - self.level
+        return max(0.0, missing / self.rate) if self.rate > 0 else float('inf')
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+
+class LLMClient(LLMProvider):
+    """
+    Shared, quota-aware front end for an LLMProvider.
+
+    Every call is admitted through token buckets for requests and tokens per
+    minute and a concurrency limit, and retried with jittered exponential
+    backoff on quota and transient errors, all within a per-request deadline.
+
+    Requests waiting for admission are served smallest first, so short
+    prompts are packed into whatever token budget is left instead of queueing
+    behind a large one. A request that has waited longer than
+    `starvation_after` seconds is served first regardless of its size.
+    """
+
+    def __init__(self, provider: LLMProvider, requests_per_minute: float = 15, tokens_per_minute: float = 1_000_000,
+                 max_concurrency: int = 4, max_retries: int = 5, backoff_base: float = 1.0,
+                 backoff_max: float = 60.0, request_timeout: float = 120.0, output_tokens: int = 1024,
+                 starvation_after: float = 30.0):
+        """
+        Parameters:
+            provider (LLMProvider): Backend that performs the calls
+            requests_per_minute (float): Request quota
+            tokens_per_minute (float): Token quota (prompt estimate plus `output_tokens` per request)
+            max_concurrency (int): Calls in flight at once
+            max_retries (int): Retries per request after the first attempt
+            backoff_base (float): First backoff ceiling in seconds, doubled per retry
+            backoff_max (float): Largest backoff ceiling in seconds
+            request_timeout (float): Default deadline per request, covering queueing and retries
+            output_tokens (int): Tokens reserved for each response
+            starvation_after (float): Seconds after which a waiting request jumps the queue
+        """
+        super().__init__(provider.model_name)
+        self.provider = provider
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_timeout = request_timeout
+        self.output_tokens = output_tokens
+        self.starvation_after = starvation_after
+
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting: List[Tuple[int, int, float]] = []
+        self._active = 0
+
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.deadline_exceeded = 0
+        self.queued_seconds = 0.0
+
+    def _next_ticket(self, now: float) -> Tuple[int, int, float]:
+        starving = [ticket for ticket in self._waiting if now - ticket[2] >= self.starvation_after]
+        if starving:
+            return min(starving, key=lambda ticket: ticket[1])
+        return min(self._waiting)
+
+    def _acquire(self, tokens: int, deadline: float) -> None:
+        with self._cond:
+            ticket = (tokens, next(self._seq), time.monotonic())
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._requests.refill(now)
+                    self._tokens.refill(now)
+                    is_next = self._next_ticket(now) is ticket
+                    wait = 0.5
+                    if is_next:
+                        wait = max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+                        if wait == 0:
+                            if self._active < self.max_concurrency:
+                                self._requests.take(1)
+                                self._tokens.take(tokens)
+                                self._active += 1
+                                self.queued_seconds += now - ticket[2]
+                                return
+                            wait = 0.5
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.deadline_exceeded += 1
+                        raise LLMDeadlineExceeded("Deadline exceeded while waiting for LLM quota")
+                    # woken early by releases; the timeout covers bucket refills
+                    self._cond.wait(timeout=min(remaining, max(0.01, wait)))
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+
+    def _release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _request_tokens(self, prompt: str) -> int:
+        return int(min(estimate_tokens(prompt) + self.output_tokens, self._tokens.capacity))
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter keeps retries from many threads from arriving in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _should_retry(self, error: Exception, attempt: int, deadline: float) -> Optional[float]:
+        """Backoff delay before the next attempt, or None if the error should be raised."""
+        if not is_retryable(error) or attempt > self.max_retries:
+            return None
+        delay = self._backoff(attempt)
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        deadline = time.monotonic() + (timeout or self.request_timeout)
+        tokens = self._request_tokens(prompt)
+
+        for attempt in itertools.count(1):
+            self._acquire(tokens, deadline)
+            try:
+                self.calls += 1
+                return self.provider.generate(prompt, timeout=max(0.1, deadline - time.monotonic()))
+            except Exception as e:
+                error = e
+            finally:
+                self._release()
+
+            delay = self._should_retry(error, attempt, deadline)
+            if delay is None:
+                self.failures += 1
+                raise error
+            self.retries += 1
+            logger.warning(f"LLM call failed ({type(error).__name__}: {error}), retry {attempt} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Stream a response; retries only happen before the first piece has been yielded."""
+        deadline = time.monotonic() + (timeout or self.request_timeout)
+        tokens = self._request_tokens(prompt)
+
+        for attempt in itertools.count(1):
+            started = False
+            self._acquire(tokens, deadline)
+            try:
+                self.calls += 1
+                for piece in self.provider.stream(prompt, timeout=max(0.1, deadline - time.monotonic())):
+                    started = True
+                    yield piece
+                return
+            except Exception as e:
+                error = e
+            finally:
+                self._release()
+
+            delay = None if started else self._should_retry(error, attempt, deadline)
+            if delay is None:
+                self.failures += 1
+                raise error
+            self.retries += 1
+            logger.warning(f"LLM stream failed ({type(error).__name__}: {error}), retry {attempt} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'calls': self.calls,
+                'retries': self.retries,
+                'failures': self.failures,
+                'deadline_exceeded': self.deadline_exceeded,
+                'queued_seconds': self.queued_seconds,
+                'active': self._active,
+                'waiting': len(self._waiting),
+                'requests_available': self._requests.level,
+                'tokens_available': self._tokens.level
+            }
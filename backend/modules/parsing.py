@@ -0,0 +1,269 @@
+import gzip
+import hashlib
+import io
+import json
+import logging
+import math
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ParsedDocument:
+    """A parsed chunk of a paper; mirrors the `text`/`metadata` fields of LlamaParse documents."""
+    text: str
+    metadata: Dict = field(default_factory=dict)
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Content hash of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    Persistent cache of parsed PDFs keyed by the PDF's content hash.
+
+    Each entry is the list of parsed documents stored as gzip-compressed JSON.
+    Entries are namespaced by parser, so switching the parsing backend or its
+    output format never returns a parse produced by another configuration.
+    """
+
+    def __init__(self, directory: str = "./data/cache/parsed", compression_level: int = 6):
+        self.directory = directory
+        self.compression_level = compression_level
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, pdf_hash: str, namespace: str) -> str:
+        return os.path.join(self.directory, f"{namespace}-{pdf_hash}.json.gz")
+
+    def get(self, pdf_hash: str, namespace: str = "default") -> Optional[List[ParsedDocument]]:
+        path = self._path(pdf_hash, namespace)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except (OSError, EOFError, json.JSONDecodeError) as e:
+            logger.warning(f"Discarding unreadable parse cache entry {path}: {e}")
+            os.remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        logger.debug(f"Parse cache hit for {pdf_hash}")
+        return [ParsedDocument(text=entry['text'], metadata=entry.get('metadata', {})) for entry in entries]
+
+    def put(self, pdf_hash: str, documents: List[ParsedDocument], namespace: str = "default") -> None:
+        path = self._path(pdf_hash, namespace)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        entries = [{'text': doc.text, 'metadata': doc.metadata} for doc in documents]
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=self.compression_level) as f:
+            json.dump(entries, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+        logger.debug(f"Stored {len(documents)} parsed documents for {pdf_hash}")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+class PDFParser:
+    """Turns a PDF file into a list of ParsedDocument, one per page or section."""
+
+    # identifies the backend and its output format in the parse cache
+    name = "base"
+
+    def parse(self, pdf_path: str) -> List[ParsedDocument]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class LlamaParseParser(PDFParser):
+    """Remote parsing through the LlamaParse service (markdown output)."""
+
+    name = "llamaparse-markdown"
+
+    def __init__(self, parsing_instruction: str = "", show_progress: bool = True):
+        from llama_parse import LlamaParse
+
+        self.parser = LlamaParse(result_type="markdown", parsing_instruction=parsing_instruction,
+                                 show_progress=show_progress)
+
+    def parse(self, pdf_path: str) -> List[ParsedDocument]:
+        return [
+            ParsedDocument(text=doc.text, metadata=dict(doc.metadata or {}))
+            for doc in self.parser.load_data(pdf_path)
+        ]
+
+
+NUMBERED_HEADING = re.compile(r'^((?:\d+\.)*\d+|[IVX]+)\.?\s+([A-Z][A-Za-z0-9 ,:;&()/\'-]{1,80})$')
+NAMED_HEADING = re.compile(
+    r'^(abstract|introduction|conclusions?|summary(?: and conclusions?)?|discussion|results|methods?|'
+    r'observations?|data|acknowledge?ments?|references|bibliography|appendix(?: [A-Z])?)\.?$',
+    re.IGNORECASE
+)
+HYPHENATED_BREAK = re.compile(r'(\w)-\n(\w)')
+
+
+def _heading_level(line: str) -> int:
+    """Markdown heading level for a line that looks like a section title, 0 otherwise."""
+    if len(line) > 90 or line.endswith((',', ';')):
+        return 0
+    match = NUMBERED_HEADING.match(line)
+    if match:
+        number = match.group(1)
+        return min(3, number.count('.') + 1) if number[0].isdigit() else 1
+    if NAMED_HEADING.match(line):
+        return 1
+    return 0
+
+
+def page_text_to_markdown(text: str) -> str:
+    """
+    Rebuild light markdown structure from extracted page text
+
+    Rejoins words hyphenated across lines and marks lines that look like
+    section titles ("2.1 Observations", "CONCLUSIONS", ...) as markdown headings.
+    """
+    text = HYPHENATED_BREAK.sub(r'\1\2', text)
+    lines = []
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            lines.append('')
+            continue
+        level = _heading_level(line)
+        if level:
+            lines.extend(['', f"{'#' * level} {line}", ''])
+        else:
+            lines.append(line)
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def _extract_pages(pdf_bytes: bytes, start: int, end: int) -> List[Tuple[int, str]]:
+    """Process-pool task: extract pages [start, end) of a PDF, given as its bytes, as markdown."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    return [(index, page_text_to_markdown(reader.pages[index].extract_text() or '')) for index in range(start, end)]
+
+
+def _pool_context() -> multiprocessing.context.BaseContext:
+    """
+    Start method for the extraction pool. Forking the app, with its stage thread
+    pools and SQLite connections, can leave a child blocked on a lock another
+    thread held at fork time, so workers are forked from a single-threaded fork
+    server that has only this module preloaded. Without a fork server, fresh
+    interpreters are spawned. Either way each worker re-imports the script the
+    process was started from, so the app is served through `uvicorn main:app`.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class LocalPDFParser(PDFParser):
+    """
+    In-process, CPU-only text extraction with pypdf.
+
+    The PDF is read once and its pages are split into at most `workers`
+    contiguous ranges (of at least `pages_per_task` pages), which are
+    extracted in a process pool. Each task receives the file's bytes and
+    parses the PDF structure itself, so a paper is parsed once per range plus
+    once in the parent for its page count; larger ranges keep that overhead
+    down. Section headings are recovered heuristically and emitted as
+    markdown headings, so the output has the same shape as LlamaParse's
+    markdown documents (one document per page).
+    """
+
+    name = "local-pypdf"
+
+    def __init__(self, workers: Optional[int] = None, pages_per_task: int = 8):
+        self.workers = workers or os.cpu_count() or 1
+        self.pages_per_task = max(1, pages_per_task)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+            return self._executor
+
+    def _page_ranges(self, page_count: int) -> List[Tuple[int, int]]:
+        tasks = max(1, min(self.workers, page_count // self.pages_per_task))
+        size = math.ceil(page_count / tasks) if page_count else 0
+        return [(start, min(start + size, page_count)) for start in range(0, page_count, size or 1)]
+
+    def parse(self, pdf_path: str) -> List[ParsedDocument]:
+        from pypdf import PdfReader
+
+        with open(pdf_path, 'rb') as f:
+            pdf_bytes = f.read()
+        page_count = len(PdfReader(io.BytesIO(pdf_bytes)).pages)
+        ranges = self._page_ranges(page_count)
+
+        if len(ranges) <= 1:
+            pages = [page for start, end in ranges for page in _extract_pages(pdf_bytes, start, end)]
+        else:
+            executor = self._get_executor()
+            futures = [executor.submit(_extract_pages, pdf_bytes, start, end) for start, end in ranges]
+            pages = [page for future in futures for page in future.result()]
+
+        logger.debug(f"Extracted {page_count} pages locally from {pdf_path} in {len(ranges)} tasks")
+        return [
+            ParsedDocument(text=text, metadata={'page': index + 1, 'file_path': pdf_path})
+            for index, text in pages
+            if text
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def get_parser(backend: str = "llamaparse", **kwargs) -> PDFParser:
+    """
+    Create a PDF parser for the configured backend
+
+    Parameters:
+        backend (str): 'llamaparse' (remote service) or 'local' (pypdf, offline)
+
+    Returns:
+        PDFParser: Parser instance
+    """
+    if backend == "llamaparse":
+        return LlamaParseParser(**kwargs)
+    if backend == "local":
+        return LocalPDFParser(**kwargs)
+    raise ValueError(f"Unknown PDF parser backend: {backend}")
@@ -0,0 +1,238 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import requests
+
+from modules.utils import arxiv_id_from_link, get_http_session
+
+logger = logging.getLogger(__name__)
+
+VERSIONED_ID = re.compile(r'v\d+$')
+
+
+class PDFCache:
+    """
+    On-disk cache of arXiv PDFs keyed by arXiv id and version.
+
+    Files are streamed to disk in chunks through a pooled HTTP session. Each
+    PDF has a small JSON sidecar with its ETag/Last-Modified headers, which are
+    sent back as conditional request headers when an entry is revalidated.
+    Versioned ids (e.g. 2411.09566v1) never change on arXiv and are served
+    without a request; unversioned ids always revalidate. The cache is bounded
+    by total size and evicts the least recently used PDFs first, skipping PDFs
+    that are in use: being fetched, or pinned by a caller that is still
+    reading them (see `checkout`).
+    """
+
+    def __init__(self, directory: str = "./data/cache/pdfs", max_bytes: int = 2 * 1024 ** 3,
+                 base_url: str = "https://arxiv.org/pdf", session: Optional[requests.Session] = None,
+                 revalidate_after: Optional[float] = None, chunk_size: int = 64 * 1024, timeout: float = 60.0):
+        """
+        Parameters:
+            directory (str): Where PDFs and their metadata are stored
+            max_bytes (int): Size budget for all cached PDFs
+            base_url (str): PDF endpoint, overridable to point at a local server
+            session (requests.Session): HTTP session to use, defaults to the shared pooled session
+            revalidate_after (float): Seconds after which versioned entries are revalidated too
+            chunk_size (int): Bytes per streamed write
+            timeout (float): Connect/read timeout per request
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.base_url = base_url.rstrip('/')
+        self.session = session or get_http_session()
+        self.revalidate_after = revalidate_after
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        # PDF path -> number of callers using it, guarded by _lock
+        self._in_use: Dict[str, int] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _key(self, arxiv_id: str) -> str:
+        # old-style ids contain a slash (astro-ph/0601001v1)
+        return arxiv_id.replace('/', '_')
+
+    def _pdf_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _load_meta(self, key: str) -> Dict:
+        try:
+            with open(self._meta_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_meta(self, key: str, meta: Dict) -> None:
+        with open(self._meta_path(key), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    def _is_fresh(self, arxiv_id: str, meta: Dict) -> bool:
+        if not VERSIONED_ID.search(arxiv_id):
+            return False
+        if self.revalidate_after is None:
+            return True
+        return time.time() - meta.get('fetched_at', 0) < self.revalidate_after
+
+    def fetch(self, arxiv_id: str, pin: bool = False) -> str:
+        """
+        Return the path of the cached PDF, downloading or revalidating it if needed
+
+        Parameters:
+            arxiv_id (str): arXiv id or link
+            pin (bool): Keep the PDF from being evicted until `release` is called with its path
+
+        Returns:
+            str: Path to the PDF inside the cache directory
+        """
+        if "arxiv.org" in arxiv_id:
+            arxiv_id = arxiv_id_from_link(arxiv_id)
+        key = self._key(arxiv_id)
+        pdf_path = self._pdf_path(key)
+
+        self._pin(pdf_path)
+        try:
+            if self._fetch(arxiv_id, key, pdf_path):
+                self.evict()
+        except BaseException:
+            self.release(pdf_path)
+            raise
+        if not pin:
+            self.release(pdf_path)
+        return pdf_path
+
+    @contextmanager
+    def checkout(self, arxiv_id: str) -> Iterator[str]:
+        """Fetch a PDF and keep it from being evicted while the block uses it."""
+        pdf_path = self.fetch(arxiv_id, pin=True)
+        try:
+            yield pdf_path
+        finally:
+            self.release(pdf_path)
+
+    def release(self, pdf_path: str) -> None:
+        """Drop a pin taken with `fetch(pin=True)`."""
+        with self._lock:
+            count = self._in_use.get(pdf_path, 0) - 1
+            if count > 0:
+                self._in_use[pdf_path] = count
+            else:
+                self._in_use.pop(pdf_path, None)
+
+    def _pin(self, pdf_path: str) -> None:
+        with self._lock:
+            self._in_use[pdf_path] = self._in_use.get(pdf_path, 0) + 1
+
+    def _fetch(self, arxiv_id: str, key: str, pdf_path: str) -> bool:
+        """Serve, revalidate or download the PDF at `pdf_path`; True when it was downloaded."""
+        with self._key_lock(key):
+            meta = self._load_meta(key) if os.path.exists(pdf_path) else {}
+            if meta and self._is_fresh(arxiv_id, meta):
+                os.utime(pdf_path)
+                self.hits += 1
+                logger.debug(f"PDF cache hit for {arxiv_id}")
+                return False
+
+            headers = {}
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+            url = f"{self.base_url}/{arxiv_id}.pdf"
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 304:
+                    meta['fetched_at'] = time.time()
+                    self._save_meta(key, meta)
+                    os.utime(pdf_path)
+                    self.revalidated += 1
+                    logger.debug(f"PDF for {arxiv_id} not modified, using cached copy")
+                    return False
+
+                response.raise_for_status()
+                tmp_path = f"{pdf_path}.part"
+                size = 0
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        f.write(chunk)
+                        size += len(chunk)
+                os.replace(tmp_path, pdf_path)
+
+                self._save_meta(key, {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'fetched_at': time.time(),
+                    'size': size
+                })
+            self.misses += 1
+            logger.info(f"Downloaded {arxiv_id} ({size} bytes) into the PDF cache")
+        return True
+
+    def invalidate(self, arxiv_id: str) -> None:
+        """Drop a cached PDF, e.g. after it failed to parse."""
+        if "arxiv.org" in arxiv_id:
+            arxiv_id = arxiv_id_from_link(arxiv_id)
+        key = self._key(arxiv_id)
+        with self._key_lock(key):
+            for path in (self._pdf_path(key), self._meta_path(key)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def evict(self) -> None:
+        """Remove least recently used PDFs until the cache fits in max_bytes, skipping the ones in use."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith('.pdf'):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path in self._in_use:
+                    continue
+                try:
+                    os.remove(path)
+                    meta_path = path[:-len('.pdf')] + '.json'
+                    if os.path.exists(meta_path):
+                        os.remove(meta_path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+                logger.debug(f"Evicted {path} from the PDF cache")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,157 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from modules.data_extractor import extract_metadata
+from modules.utils import download_pdf
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("download", "parse", "extract", "embed")
+
+# called with (paper link, stage or 'done'/'failed', error message)
+ProgressCallback = Callable[[str, str, Optional[str]], None]
+
+
+class PaperProcessingError(Exception):
+    """Raised when a paper cannot be taken through the pipeline."""
+
+    def __init__(self, link: str, message: str):
+        super().__init__(message)
+        self.link = link
+
+
+class PaperPipeline:
+    """
+    Staged processing pipeline for arXiv papers.
+
+    Every paper goes through download -> parse -> extract (metadata, summary
+    and insights) -> embed (queued on the embedding worker). Each stage has its own bounded thread pool, so the
+    blocking work stays off the event loop and independent papers overlap:
+    one paper can be parsed while another is downloading and a third is
+    waiting on the LLM.
+    """
+
+    def __init__(self, summarizer, paper_index, embedding_worker, pdf_cache=None,
+                 concurrency: Optional[Dict[str, int]] = None, parse_attempts: int = 3,
+                 wait_for_embeddings: bool = False):
+        """
+        Parameters:
+            summarizer (PaperSummarizer): Parser and summarizer for the papers
+            paper_index (PaperIndex): Index used to persist processed papers
+            embedding_worker (EmbeddingWorker): Queue that embeds the paper text into the vector store
+            pdf_cache (PDFCache): Optional cache for downloaded PDFs
+            concurrency (dict): Worker count per stage, e.g. {'download': 4, 'embed': 1}
+            parse_attempts (int): Download/parse attempts per paper before giving up
+            wait_for_embeddings (bool): Finish a paper only once its embeddings are stored,
+                                        instead of as soon as they are queued
+        """
+        self.summarizer = summarizer
+        self.paper_index = paper_index
+        self.embedding_worker = embedding_worker
+        self.wait_for_embeddings = wait_for_embeddings
+        self.pdf_cache = pdf_cache
+        self.parse_attempts = max(1, parse_attempts)
+
+        concurrency = concurrency or {}
+        self.concurrency = {stage: max(1, concurrency.get(stage, 1)) for stage in STAGES}
+        self._executors = {
+            stage: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"pipeline-{stage}")
+            for stage, limit in self.concurrency.items()
+        }
+        logger.info(f"Initialized paper pipeline with concurrency {self.concurrency}")
+
+    async def _run_stage(self, stage: str, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executors[stage], functools.partial(func, *args, **kwargs))
+
+    def _extract(self, paper: Dict, parsed_content) -> Tuple[Dict, str]:
+        analysis = self.summarizer.analyze_paper(parsed_content)
+        metadata = extract_metadata(parsed_content, conclusion=analysis['conclusion'])
+        paper = dict(paper, conclusion=metadata['conclusion'], ref_count=metadata['ref_count'])
+
+        full_text = analysis['full_text']
+        paper = self.paper_index.save(paper, analysis['summary'], analysis['insights'], full_text)
+        logger.debug(f"Saved paper results and summaries for {paper['link']}")
+        return paper, full_text
+
+    async def process_paper(self, paper: Dict, on_progress: Optional[ProgressCallback] = None) -> Dict:
+        """
+        Take a single paper through every stage
+
+        Parameters:
+            paper (dict): Paper dictionary as returned by the arXiv API
+            on_progress (callable): Notified with the paper link whenever it enters a stage
+
+        Returns:
+            dict: The processed paper, including conclusion, ref_count, summary and insights
+        """
+        link = paper['link']
+        report = on_progress or (lambda link, stage, error=None: None)
+        try:
+            paper = await self._process_paper(paper, report)
+        except Exception as e:
+            report(link, "failed", str(e))
+            raise
+        report(link, "done", None)
+        return paper
+
+    async def _process_paper(self, paper: Dict, report: ProgressCallback) -> Dict:
+        link = paper['link']
+        logger.info(f"Processing paper: {paper.get('title', 'Unknown Title')}")
+
+        # a failed parse restarts from the download, in case the file itself was bad
+        parsed_content = None
+        for attempt in range(1, self.parse_attempts + 1):
+            report(link, "download", None)
+            # the cached PDF is pinned until it is parsed, so other papers' downloads can't evict it
+            pdf_path = await self._run_stage("download", download_pdf, link, cache=self.pdf_cache, pin=True)
+            if not pdf_path:
+                raise PaperProcessingError(link, f"Failed to download paper: {link}")
+            logger.debug(f"Successfully downloaded PDF to {pdf_path}")
+
+            report(link, "parse", None)
+            try:
+                parsed_content = await self._run_stage(
+                    "parse", self.summarizer.parse_pdf, pdf_path, cleanup=self.pdf_cache is None
+                )
+            finally:
+                if self.pdf_cache is not None:
+                    self.pdf_cache.release(pdf_path)
+            if parsed_content:
+                break
+            logger.warning(f"Failed to parse paper {link} (attempt {attempt}/{self.parse_attempts})")
+            if self.pdf_cache is not None:
+                self.pdf_cache.invalidate(link)
+        if not parsed_content:
+            raise PaperProcessingError(link, f"Failed to parse paper: {link}")
+
+        report(link, "extract", None)
+        paper, full_text = await self._run_stage("extract", self._extract, paper, parsed_content)
+
+        # the embed stage only hands the text to the embedding worker; it blocks while the
+        # worker's queue is full, which throttles the pipeline instead of the event loop
+        report(link, "embed", None)
+        embedding = await self._run_stage("embed", self.embedding_worker.submit, full_text, link)
+        if self.wait_for_embeddings:
+            await asyncio.wrap_future(embedding)
+        logger.info(f"Successfully processed paper: {link}")
+        return paper
+
+    async def process(self, papers: List[Dict], on_progress: Optional[ProgressCallback] = None) -> List[Union[Dict, Exception]]:
+        """
+        Process papers concurrently
+
+        Returns:
+            list: Processed paper or the raised exception, in the order of `papers`
+        """
+        return await asyncio.gather(
+            *(self.process_paper(paper, on_progress) for paper in papers),
+            return_exceptions=True
+        )
+
+    def shutdown(self) -> None:
+        for executor in self._executors.values():
+            executor.shutdown(wait=False)
@@ -0,0 +1,230 @@
+import logging
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.llm_client import estimate_tokens
+from modules.sections import Segment, segment
+
+logger = logging.getLogger(__name__)
+
+TABLE_SEPARATOR = re.compile(r'^\|?\s*:?-{2,}:?\s*(?:\|\s*:?-{2,}:?\s*)*\|?$')
+TABLE_CELL_PADDING = re.compile(r'[ \t]*\|[ \t]*')
+IMAGE = re.compile(r'^!\[[^\]]*\]\([^)]*\)$')
+BLANK_LINES = re.compile(r'\n{3,}')
+
+
+@dataclass
+class ReducePolicy:
+    """
+    What to send to one prompt type
+
+    Parameters:
+        drop (tuple): Section kinds removed entirely
+        caps (dict): Largest token count kept per section kind, e.g. {'references': 1000}
+        tables (str): 'keep' markdown tables as parsed, 'compact' them (no separator rows
+            or cell padding) or 'drop' them
+        budget (int): Token budget for the whole text; None for no budget
+        protect (tuple): Section kinds that are not trimmed to meet the budget
+    """
+    drop: Tuple[str, ...] = ()
+    caps: Dict[str, int] = field(default_factory=dict)
+    tables: str = 'compact'
+    budget: Optional[int] = None
+    protect: Tuple[str, ...] = ('front', 'abstract', 'conclusion')
+
+
+BACK_MATTER = ('references', 'acknowledgements', 'appendix', 'declarations')
+
+DEFAULT_POLICIES = {
+    # no budget: texts over the single-pass limit are summarized with map-reduce instead
+    'summary': ReducePolicy(drop=BACK_MATTER),
+    # the insights prompt asks for related references, so keep the start of the bibliography
+    'insights': ReducePolicy(drop=('acknowledgements', 'appendix', 'declarations'), caps={'references': 1000},
+                             budget=16000),
+    # only reached when the paper has no recognisable conclusions section
+    'conclusion': ReducePolicy(drop=BACK_MATTER, tables='drop', budget=12000, protect=('abstract',)),
+}
+
+
+def _reduce_tables(text: str, mode: str) -> str:
+    if mode == 'keep':
+        return text
+    lines = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if IMAGE.match(stripped):
+            continue
+        if stripped.startswith('|'):
+            if mode == 'drop' or TABLE_SEPARATOR.match(stripped):
+                continue
+            line = TABLE_CELL_PADDING.sub('|', stripped)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Cut text to at most max_chars, at a paragraph (or else line) boundary when one is close."""
+    if len(text) <= max_chars:
+        return text
+    for boundary in ("\n\n", "\n"):
+        cut = text.rfind(boundary, 0, max_chars)
+        if cut > max_chars // 2:
+            return text[:cut].rstrip()
+    return text[:max_chars].rstrip()
+
+
+def _fit_budget(texts: List[str], trimmable: List[bool], budget_chars: int) -> List[str]:
+    """
+    Trim the trimmable texts so the total fits the budget
+
+    The largest texts are cut first: every trimmable text is capped at the
+    same length, chosen as large as the budget allows, so short sections
+    survive whole and long ones keep their opening paragraphs.
+    """
+    fixed = sum(len(text) for text, trim in zip(texts, trimmable) if not trim)
+    lengths = sorted(len(text) for text, trim in zip(texts, trimmable) if trim)
+    if fixed + sum(lengths) <= budget_chars:
+        return texts
+
+    available = max(0, budget_chars - fixed)
+    cap = 0
+    for index, length in enumerate(lengths):
+        # the rest (this one included) all get `cap` if the budget runs out here
+        share = available // (len(lengths) - index)
+        if length > share:
+            cap = share
+            break
+        available -= length
+    return [_truncate(text, cap) if trim else text for text, trim in zip(texts, trimmable)]
+
+
+class PaperSections:
+    """
+    One paper's segmented text, reduced per prompt
+
+    The text is segmented once; every prompt type then gets its own reduced
+    copy, computed on first use. The tokens each prompt saved are kept for
+    `report()`.
+    """
+
+    def __init__(self, full_text: str, policies: Dict[str, ReducePolicy], reducer: Optional['InputReducer'] = None):
+        self.full_text = full_text
+        self.tokens = estimate_tokens(full_text)
+        self.segments: List[Segment] = segment(full_text)
+        self.policies = policies
+        self._reducer = reducer
+        self._reduced: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _apply(self, policy: ReducePolicy) -> str:
+        headings, texts = [], []
+        for seg in self.segments:
+            if seg.kind in policy.drop:
+                continue
+            text = _reduce_tables(seg.text, policy.tables)
+            if seg.kind in policy.caps:
+                text = _truncate(text, policy.caps[seg.kind] * 4)
+            headings.append(seg.heading)
+            texts.append(text)
+
+        if policy.budget is not None:
+            trimmable = [seg.kind not in policy.protect for seg in self.segments if seg.kind not in policy.drop]
+            heading_chars = sum(len(heading) + 2 for heading in headings)
+            texts = _fit_budget(texts, trimmable, policy.budget * 4 - heading_chars)
+
+        parts = []
+        for heading, text in zip(headings, texts):
+            parts.append(f"{heading}\n\n{text}" if heading else text)
+        return BLANK_LINES.sub("\n\n", "\n\n".join(part for part in parts if part.strip())).strip()
+
+    def reduce(self, prompt: str) -> str:
+        """
+        Text to send to the given prompt type
+
+        Parameters:
+            prompt (str): Prompt type, e.g. 'summary'; types without a policy get the full text
+
+        Returns:
+            str: Reduced text
+        """
+        with self._lock:
+            if prompt in self._reduced:
+                return self._reduced[prompt]
+        policy = self.policies.get(prompt)
+        reduced = self._apply(policy) if policy else self.full_text
+        # a reduction that saves nothing is not worth the changed text
+        if len(reduced) >= len(self.full_text):
+            reduced = self.full_text
+        with self._lock:
+            self._reduced.setdefault(prompt, reduced)
+        logger.debug(f"Reduced the {prompt} input from {self.tokens} to {estimate_tokens(reduced)} tokens")
+        if self._reducer is not None:
+            self._reducer.record(prompt, self.tokens, estimate_tokens(reduced))
+        return reduced
+
+    def report(self) -> Dict[str, Any]:
+        """Tokens in the full text and, per prompt type reduced so far, the tokens sent and saved."""
+        with self._lock:
+            prompts = {
+                prompt: {'tokens': estimate_tokens(text), 'saved': self.tokens - estimate_tokens(text)}
+                for prompt, text in self._reduced.items()
+            }
+        return {
+            'tokens': self.tokens,
+            'prompts': prompts,
+            'tokens_saved': sum(entry['saved'] for entry in prompts.values())
+        }
+
+
+class InputReducer:
+    """
+    Trims paper text before it is sent to the LLM
+
+    References, acknowledgements, appendices and table markup are a large
+    share of a parsed paper's tokens and add little to a summary. Each
+    prompt type has a ReducePolicy saying which section kinds to drop or
+    cap and how many tokens the whole input may use.
+    """
+
+    def __init__(self, policies: Optional[Dict[str, ReducePolicy]] = None, budgets: Optional[Dict[str, int]] = None):
+        """
+        Parameters:
+            policies (dict): ReducePolicy per prompt type (DEFAULT_POLICIES by default)
+            budgets (dict): Token budget overrides per prompt type
+        """
+        self.policies = dict(DEFAULT_POLICIES if policies is None else policies)
+        for prompt, budget in (budgets or {}).items():
+            if prompt in self.policies:
+                self.policies[prompt] = ReducePolicy(**dict(vars(self.policies[prompt]), budget=budget))
+
+        self._lock = threading.Lock()
+        self.papers = 0
+        self._prompts: Dict[str, Dict[str, int]] = {}
+
+    def prepare(self, full_text: str) -> PaperSections:
+        """Segment a paper once, for reduction per prompt type."""
+        with self._lock:
+            self.papers += 1
+        return PaperSections(full_text, self.policies, reducer=self)
+
+    def record(self, prompt: str, tokens_in: int, tokens_out: int) -> None:
+        with self._lock:
+            entry = self._prompts.setdefault(prompt, {'calls': 0, 'tokens_in': 0, 'tokens_out': 0})
+            entry['calls'] += 1
+            entry['tokens_in'] += tokens_in
+            entry['tokens_out'] += tokens_out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            prompts = {
+                prompt: dict(entry, tokens_saved=entry['tokens_in'] - entry['tokens_out'],
+                             saved_ratio=1 - entry['tokens_out'] / entry['tokens_in'] if entry['tokens_in'] else 0.0)
+                for prompt, entry in self._prompts.items()
+            }
+            return {
+                'papers': self.papers,
+                'prompts': prompts,
+                'tokens_saved': sum(entry['tokens_saved'] for entry in prompts.values())
+            }
@@ -0,0 +1,267 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+MARKDOWN_HEADING = re.compile(r'^(#{1,6})\s+(.+?)\s*#*$')
+BOLD_HEADING = re.compile(r'^\*\*([^*]{2,80})\*\*:?$')
+HEADING_NUMBER = re.compile(r'^(?:(?:\d+\.)*\d+|[IVX]+|[A-Z](?=\.))\.?\s+')
+
+CONCLUSION_TITLE = re.compile(
+    r'^(?:(?:summary|discussion) and )?(?:conclusions?|concluding remarks)(?: and .+)?$', re.IGNORECASE
+)
+SUMMARY_TITLE = re.compile(r'^summary(?: and (?:discussion|outlook|future work|prospects))?$', re.IGNORECASE)
+DISCUSSION_TITLE = re.compile(r'^discussion(?: and (?:summary|outlook|future work))?$', re.IGNORECASE)
+# sections that end the body of the paper whatever their heading level
+BACK_MATTER_TITLE = re.compile(
+    r'^(?:references?|bibliography|literature cited|acknowledge?ments?|appendix(?:es)?\b.*|data availability'
+    r'(?: statement)?|funding|author contributions|(?:conflicts? of|competing) interests?)$',
+    re.IGNORECASE
+)
+REFERENCES_TITLE = re.compile(r'^(?:references?(?: and notes)?|bibliography|literature cited)$', re.IGNORECASE)
+ACKNOWLEDGEMENTS_TITLE = re.compile(r'^acknowledge?ments?$', re.IGNORECASE)
+APPENDIX_TITLE = re.compile(r'^appendix(?:es)?\b', re.IGNORECASE)
+DECLARATIONS_TITLE = re.compile(
+    r'^(?:data availability(?: statement)?|funding|author contributions|(?:conflicts? of|competing) interests?)$',
+    re.IGNORECASE
+)
+ABSTRACT_TITLE = re.compile(r'^abstract$', re.IGNORECASE)
+INTRODUCTION_TITLE = re.compile(r'^introduction$', re.IGNORECASE)
+
+# a plain line that is nothing but a section title, e.g. "5 CONCLUSIONS" in unmarked text
+PLAIN_HEADING = re.compile(
+    r'^(?:(?:\d+\.)*\d+|[IVX]+)?\.?\s*(?:(?:summary and |discussion and )?conclusions?|concluding remarks|summary|'
+    r'discussion|references|bibliography|acknowledge?ments?|abstract|introduction|appendix(?:es)?)\.?$',
+    re.IGNORECASE
+)
+
+# one pass over the bibliography: a numbered entry ("[12] ...", "12. Author") or an
+# author-year entry start ("Smith, J. A., ..."), captured in separate groups
+BIBLIOGRAPHY_ENTRY = re.compile(
+    r'^[ \t]*(?:[-*][ \t]*)?(?:\[(?P<bracket>\d{1,4})\]|(?P<number>\d{1,4})\.\s+(?=[A-Z]))'
+    r'|^[ \t]*(?:[-*][ \t]*)?(?P<author>[A-Z][\w\'À-ſ-]+(?: [A-Z][\w\'À-ſ-]+)*,\s+(?:[A-Z]\.\s?-?){1,4})',
+    re.MULTILINE
+)
+# in-text citation styles, for papers whose bibliography block can't be found; each style is
+# scanned on its own, as the year in "(Smith et al., 2020)" also counts as a bare year
+IN_TEXT_CITATIONS = (
+    re.compile(r'\[\d+\]'),
+    re.compile(r'\(\w+\s*(?:et\s+al\.?)?\s*,\s*\d{4}\w?\)'),
+    re.compile(r'(?<!\w)(?:20)\d{2}[a-z]?(?!\d)'),
+)
+
+CONCLUSION_PRIORITY = ((CONCLUSION_TITLE, 3), (SUMMARY_TITLE, 2), (DISCUSSION_TITLE, 1))
+
+# section kinds, checked in order; the text before the first heading is 'front', anything unmatched is 'body'
+SECTION_KINDS = (
+    ('references', REFERENCES_TITLE),
+    ('acknowledgements', ACKNOWLEDGEMENTS_TITLE),
+    ('appendix', APPENDIX_TITLE),
+    ('declarations', DECLARATIONS_TITLE),
+    ('abstract', ABSTRACT_TITLE),
+    ('introduction', INTRODUCTION_TITLE),
+    ('conclusion', CONCLUSION_TITLE),
+    ('conclusion', SUMMARY_TITLE),
+    ('conclusion', DISCUSSION_TITLE),
+)
+# subsections of these inherit the kind, e.g. "### A.1 Derivation" under "## Appendix"
+INHERITED_KINDS = {'references', 'acknowledgements', 'appendix', 'declarations'}
+
+
+@dataclass
+class Section:
+    """A heading and the text up to the next heading at the same or a higher level."""
+    title: str
+    level: int
+    start: int
+    text: str
+
+
+@dataclass
+class Segment:
+    """A heading line and the text up to the next heading of any level."""
+    kind: str
+    title: str
+    heading: str
+    text: str
+
+
+def _normalize_title(title: str) -> str:
+    title = title.strip().strip('*').strip()
+    title = HEADING_NUMBER.sub('', title)
+    return title.rstrip('.:').strip()
+
+
+def _heading(line: str):
+    """(level, title) if the line is a section heading, None otherwise."""
+    stripped = line.strip()
+    if not stripped or len(stripped) > 100:
+        return None
+    match = MARKDOWN_HEADING.match(stripped)
+    if match:
+        return len(match.group(1)), _normalize_title(match.group(2))
+    match = BOLD_HEADING.match(stripped)
+    if match:
+        return 2, _normalize_title(match.group(1))
+    if PLAIN_HEADING.match(stripped):
+        return 2, _normalize_title(stripped)
+    return None
+
+
+def split_sections(text: str) -> List[Section]:
+    """
+    Split parsed markdown into sections
+
+    Headings are markdown headings, bold-only lines and plain lines that
+    consist of a well-known section title. A section's text runs to the next
+    heading at the same or a higher level; back matter (references,
+    acknowledgements, appendices) always ends the preceding sections.
+    """
+    lines = text.splitlines()
+    headings = []
+    for index, line in enumerate(lines):
+        heading = _heading(line)
+        if heading:
+            headings.append((index, heading[0], heading[1]))
+
+    sections = []
+    for position, (index, level, title) in enumerate(headings):
+        end = len(lines)
+        for next_index, next_level, next_title in headings[position + 1:]:
+            if next_level <= level or BACK_MATTER_TITLE.match(next_title):
+                end = next_index
+                break
+        body = "\n".join(lines[index + 1:end]).strip()
+        sections.append(Section(title=title, level=level, start=index, text=body))
+    return sections
+
+
+def section_kind(title: str) -> str:
+    for kind, pattern in SECTION_KINDS:
+        if pattern.match(title):
+            return kind
+    return 'body'
+
+
+def segment(text: str) -> List[Segment]:
+    """
+    Split parsed markdown into consecutive, non-overlapping segments
+
+    Joining every segment's heading and text gives back the document (up to
+    blank lines around headings). Each segment is labelled with a kind
+    (front, abstract, introduction, body, conclusion, appendix, references,
+    acknowledgements, declarations) so callers can decide what to keep.
+    """
+    segments = [Segment(kind='front', title='', heading='', text='')]
+    body_lines: List[str] = []
+    parents: List[tuple] = []
+    for line in text.splitlines():
+        heading = _heading(line)
+        if heading is None:
+            body_lines.append(line)
+            continue
+        segments[-1].text = "\n".join(body_lines).strip()
+        body_lines = []
+
+        level, title = heading
+        while parents and parents[-1][0] >= level:
+            parents.pop()
+        kind = section_kind(title)
+        if kind == 'body' and parents and parents[-1][1] in INHERITED_KINDS:
+            kind = parents[-1][1]
+        parents.append((level, kind))
+        segments.append(Segment(kind=kind, title=title, heading=line.strip(), text=''))
+    segments[-1].text = "\n".join(body_lines).strip()
+    return segments
+
+
+def _clean_section_text(text: str, max_chars: int) -> str:
+    # keep subsection text but drop the heading markup
+    lines = [MARKDOWN_HEADING.sub(r'\2', line.strip()) for line in text.splitlines()]
+    text = re.sub(r'\n{3,}', '\n\n', "\n".join(lines)).strip()
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind("\n\n", 0, max_chars)
+    return text[:cut if cut > max_chars // 2 else max_chars].strip()
+
+
+def find_conclusion_section(text: str, min_chars: int = 150, max_chars: int = 6000) -> Optional[str]:
+    """
+    Text of the paper's conclusions, found from its section headings
+
+    Sections titled Conclusions (or Concluding remarks, Summary and
+    conclusions, ...) are preferred over Summary, and Summary over
+    Discussion; among equals the last one wins. Summary and Discussion
+    headings in the first fifth of the paper are ignored, since they are
+    usually not the closing section.
+
+    Parameters:
+        text (str): Parsed paper in markdown
+        min_chars (int): Shorter sections are treated as not found
+        max_chars (int): Longer sections are cut at a paragraph boundary
+
+    Returns:
+        str: Section text without its heading, or None if no usable section was found
+    """
+    lines_total = max(1, text.count("\n") + 1)
+    best, best_priority = None, 0
+    for section in split_sections(text):
+        for pattern, priority in CONCLUSION_PRIORITY:
+            if not pattern.match(section.title):
+                continue
+            if priority < 3 and section.start < lines_total * 0.2:
+                break
+            if priority >= best_priority and len(section.text) >= min_chars:
+                best, best_priority = section, priority
+            break
+    if best is None:
+        return None
+    return _clean_section_text(best.text, max_chars)
+
+
+def find_references_block(text: str) -> Optional[str]:
+    """
+    Text of the bibliography, joined across every references section
+
+    Parsers that work page by page (LlamaParse) repeat the heading on each
+    page of the bibliography, so one bibliography arrives as several sections.
+    """
+    blocks = [section.text for section in split_sections(text) if REFERENCES_TITLE.match(section.title)]
+    return "\n\n".join(blocks) if blocks else None
+
+
+def count_bibliography_entries(block: str) -> int:
+    """
+    Number of entries in a bibliography block, in a single scan
+
+    Numbered bibliographies are counted by their distinct entry numbers.
+    Author-year bibliographies are counted by entry starts ("Surname, I.")
+    that don't continue the previous line's author list.
+    """
+    numbered, author_entries = set(), 0
+    for match in BIBLIOGRAPHY_ENTRY.finditer(block):
+        number = match.group('bracket') or match.group('number')
+        if number:
+            numbered.add(number)
+            continue
+        # a line ending in a comma is an author list wrapped onto the next line
+        previous_line_end = match.start() - 1
+        while previous_line_end > 0 and block[previous_line_end - 1] in ' \t\n':
+            previous_line_end -= 1
+        if previous_line_end <= 0 or block[previous_line_end - 1] != ',':
+            author_entries += 1
+    return len(numbered) if len(numbered) >= 3 else max(len(numbered), author_entries)
+
+
+def count_in_text_citations(text: str) -> int:
+    """Largest number of distinct citations of any one style."""
+    return max(len(set(pattern.findall(text))) for pattern in IN_TEXT_CITATIONS)
+
+
+def count_references(text: str) -> int:
+    """Reference count from the bibliography block, or from in-text citations when there is none."""
+    block = find_references_block(text)
+    if block:
+        count = count_bibliography_entries(block)
+        if count:
+            return count
+    return count_in_text_citations(text)
@@ -0,0 +1,553 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from modules.utils import arxiv_id_from_link, save_results, save_summaries
+
+logger = logging.getLogger(__name__)
+
+# what the summarizer used to save when the LLM failed
+PLACEHOLDER_ANALYSES = ("Error generating summary", "Error generating insights")
+
+
+def has_analysis(entry: Dict) -> bool:
+    """Whether a processed paper has a real summary and insights, not empty or placeholder text."""
+    return all((entry.get(field) or '').strip() not in ('', *PLACEHOLDER_ANALYSES) for field in ('summary', 'insights'))
+
+
+class PaperStore:
+    """
+    Storage backend for processed papers and their summaries.
+
+    Papers are keyed by their versioned arXiv id, summaries by the paper link
+    (the same key used by the legacy summaries.json file).
+    """
+
+    def upsert_papers(self, papers: List[Dict]) -> None:
+        raise NotImplementedError
+
+    def upsert_summary(self, paper_link: str, summary: str, insights: str, full_text: str) -> None:
+        raise NotImplementedError
+
+    def get_paper(self, arxiv_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def get_paper_by_link(self, link: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def get_summary(self, paper_link: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def list_papers(self, category: Optional[str] = None, published_after: Optional[str] = None,
+                    limit: Optional[int] = None) -> List[Dict]:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def load_processed(self) -> Dict[str, Dict]:
+        """Papers that have a stored summary, keyed by arXiv id, without their full text."""
+        raise NotImplementedError
+
+    def data_files(self) -> List[str]:
+        """Files whose modification time changes whenever the store is written."""
+        raise NotImplementedError
+
+    def get_watermark(self, category: str) -> Optional[Dict]:
+        """Harvest watermark of a category: the newest 'published' date seen and the 'ids' published at that time."""
+        raise NotImplementedError
+
+    def set_watermark(self, category: str, published: str, ids: List[str]) -> None:
+        raise NotImplementedError
+
+    def get_harvest_failures(self, category: str) -> List[Dict]:
+        """Harvested papers of a category that failed to process, as {'paper', 'attempts', 'error'} dicts."""
+        raise NotImplementedError
+
+    def record_harvest_failure(self, category: str, paper: Dict, error: str) -> int:
+        """Count another failed attempt at a harvested paper and return its number of attempts so far."""
+        raise NotImplementedError
+
+    def clear_harvest_failures(self, category: str, arxiv_ids: List[str]) -> None:
+        raise NotImplementedError
+
+    def upsert_paper(self, paper: Dict) -> None:
+        self.upsert_papers([paper])
+
+    def upsert_summaries(self, rows: List[Tuple[str, str, str, str]]) -> None:
+        for row in rows:
+            self.upsert_summary(*row)
+
+    def close(self) -> None:
+        pass
+
+
+class JSONPaperStore(PaperStore):
+    """Legacy backend that keeps everything in results.json / summaries.json."""
+
+    def __init__(self, results_path: str = "./data/results.json", summaries_path: str = "./data/summaries.json",
+                 watermarks_path: Optional[str] = None, failures_path: Optional[str] = None):
+        self.results_path = results_path
+        self.summaries_path = summaries_path
+        self.watermarks_path = watermarks_path or os.path.join(os.path.dirname(results_path), "watermarks.json")
+        self.failures_path = failures_path or os.path.join(os.path.dirname(results_path), "harvest_failures.json")
+
+    def _load(self, path: str, default):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return default
+
+    def upsert_papers(self, papers: List[Dict]) -> None:
+        save_results(papers, self.results_path)
+
+    def upsert_summary(self, paper_link: str, summary: str, insights: str, full_text: str) -> None:
+        save_summaries(paper_link, summary, insights, full_text, self.summaries_path)
+
+    def get_paper(self, arxiv_id: str) -> Optional[Dict]:
+        for paper in self._load(self.results_path, []):
+            if arxiv_id_from_link(paper['link']) == arxiv_id:
+                return paper
+        return None
+
+    def get_paper_by_link(self, link: str) -> Optional[Dict]:
+        return self.get_paper(arxiv_id_from_link(link))
+
+    def get_summary(self, paper_link: str) -> Optional[Dict]:
+        return self._load(self.summaries_path, {}).get(paper_link)
+
+    def list_papers(self, category: Optional[str] = None, published_after: Optional[str] = None,
+                    limit: Optional[int] = None) -> List[Dict]:
+        papers = [
+            paper for paper in self._load(self.results_path, [])
+            if (category is None or paper.get('primary_category') == category)
+            and (published_after is None or paper.get('published', '') > published_after)
+        ]
+        papers.sort(key=lambda paper: paper.get('published', ''), reverse=True)
+        return papers[:limit] if limit else papers
+
+    def count(self) -> int:
+        return len(self._load(self.results_path, []))
+
+    def load_processed(self) -> Dict[str, Dict]:
+        summaries = self._load(self.summaries_path, {})
+        processed = {}
+        for paper in self._load(self.results_path, []):
+            entry = summaries.get(paper['link'])
+            if entry is not None:
+                processed[arxiv_id_from_link(paper['link'])] = dict(
+                    paper, summary=entry.get('summary', ''), insights=entry.get('insights', '')
+                )
+        return processed
+
+    def data_files(self) -> List[str]:
+        return [self.results_path, self.summaries_path]
+
+    def get_watermark(self, category: str) -> Optional[Dict]:
+        return self._load(self.watermarks_path, {}).get(category)
+
+    def set_watermark(self, category: str, published: str, ids: List[str]) -> None:
+        watermarks = self._load(self.watermarks_path, {})
+        watermarks[category] = {'published': published, 'ids': ids}
+        with open(self.watermarks_path, 'w', encoding='utf-8') as f:
+            json.dump(watermarks, f, indent=2)
+
+    def get_harvest_failures(self, category: str) -> List[Dict]:
+        return list(self._load(self.failures_path, {}).get(category, {}).values())
+
+    def record_harvest_failure(self, category: str, paper: Dict, error: str) -> int:
+        failures = self._load(self.failures_path, {})
+        entries = failures.setdefault(category, {})
+        arxiv_id = arxiv_id_from_link(paper['link'])
+        attempts = entries.get(arxiv_id, {}).get('attempts', 0) + 1
+        entries[arxiv_id] = {'paper': paper, 'attempts': attempts, 'error': error}
+        with open(self.failures_path, 'w', encoding='utf-8') as f:
+            json.dump(failures, f, indent=2)
+        return attempts
+
+    def clear_harvest_failures(self, category: str, arxiv_ids: List[str]) -> None:
+        failures = self._load(self.failures_path, {})
+        entries = failures.get(category, {})
+        if not any(arxiv_id in entries for arxiv_id in arxiv_ids):
+            return
+        for arxiv_id in arxiv_ids:
+            entries.pop(arxiv_id, None)
+        with open(self.failures_path, 'w', encoding='utf-8') as f:
+            json.dump(failures, f, indent=2)
+
+
+class SQLitePaperStore(PaperStore):
+    """
+    SQLite backend with per-paper upserts and indexed point lookups.
+
+    The full paper dictionary is kept as a JSON document next to the indexed
+    columns, so new fields added by the pipeline don't need a schema change.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS papers (
+            arxiv_id TEXT PRIMARY KEY,
+            link TEXT NOT NULL,
+            title TEXT,
+            primary_category TEXT,
+            published TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_papers_link ON papers(link);
+        CREATE INDEX IF NOT EXISTS idx_papers_category ON papers(primary_category);
+        CREATE INDEX IF NOT EXISTS idx_papers_published ON papers(published);
+
+        CREATE TABLE IF NOT EXISTS summaries (
+            link TEXT PRIMARY KEY,
+            summary TEXT,
+            insights TEXT,
+            full_text TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS harvest_watermarks (
+            category TEXT PRIMARY KEY,
+            published TEXT NOT NULL,
+            ids TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS harvest_failures (
+            category TEXT NOT NULL,
+            arxiv_id TEXT NOT NULL,
+            paper TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            error TEXT,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (category, arxiv_id)
+        );
+    """
+
+    def __init__(self, path: str = "./data/papers.db"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+        logger.info(f"Opened SQLite paper store at {path}")
+
+    def upsert_papers(self, papers: List[Dict]) -> None:
+        rows = [
+            (
+                arxiv_id_from_link(paper['link']),
+                paper['link'],
+                paper.get('title'),
+                paper.get('primary_category'),
+                paper.get('published'),
+                json.dumps(paper, ensure_ascii=False)
+            )
+            for paper in papers
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO papers (arxiv_id, link, title, primary_category, published, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(arxiv_id) DO UPDATE SET
+                    link = excluded.link,
+                    title = excluded.title,
+                    primary_category = excluded.primary_category,
+                    published = excluded.published,
+                    data = excluded.data
+                """,
+                rows
+            )
+        logger.debug(f"Upserted {len(rows)} papers")
+
+    def upsert_summary(self, paper_link: str, summary: str, insights: str, full_text: str) -> None:
+        self.upsert_summaries([(paper_link, summary, insights, full_text)])
+
+    def upsert_summaries(self, rows: List[Tuple[str, str, str, str]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO summaries (link, summary, insights, full_text)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(link) DO UPDATE SET
+                    summary = excluded.summary,
+                    insights = excluded.insights,
+                    full_text = excluded.full_text
+                """,
+                rows
+            )
+        logger.debug(f"Upserted {len(rows)} summaries")
+
+    def _fetchone(self, query: str, params: Tuple) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()
+
+    def get_paper(self, arxiv_id: str) -> Optional[Dict]:
+        row = self._fetchone("SELECT data FROM papers WHERE arxiv_id = ?", (arxiv_id,))
+        return json.loads(row['data']) if row else None
+
+    def get_paper_by_link(self, link: str) -> Optional[Dict]:
+        row = self._fetchone("SELECT data FROM papers WHERE link = ?", (link,))
+        return json.loads(row['data']) if row else None
+
+    def get_summary(self, paper_link: str) -> Optional[Dict]:
+        row = self._fetchone(
+            "SELECT summary, insights, full_text FROM summaries WHERE link = ?",
+            (paper_link,)
+        )
+        return dict(row) if row else None
+
+    def list_papers(self, category: Optional[str] = None, published_after: Optional[str] = None,
+                    limit: Optional[int] = None) -> List[Dict]:
+        clauses, params = [], []
+        if category is not None:
+            clauses.append("primary_category = ?")
+            params.append(category)
+        if published_after is not None:
+            clauses.append("published > ?")
+            params.append(published_after)
+
+        query = "SELECT data FROM papers"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY published DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [json.loads(row['data']) for row in rows]
+
+    def count(self) -> int:
+        return self._fetchone("SELECT COUNT(*) AS n FROM papers", ())['n']
+
+    def load_processed(self) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT p.arxiv_id, p.data, s.summary, s.insights
+                FROM papers p JOIN summaries s ON s.link = p.link
+                """
+            ).fetchall()
+        return {
+            row['arxiv_id']: dict(json.loads(row['data']), summary=row['summary'], insights=row['insights'])
+            for row in rows
+        }
+
+    def get_watermark(self, category: str) -> Optional[Dict]:
+        row = self._fetchone("SELECT published, ids FROM harvest_watermarks WHERE category = ?", (category,))
+        return {'published': row['published'], 'ids': json.loads(row['ids'])} if row else None
+
+    def set_watermark(self, category: str, published: str, ids: List[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO harvest_watermarks (category, published, ids, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(category) DO UPDATE SET
+                    published = excluded.published,
+                    ids = excluded.ids,
+                    updated_at = excluded.updated_at
+                """,
+                (category, published, json.dumps(ids), time.time())
+            )
+        logger.debug(f"Set harvest watermark for {category} to {published}")
+
+    def get_harvest_failures(self, category: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT paper, attempts, error FROM harvest_failures WHERE category = ? ORDER BY arxiv_id",
+                (category,)
+            ).fetchall()
+        return [{'paper': json.loads(row['paper']), 'attempts': row['attempts'], 'error': row['error']}
+                for row in rows]
+
+    def record_harvest_failure(self, category: str, paper: Dict, error: str) -> int:
+        arxiv_id = arxiv_id_from_link(paper['link'])
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO harvest_failures (category, arxiv_id, paper, attempts, error, updated_at)
+                VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT(category, arxiv_id) DO UPDATE SET
+                    paper = excluded.paper,
+                    attempts = attempts + 1,
+                    error = excluded.error,
+                    updated_at = excluded.updated_at
+                """,
+                (category, arxiv_id, json.dumps(paper, ensure_ascii=False), error, time.time())
+            )
+            row = self._conn.execute(
+                "SELECT attempts FROM harvest_failures WHERE category = ? AND arxiv_id = ?",
+                (category, arxiv_id)
+            ).fetchone()
+        return row['attempts']
+
+    def clear_harvest_failures(self, category: str, arxiv_ids: List[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM harvest_failures WHERE category = ? AND arxiv_id = ?",
+                [(category, arxiv_id) for arxiv_id in arxiv_ids]
+            )
+
+    def data_files(self) -> List[str]:
+        # with WAL enabled most commits only touch the -wal file
+        return [self.path, f"{self.path}-wal"]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class PaperIndex:
+    """
+    In-memory index of processed papers keyed by arXiv id.
+
+    The index is loaded once and kept in sync by writing through `save`.
+    Writes made by other processes (e.g. the CLI) are picked up lazily: every
+    lookup compares the store's file modification times with the ones seen at
+    the last load, and only reloads when they differ.
+    """
+
+    def __init__(self, store: PaperStore):
+        self.store = store
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._mtime: Tuple[float, ...] = ()
+        self.reload()
+
+    def _current_mtime(self) -> Tuple[float, ...]:
+        mtimes = []
+        for path in self.store.data_files():
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(0)
+        return tuple(mtimes)
+
+    def reload(self) -> None:
+        with self._lock:
+            self._mtime = self._current_mtime()
+            self._entries = self.store.load_processed()
+        logger.info(f"Loaded {len(self._entries)} processed papers into the index")
+
+    def _refresh_if_stale(self) -> None:
+        if self._current_mtime() != self._mtime:
+            logger.debug("Paper store changed on disk, reloading index")
+            self.reload()
+
+    def get(self, arxiv_id: str) -> Optional[Dict]:
+        self._refresh_if_stale()
+        entry = self._entries.get(arxiv_id)
+        return dict(entry) if entry is not None else None
+
+    def __contains__(self, arxiv_id: str) -> bool:
+        self._refresh_if_stale()
+        return arxiv_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def partition(self, papers: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Split fetched papers into already processed and pending ones
+
+        Parameters:
+            papers (list): Paper dictionaries as returned by the arXiv API
+
+        Returns:
+            tuple: Cached papers (with summary and insights) and papers still to process;
+                papers saved with a placeholder analysis are processed again
+        """
+        self._refresh_if_stale()
+        cached, pending = [], []
+        for paper in papers:
+            entry = self._entries.get(arxiv_id_from_link(paper['link']))
+            if entry is not None and has_analysis(entry):
+                cached.append(dict(entry))
+            else:
+                pending.append(paper)
+        return cached, pending
+
+    def save(self, paper: Dict, summary: str, insights: str, full_text: str) -> Dict:
+        """
+        Persist a processed paper and its summaries, and add it to the index
+
+        Returns:
+            dict: The indexed entry (paper fields plus summary and insights)
+        """
+        self.store.upsert_paper(paper)
+        self.store.upsert_summary(paper['link'], summary, insights, full_text)
+
+        entry = dict(paper, summary=summary, insights=insights)
+        with self._lock:
+            self._entries[arxiv_id_from_link(paper['link'])] = entry
+            self._mtime = self._current_mtime()
+        return dict(entry)
+
+
+def get_paper_store(backend: str = "sqlite", path: str = "./data/papers.db", **kwargs) -> PaperStore:
+    """
+    Create a paper store for the configured backend
+
+    Parameters:
+        backend (str): 'sqlite' or 'json'
+        path (str): Database file for the sqlite backend
+
+    Returns:
+        PaperStore: Storage backend instance
+    """
+    if backend == "sqlite":
+        return SQLitePaperStore(path)
+    if backend == "json":
+        return JSONPaperStore(**kwargs)
+    raise ValueError(f"Unknown paper store backend: {backend}")
+
+
+def import_json_files(store: PaperStore, results_path: str = "./data/results.json",
+                      summaries_path: str = "./data/summaries.json") -> Tuple[int, int]:
+    """
+    One-time import of the legacy results.json / summaries.json files into a store
+
+    Parameters:
+        store (PaperStore): Destination store
+        results_path (str): Path to the legacy results file
+        summaries_path (str): Path to the legacy summaries file
+
+    Returns:
+        tuple: Number of imported papers and summaries
+    """
+    papers, summaries = [], {}
+    try:
+        with open(results_path, 'r', encoding='utf-8') as f:
+            papers = json.load(f)
+    except FileNotFoundError:
+        logger.info(f"No results file found at {results_path}, skipping")
+    try:
+        with open(summaries_path, 'r', encoding='utf-8') as f:
+            summaries = json.load(f)
+    except FileNotFoundError:
+        logger.info(f"No summaries file found at {summaries_path}, skipping")
+
+    if papers:
+        store.upsert_papers(papers)
+
+    rows = [
+        (link, entry.get('summary', ''), entry.get('insights', ''), entry.get('full_text', ''))
+        for link, entry in summaries.items()
+    ]
+    store.upsert_summaries(rows)
+
+    logger.info(f"Imported {len(papers)} papers and {len(rows)} summaries into the paper store")
+    return len(papers), len(rows)
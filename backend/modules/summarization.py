@@ -1,55 +1,139 @@
 import os
-from utils import save_summaries
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-import google.generativeai as genai
-from llama_parse import LlamaParse
-from typing import Dict
+from typing import Dict, List, Optional
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.prompts import PromptTemplate
 
+from modules.data_extractor import get_conclusion
+from modules.llm import LLMCache, LLMProvider, GeminiProvider, with_cache
+from modules.llm_client import LLMClient, estimate_tokens
+from modules.reducer import InputReducer
+from modules.parsing import ParsedDocument, ParseCache, PDFParser, LlamaParseParser, file_sha256
+from modules.utils import run_in_parallel
+
 from dotenv import load_dotenv
 load_dotenv()
 
 import nest_asyncio
 nest_asyncio.apply()
 
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-genai.configure(api_key=GOOGLE_API_KEY)
-
 logger = logging.getLogger(__name__)
 
+CHUNK_SUMMARY_PROMPT = PromptTemplate.from_template("""Summarize a given document chunk clearly and succinctly.
+                        Each input will be a part of a longer document, presented in chunks. Your goal is to summarize the content of each chunk in a way that maintains the overall meaning and ensures that important context is preserved for future summarization steps. Focus on capturing the core themes, essential details, and relevant points in each chunk, while avoiding redundancy.
+                        Keep the summary short, highlight only the most crucial information, and avoid including minor details unless absolutely necessary for comprehension.
+
+                        # Steps
+
+                        1. **Read the Chunk Thoroughly**: Understand the content, context, and intent of the given document snippet.
+                        2. **Identify Key Themes and Details**: Distill the primary subjects, essential arguments, and most significant points.
+                        3. **Formulate a Summary**: Present these key themes clearly and concisely, capturing the core information of the given chunk.
+
+                        # Output Format
+
+                        - Provide the summary in 2-4 sentences.
+                        - Make sure the summary is expressive enough that the next summarization step can understand the key aspects of the chunk.
+                        - Avoid unnecessary details or overly verbose explanations.
+
+                        # Examples
+
+                        **Input:**
+                        "[Document Chunk: The latest artificial intelligence techniques, particularly in machine learning, have resulted in notable advancements in areas such as language modeling, predictive analytics, and computer vision. Language models, specifically, show significant capability to understand and generate human-like text, while predictive analytics is being refined to improve decision-making processes in healthcare systems.]"
+
+                        **Output:**
+                        "The latest AI techniques, notably in machine learning, are enhancing language modeling, predictive analytics, and computer vision. Language models are advancing significantly in human-like text generation, and predictive analytics is becoming more effective within healthcare decision-making."
+
+                        # Notes
+
+                        - Avoid summarizing in a manner that removes important context necessary for understanding subsequent chunks.
+                        - Make sure to use concise language that does not sacrifice content quality.
+                        - If a chunk appears to be connected to previous content, ensure the summary remains coherent for eventual recursive summarization.
+                        [Document chunk: {chunk}]""")
+
+SINGLE_PASS_PROMPT = """Please provide a comprehensive summary of this scientific paper:
+
+                        Please structure the summary as follows:
+                        1. Main objective and motivation
+                        2. Key methods and approaches
+                        3. Principal findings and results
+                        4. Significance and implications
+
+                        Keep the summary focused and technical but accessible to researchers in related fields.: {full_text}"""
+
 class PaperSummarizer:
-    def __init__(self, model_name: str = "gemini-1.5-flash-8b"):
+    def __init__(self, model_name: str = "gemini-1.5-flash-8b", call_timeout: Optional[float] = 120.0,
+                 summary_timeout: Optional[float] = 900.0, parse_cache: Optional[ParseCache] = None, parser: Optional[PDFParser] = None,
+                 provider: Optional[LLMProvider] = None, llm_cache: Optional[LLMCache] = None,
+                 single_pass_tokens: int = 32000, chunk_tokens: int = 8000, chunk_overlap_tokens: int = 200,
+                 map_concurrency: int = 4, max_reduce_levels: int = 5, reducer: Optional[InputReducer] = None):
         logger.info(f"Initializing PaperSummarizer with model: {model_name}")
         self.model_name = model_name
+        self.call_timeout = call_timeout
+        # a map-reduce summary makes many rate-limited calls, so it gets a budget of its own
+        self.summary_timeout = summary_timeout
         self.parsing_instructions = ""
-        self.parser = LlamaParse(result_type="markdown", parsing_instruction=self.parsing_instructions, show_progress=True)
+        self.parser = parser or LlamaParseParser(parsing_instruction=self.parsing_instructions)
+        self.parse_cache = parse_cache
+        logger.info(f"Using PDF parser: {self.parser.name}")
 
-        self.model = genai.GenerativeModel(self.model_name)
+        self.provider = provider or LLMClient(GeminiProvider(self.model_name), request_timeout=call_timeout or 120.0)
+        # each prompt type is its own call site in the LLM cache, with its own TTL and stats
+        self.summary_llm = with_cache(self.provider, llm_cache, "summary")
+        self.insights_llm = with_cache(self.provider, llm_cache, "insights")
+        self.conclusion_llm = with_cache(self.provider, llm_cache, "conclusion")
+        # trims back matter and table markup from the text each prompt type gets
+        self.reducer = reducer or InputReducer()
+
+        self.single_pass_tokens = single_pass_tokens
+        self.chunk_tokens = chunk_tokens
+        self.map_concurrency = map_concurrency
+        self.max_reduce_levels = max_reduce_levels
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_tokens,
+            chunk_overlap=chunk_overlap_tokens,
+            length_function=estimate_tokens,
+        )
         logger.debug("PaperSummarizer initialization complete")
 
-    def parse_pdf(self, pdf_path: str) -> Dict:
+    def parse_pdf(self, pdf_path: str, cleanup: bool = True) -> List[ParsedDocument]:
         """
-        Parse PDF content using LlamaParse
+        Parse PDF content with the configured parser backend (LlamaParse by default)
+
+        Parses are cached by the PDF's content hash, so the same file is only
+        ever parsed once per backend.
         
         Parameters:
             pdf_path (str): Path to PDF file
+            cleanup (bool): Remove the file afterwards (disable for cached PDFs)
             
         Returns:
-            dict: Structured content from the PDF
+            list: Parsed documents, each with `text` and `metadata`
         """
         logger.info(f"Starting PDF parsing: {pdf_path}")
         try:
-            parsed_content = self.parser.load_data(pdf_path)
+            pdf_hash = None
+            if self.parse_cache is not None:
+                pdf_hash = file_sha256(pdf_path)
+                cached_content = self.parse_cache.get(pdf_hash, namespace=self.parser.name)
+                if cached_content is not None:
+                    logger.debug("Using cached parse")
+                    return cached_content
+
+            parsed_content = self.parser.parse(pdf_path)
             logger.debug("PDF parsing successful")
+
+            if pdf_hash is not None and parsed_content:
+                self.parse_cache.put(pdf_hash, parsed_content, namespace=self.parser.name)
             return parsed_content
         except Exception as e:
             logger.error(f"Error parsing PDF: {e}", exc_info=True)
-            return {}
+            return []
         finally:
-            if os.path.exists(pdf_path):
+            if cleanup and os.path.exists(pdf_path):
                 os.remove(pdf_path)
                 logger.debug(f"Cleaned up temporary file: {pdf_path}")
 
@@ -63,120 +147,183 @@ class PaperSummarizer:
                     it for summarizing: {full_text}"""
 
         try:
-            response = self.model.generate_content(prompt)
+            response = self.insights_llm.generate(prompt)
             logger.debug("Successfully generated insights")
-            return response.text
+            return response
         except Exception as e:
             logger.error(f"Error generating insights: {e}", exc_info=True)
-            return "Error generating insights"
+            raise
         
-    def generate_summary(self, full_text: str, recursive:bool=False) -> str:
-        logger.info(f"Starting summary generation (recursive={recursive})")
+    def _single_pass_summary(self, full_text: str) -> str:
+        prompt = SINGLE_PASS_PROMPT.format(full_text=full_text)
+        return self.summary_llm.generate(prompt)
 
-        if recursive:
-            logger.debug("Using recursive summarization approach")
-            prompt_template = PromptTemplate.from_template("""Summarize a given document chunk clearly and succinctly.
-                        Each input will be a part of a longer document, presented in chunks. Your goal is to summarize the content of each chunk in a way that maintains the overall meaning and ensures that important context is preserved for future summarization steps. Focus on capturing the core themes, essential details, and relevant points in each chunk, while avoiding redundancy.
-                        Keep the summary short, highlight only the most crucial information, and avoid including minor details unless absolutely necessary for comprehension.
+    def _summarize_chunks(self, chunks: List[str]) -> List[str]:
+        """Summarize chunks concurrently, at most `map_concurrency` at a time; chunks that fail are dropped"""
+        def summarize(chunk: str) -> Optional[str]:
+            try:
+                return self.summary_llm.generate(CHUNK_SUMMARY_PROMPT.format(chunk=chunk))
+            except Exception as e:
+                logger.error(f"Error summarizing chunk: {e}", exc_info=True)
+                return None
 
-                        # Steps
+        with ThreadPoolExecutor(max_workers=max(1, min(self.map_concurrency, len(chunks))),
+                                thread_name_prefix="summary-map") as executor:
+            summaries = list(executor.map(summarize, chunks))
+        return [summary for summary in summaries if summary]
 
-                        1. **Read the Chunk Thoroughly**: Understand the content, context, and intent of the given document snippet.
-                        2. **Identify Key Themes and Details**: Distill the primary subjects, essential arguments, and most significant points.
-                        3. **Formulate a Summary**: Present these key themes clearly and concisely, capturing the core information of the given chunk.
+    def _group_summaries(self, summaries: List[str]) -> List[str]:
+        """Pack consecutive summaries into groups that each fit in one chunk's token budget"""
+        groups, current, current_tokens = [], [], 0
+        for summary in summaries:
+            tokens = estimate_tokens(summary)
+            if current and current_tokens + tokens > self.chunk_tokens:
+                groups.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(summary)
+            current_tokens += tokens
+        if current:
+            groups.append("\n\n".join(current))
 
-                        # Output Format
+        if len(groups) >= len(summaries) > 1:
+            # every summary fills a budget on its own; pair them up so the tree still shrinks
+            groups = ["\n\n".join(summaries[i:i + 2]) for i in range(0, len(summaries), 2)]
+        return groups
 
-                        - Provide the summary in 2-4 sentences.
-                        - Make sure the summary is expressive enough that the next summarization step can understand the key aspects of the chunk.
-                        - Avoid unnecessary details or overly verbose explanations.
+    def map_reduce_summary(self, full_text: str) -> str:
+        """
+        Summarize a long document with a parallel map-reduce
 
-                        # Examples
+        The text is split into chunks sized by token budget and every chunk is
+        summarized concurrently (map). The chunk summaries are then packed into
+        groups and summarized again, level by level, until they fit in a single
+        chunk (tree reduce, each level in parallel). The final structured
+        summary is generated from the reduced text.
 
-                        **Input:**
-                        "[Document Chunk: The latest artificial intelligence techniques, particularly in machine learning, have resulted in notable advancements in areas such as language modeling, predictive analytics, and computer vision. Language models, specifically, show significant capability to understand and generate human-like text, while predictive analytics is being refined to improve decision-making processes in healthcare systems.]"
+        Parameters:
+            full_text (str): Full text of the paper
 
-                        **Output:**
-                        "The latest AI techniques, notably in machine learning, are enhancing language modeling, predictive analytics, and computer vision. Language models are advancing significantly in human-like text generation, and predictive analytics is becoming more effective within healthcare decision-making."
+        Returns:
+            str: Structured summary
+        """
+        chunks = self.text_splitter.split_text(full_text)
+        logger.debug(f"Map stage: summarizing {len(chunks)} chunks")
+        summaries = self._summarize_chunks(chunks)
 
-                        # Notes
+        level = 1
+        while summaries and sum(estimate_tokens(summary) for summary in summaries) > self.chunk_tokens:
+            if level > self.max_reduce_levels:
+                logger.warning(f"Stopping reduce after {self.max_reduce_levels} levels")
+                break
+            groups = self._group_summaries(summaries)
+            logger.debug(f"Reduce level {level}: {len(summaries)} summaries into {len(groups)} groups")
+            summaries = self._summarize_chunks(groups)
+            level += 1
 
-                        - Avoid summarizing in a manner that removes important context necessary for understanding subsequent chunks.
-                        - Make sure to use concise language that does not sacrifice content quality.
-                        - If a chunk appears to be connected to previous content, ensure the summary remains coherent for eventual recursive summarization.
-                        [Document chunk: {chunk}]""")
-            
-            text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=4000,
-            chunk_overlap=200,
-            length_function=len,
-            )
-            
-            chunks = text_splitter.split_text(full_text)
-            logger.debug(f"Split text into {len(chunks)} chunks")
-            
-            summaries = []
-            for i, chunk in enumerate(chunks, 1):
-                logger.debug(f"Processing chunk {i}/{len(chunks)}")
-                try:
-                    response = self.model.generate_content(prompt)
-                    summaries.append(response.text)
-                except Exception as e:
-                    logger.error(f"Error in first-level summarization: {e}", exc_info=True)
-                    continue
-            
-            combined_summary = "\n\n".join(summaries)
-            while len(combined_summary) > 4000:
-                chunks = text_splitter.split_text(combined_summary)
-                summaries = []
-                for chunk in chunks:
-                    prompt = prompt_template(chunk=chunk)
-                    try:
-                        response = self.model.generate_content(prompt)
-                        summaries.append(response.text)
-                    except Exception as e:
-                        logger.error(f"Error in recursive summarization: {e}", exc_info=True)
-                        continue
-                combined_summary = "\n\n".join(summaries)
-            
-            return combined_summary
+        if not summaries:
+            raise RuntimeError("No chunk of the document could be summarized")
+        return self._single_pass_summary("\n\n".join(summaries))
 
-        else:
-            logger.debug("Using single-pass summarization")
-            prompt = f"""Please provide a comprehensive summary of this scientific paper:
+    def generate_summary(self, full_text: str, recursive: Optional[bool] = None) -> str:
+        """
+        Summarize a paper, in a single pass or with map-reduce
 
-                        Please structure the summary as follows:
-                        1. Main objective and motivation
-                        2. Key methods and approaches
-                        3. Principal findings and results
-                        4. Significance and implications
+        Parameters:
+            full_text (str): Full text of the paper
+            recursive (bool): Force map-reduce (True) or single-pass (False);
+                by default map-reduce is used when the text exceeds `single_pass_tokens`
 
-                        Keep the summary focused and technical but accessible to researchers in related fields.: {full_text}"""
-            try:
-                response = self.model.generate_content(prompt)
-                logger.debug("Successfully generated summary")
-                return response.text
-            except Exception as e:
-                logger.error(f"Error generating summary: {e}", exc_info=True)
-                return "Error generating summary"
+        Returns:
+            str: Structured summary
+
+        Raises:
+            Exception: When the LLM fails; the error is not turned into summary text
+        """
+        if recursive is None:
+            recursive = estimate_tokens(full_text) > self.single_pass_tokens
+        logger.info(f"Starting summary generation (recursive={recursive})")
+
+        try:
+            if recursive:
+                logger.debug("Using map-reduce summarization")
+                summary = self.map_reduce_summary(full_text)
+            else:
+                logger.debug("Using single-pass summarization")
+                summary = self._single_pass_summary(full_text)
+            logger.debug("Successfully generated summary")
+            return summary
+        except Exception as e:
+            logger.error(f"Error generating summary: {e}", exc_info=True)
+            raise
 
     def summarize_paper(self, parsed_content:str) -> str:
         """
-        Main function to summarize a paper from its arXiv link
+        Main function to summarize a paper from its parsed content
+
+        The summary and insights requests are independent and run concurrently,
+        each on the paper text reduced for that prompt.
         
         Parameters:
-            paper_link (str): arXiv link to the paper
-            model_name (str): Name of the Ollama model to use
+            parsed_content (list): Documents returned by parse_pdf
             
         Returns:
-            str: Generated summary
+            tuple: Generated summary, insights and the paper's full text
+
+        Raises:
+            Exception: If the summary or the insights fail or run out of time
         """
         full_text = "\n\n".join([doc.text for doc in parsed_content])
+        sections = self.reducer.prepare(full_text)
         
-        summary = self.generate_summary(full_text, recursive=False)
-        insights = self.generate_insights(full_text)
+        results = run_in_parallel(
+            {
+                'summary': lambda: self.generate_summary(sections.reduce('summary')),
+                'insights': lambda: self.generate_insights(sections.reduce('insights')),
+            },
+            timeout=self.call_timeout,
+            timeouts={'summary': self.summary_timeout}
+        )
         
-        return summary, insights, full_text
+        return results['summary'], results['insights'], full_text
+
+    def analyze_paper(self, parsed_content) -> Dict[str, str]:
+        """
+        Run every per-paper LLM request (summary, insights, conclusion) concurrently
+
+        The paper is segmented once and each request gets the text reduced by
+        its prompt's policy; the conclusion is only sent to the LLM when it
+        can't be read from the paper's sections.
+
+        Parameters:
+            parsed_content (list): Documents returned by parse_pdf
+
+        Returns:
+            dict: 'summary', 'insights', 'conclusion', 'full_text' and 'reduction'
+                (tokens in the full text and tokens saved per prompt)
+
+        Raises:
+            Exception: If the summary or the insights fail or run out of time, so the
+                paper is not saved with a placeholder; a failed conclusion is left empty
+        """
+        full_text = "\n\n".join([doc.text for doc in parsed_content])
+        sections = self.reducer.prepare(full_text)
+
+        results = run_in_parallel(
+            {
+                'summary': lambda: self.generate_summary(sections.reduce('summary')),
+                'insights': lambda: self.generate_insights(sections.reduce('insights')),
+                'conclusion': partial(get_conclusion, full_text, llm=self.conclusion_llm,
+                                      reduce=lambda text: sections.reduce('conclusion')),
+            },
+            timeout=self.call_timeout,
+            timeouts={'summary': self.summary_timeout},
+            fallbacks={'conclusion': ""}
+        )
+        results['full_text'] = full_text
+        results['reduction'] = sections.report()
+        logger.info(f"Input reduction saved {results['reduction']['tokens_saved']} tokens "
+                    f"across {len(results['reduction']['prompts'])} prompts ({sections.tokens} tokens in the paper)")
+        return results
     
  
 # if __name__ == "__main__":
@@ -1,40 +1,93 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, Callable
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import tempfile
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
-def download_pdf(arxiv_id: str) -> Optional[str]:
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session(pool_size: int = 16) -> requests.Session:
+    """
+    Shared HTTP session with a keep-alive connection pool
+
+    Parameters:
+        pool_size (int): Connections kept open per host (used on first call only)
+
+    Returns:
+        requests.Session: Process-wide session
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _http_session = session
+        return _http_session
+
+def download_pdf(arxiv_id: str, cache=None, pin: bool = False) -> Optional[str]:
         """
         Download PDF from arXiv
         
         Parameters:
             arxiv_id (str): arXiv ID extracted from the paper link
+            cache (PDFCache): Optional PDF cache to serve the file from
+            pin (bool): Keep the cached PDF from being evicted until `cache.release` is called
             
         Returns:
-            str: Path to temporary PDF file
+            str: Path to the PDF, inside the cache directory when a cache is given,
+                 otherwise a temporary file the caller is responsible for removing
         """
         if "arxiv.org" in arxiv_id:
-            arxiv_id = arxiv_id.split('/')[-1]
-        
-        pdf_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
+            arxiv_id = arxiv_id_from_link(arxiv_id)
         
         try:
-            response = requests.get(pdf_url)
-            response.raise_for_status()
-            
-            # Create temporary file
-            temp_pdf = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-            temp_pdf.write(response.content)
-            temp_pdf.close()
+            if cache is not None:
+                return cache.fetch(arxiv_id, pin=pin)
+
+            pdf_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
+            with get_http_session().get(pdf_url, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                
+                # Create temporary file
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        temp_pdf.write(chunk)
             
             return temp_pdf.name
         except Exception as e:
-            print(f"Error downloading PDF: {e}")
+            logger.error(f"Error downloading PDF: {e}", exc_info=True)
             return None
 
+def arxiv_id_from_link(link: str) -> str:
+    """
+    Extract the versioned arXiv identifier from a paper link
+
+    Parameters:
+        link (str): arXiv abs/pdf link, e.g. 'http://arxiv.org/abs/2411.09566v1'
+
+    Returns:
+        str: arXiv identifier, e.g. '2411.09566v1'
+    """
+    if '/abs/' in link:
+        arxiv_id = link.split('/abs/', 1)[1]
+    elif '/pdf/' in link:
+        arxiv_id = link.split('/pdf/', 1)[1]
+    else:
+        arxiv_id = link.rsplit('/', 1)[-1]
+    arxiv_id = arxiv_id.strip('/')
+    if arxiv_id.endswith('.pdf'):
+        arxiv_id = arxiv_id[:-len('.pdf')]
+    return arxiv_id
+
 def save_results(papers:List=[], path:str='../data/results.json'):
     """
     Save fetched papers to a text file
@@ -106,4 +159,52 @@ def save_summaries(paper_link: str, summary: str, insights: str, full_text: str,
             json.dump(summaries, f, ensure_ascii=False, indent=4)
             
     except Exception as e:
-        logger.error(f"Error saving summaries: {e}", exc_info=True)
\ No newline at end of file
+        logger.error(f"Error saving summaries: {e}", exc_info=True)
+
+def run_in_parallel(calls: Dict[str, Callable[[], Any]], timeout: Optional[float] = None,
+                    fallbacks: Optional[Dict[str, Any]] = None,
+                    timeouts: Optional[Dict[str, Optional[float]]] = None) -> Dict[str, Any]:
+    """
+    Run independent blocking calls concurrently and collect their results
+
+    Parameters:
+        calls (dict): Name -> zero-argument callable
+        timeout (float): Seconds each call may take before its fallback is used
+        fallbacks (dict): Name -> value returned when the call fails or times out;
+            a call without a fallback raises instead
+        timeouts (dict): Name -> seconds, overriding `timeout` for that call
+
+    Returns:
+        dict: Name -> result (or fallback)
+
+    Raises:
+        TimeoutError: If a call without a fallback times out
+        Exception: Whatever a call without a fallback raised
+    """
+    fallbacks = fallbacks or {}
+    timeouts = timeouts or {}
+    executor = ThreadPoolExecutor(max_workers=max(1, len(calls)), thread_name_prefix="parallel")
+    try:
+        start = time.monotonic()
+        futures = {name: executor.submit(call) for name, call in calls.items()}
+
+        results = {}
+        for name, future in futures.items():
+            call_timeout = timeouts.get(name, timeout)
+            remaining = max(0.0, start + call_timeout - time.monotonic()) if call_timeout is not None else None
+            try:
+                results[name] = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                logger.error(f"Call '{name}' timed out after {call_timeout}s")
+                if name not in fallbacks:
+                    raise TimeoutError(f"Call '{name}' timed out after {call_timeout}s")
+                results[name] = fallbacks[name]
+            except Exception as e:
+                logger.error(f"Call '{name}' failed: {e}", exc_info=True)
+                if name not in fallbacks:
+                    raise
+                results[name] = fallbacks[name]
+        return results
+    finally:
+        # don't block on calls that timed out, their threads finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
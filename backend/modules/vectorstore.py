@@ -0,0 +1,834 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (chunk ids, chunk texts, metadatas with 'doc_id' and 'paper_url')
+ChunkPage = Tuple[List[str], List[str], List[Dict[str, str]]]
+
+
+class VectorStore:
+    """
+    Chunk embeddings with their text and document, searchable by cosine distance.
+
+    Documents are written whole: `upsert_document` replaces every chunk the
+    document had before.
+    """
+
+    # identifies the backend in logs and stats
+    name = "base"
+
+    def upsert_document(self, doc_id: str, paper_url: str, ids: Sequence[str], embeddings: np.ndarray,
+                        chunks: Sequence[str]) -> None:
+        raise NotImplementedError
+
+    def has_document(self, doc_id: str) -> bool:
+        raise NotImplementedError
+
+    def document_chunk_ids(self, doc_id: str) -> List[str]:
+        raise NotImplementedError
+
+    def delete(self, ids: Sequence[str]) -> None:
+        raise NotImplementedError
+
+    def query(self, embedding: np.ndarray, top_k: int, doc_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Nearest chunks to an embedding
+
+        Returns:
+            list: Dicts with 'id', 'doc_id', 'paper_url', 'chunk_text' and 'distance', nearest first
+        """
+        raise NotImplementedError
+
+    def get_embeddings(self, ids: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+        """Stored embeddings of the given chunks, as (found ids, matrix with one row per found id)."""
+        raise NotImplementedError
+
+    def iter_chunks(self, page_size: int = 1000) -> Iterator[ChunkPage]:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def vacuum(self) -> int:
+        """Reclaim space left by deleted chunks; returns the number of reclaimed rows."""
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': self.name, 'chunks': self.count()}
+
+    def close(self) -> None:
+        pass
+
+
+class ChromaVectorStore(VectorStore):
+    """A ChromaDB persistent collection with cosine HNSW."""
+
+    name = "chroma"
+
+    def __init__(self, path: str = "./chroma_storage", collection_name: str = "arxiv_papers"):
+        import chromadb
+
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(
+            name=collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def upsert_document(self, doc_id: str, paper_url: str, ids: Sequence[str], embeddings: np.ndarray,
+                        chunks: Sequence[str]) -> None:
+        if ids:
+            self.collection.upsert(
+                ids=list(ids),
+                embeddings=embeddings,
+                documents=list(chunks),
+                metadatas=[{"doc_id": doc_id, "paper_url": paper_url} for _ in ids]
+            )
+        stale_ids = set(self.document_chunk_ids(doc_id)) - set(ids)
+        if stale_ids:
+            self.collection.delete(ids=list(stale_ids))
+
+    def has_document(self, doc_id: str) -> bool:
+        return bool(self.collection.get(where={"doc_id": doc_id}, limit=1, include=[])['ids'])
+
+    def document_chunk_ids(self, doc_id: str) -> List[str]:
+        return self.collection.get(where={"doc_id": doc_id}, include=[])['ids']
+
+    def delete(self, ids: Sequence[str]) -> None:
+        if ids:
+            self.collection.delete(ids=list(ids))
+
+    def query(self, embedding: np.ndarray, top_k: int, doc_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        results = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=top_k,
+            where={"doc_id": doc_id} if doc_id else {}
+        )
+        return [
+            {
+                "id": results['ids'][0][i],
+                "doc_id": results['metadatas'][0][i].get('doc_id', ''),
+                "paper_url": results['metadatas'][0][i].get('paper_url', ''),
+                "chunk_text": results['documents'][0][i],
+                "distance": results['distances'][0][i]
+            }
+            for i in range(len(results['ids'][0]))
+        ]
+
+    def get_embeddings(self, ids: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+        stored = self.collection.get(ids=list(ids), include=["embeddings"])
+        return stored['ids'], np.asarray(stored['embeddings'], dtype=np.float32)
+
+    def iter_chunks(self, page_size: int = 1000) -> Iterator[ChunkPage]:
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page['ids']:
+                return
+            yield page['ids'], [text or '' for text in page['documents']], [meta or {} for meta in page['metadatas']]
+            offset += len(page['ids'])
+
+    def count(self) -> int:
+        return self.collection.count()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _quantize(vectors: np.ndarray, dtype: np.dtype) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Convert float32 rows to the storage dtype
+
+    int8 is symmetric per row: each row is divided by its own scale,
+    max(|v|) / 127, so the largest component maps to ±127.
+
+    Returns:
+        tuple: (stored rows, per-row float32 scales for int8, else None)
+    """
+    if dtype != np.int8:
+        return vectors.astype(dtype), None
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def _dequantize(vectors: np.ndarray, scales: Optional[np.ndarray], rows: Any) -> np.ndarray:
+    """Rows (an index array or a slice) of a stored matrix as float32."""
+    matrix = np.asarray(vectors[rows], dtype=np.float32)
+    if scales is not None:
+        matrix *= np.asarray(scales[rows])[:, None]
+    return matrix
+
+
+class _MappedRows:
+    """A raw file of fixed-shape rows, memory-mapped and grown by doubling."""
+
+    def __init__(self, path: str, dtype: np.dtype, row_shape: Tuple[int, ...], capacity: int):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.row_shape = row_shape
+        self.row_bytes = self.dtype.itemsize * int(np.prod(row_shape))
+        if not os.path.exists(path):
+            self._resize(capacity)
+        self._map()
+
+    def _resize(self, capacity: int) -> None:
+        with open(self.path, 'ab') as f:
+            f.truncate(capacity * self.row_bytes)
+
+    def _map(self) -> None:
+        self.capacity = os.path.getsize(self.path) // self.row_bytes
+        self.array = np.memmap(self.path, dtype=self.dtype, mode='r+', shape=(self.capacity, *self.row_shape))
+
+    def read_rows(self, rows: Sequence[int]) -> np.ndarray:
+        """
+        Copies of a few scattered rows, read from the file rather than through the map
+
+        Touching a mapped page also maps the neighbouring cached pages into the
+        process, so reading a few rows per query through the map would keep most
+        of the file resident over time. pread only copies the rows.
+        """
+        if not hasattr(os, 'pread'):
+            return np.array(self.array[rows])
+        out = np.empty((len(rows), *self.row_shape), dtype=self.dtype)
+        buffer = out.reshape(-1).view(np.uint8).reshape(len(rows), self.row_bytes)
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            for i, row in enumerate(rows):
+                buffer[i] = np.frombuffer(os.pread(fd, self.row_bytes, int(row) * self.row_bytes), dtype=np.uint8)
+        finally:
+            os.close(fd)
+        return out
+
+    def grow(self, capacity: int) -> None:
+        if capacity <= self.capacity:
+            return
+        self.array.flush()
+        self._resize(capacity)
+        self._map()
+
+    def copy_rows(self, rows: Sequence[int], capacity: int, block: int = 65536) -> str:
+        """Write the given rows, in order, to a new file beside this one; returns its path."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.truncate(capacity * self.row_bytes)
+        target = np.memmap(tmp_path, dtype=self.dtype, mode='r+', shape=(capacity, *self.row_shape))
+        for start in range(0, len(rows), block):
+            batch = rows[start:start + block]
+            target[start:start + len(batch)] = self.array[batch]
+        target.flush()
+        del target
+        return tmp_path
+
+    def replace(self, tmp_path: str) -> None:
+        self.array.flush()
+        os.replace(tmp_path, self.path)
+        self._map()
+
+    def flush(self) -> None:
+        self.array.flush()
+
+
+class IVFIndex:
+    """
+    Inverted-file index: rows grouped by their nearest k-means centroid.
+
+    A query scores only the rows of its `nprobe` nearest centroids. Rows
+    added after training are not in any list; the store scans them exactly.
+    """
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray, trained_rows: int):
+        self.centroids = centroids
+        # row numbers sorted by list; list i is order[offsets[i]:offsets[i + 1]]
+        self.order = order
+        self.offsets = offsets
+        self.trained_rows = trained_rows
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def train(cls, read: Callable[[Any], np.ndarray], rows: int, live: np.ndarray, nlist: int,
+              iterations: int = 10, sample_per_list: int = 40, block: int = 16384, seed: int = 0) -> 'IVFIndex':
+        """
+        Spherical k-means on a sample of the live rows, then assign every live row
+
+        Parameters:
+            read (callable): Returns the float32 rows for an index array or slice
+            rows (int): Rows to index, from the start of the matrix
+            live (np.ndarray): Boolean mask, False for deleted rows
+            nlist (int): Number of lists (centroids)
+            iterations (int): k-means iterations
+            sample_per_list (int): Training rows per centroid
+            block (int): Rows scored at once when assigning
+        """
+        rng = np.random.default_rng(seed)
+        live_rows = np.flatnonzero(live[:rows])
+        nlist = max(1, min(nlist, len(live_rows)))
+        sample = np.sort(rng.choice(live_rows, size=min(len(live_rows), nlist * sample_per_list), replace=False))
+        data = read(sample)
+
+        centroids = data[rng.choice(len(data), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, data)
+            empty = np.bincount(assignment, minlength=nlist) == 0
+            # re-seed empty lists with random sample rows
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        assignment = np.full(rows, -1, dtype=np.int32)
+        for start in range(0, rows, block):
+            end = min(rows, start + block)
+            scores = read(slice(start, end)) @ centroids.T
+            assignment[start:end] = np.argmax(scores, axis=1)
+        assignment[~live[:rows]] = -1
+
+        kept = np.flatnonzero(assignment >= 0)
+        order = kept[np.argsort(assignment[kept], kind='stable')].astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment[kept], minlength=nlist))
+        return cls(centroids.astype(np.float32), order, offsets, rows)
+
+    def probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Row numbers in the `nprobe` lists nearest to the (normalized) query."""
+        nprobe = min(nprobe, self.nlist)
+        nearest = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in nearest])
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                 trained_rows=np.array([self.trained_rows]))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['IVFIndex']:
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data['centroids'], data['order'], data['offsets'], int(data['trained_rows'][0]))
+
+
+class MmapVectorStore(VectorStore):
+    """
+    In-process vector store: a memory-mapped embedding matrix plus an SQLite sidecar.
+
+    Rows are appended and never rewritten in place (until `vacuum`), and each
+    document's chunks are stored as one contiguous row range, so a per-paper
+    search is an exact scan of that slice. Replaced or deleted chunks are
+    tombstoned. Rows are normalized on write and scored by dot product.
+
+    Corpora up to `exact_threshold` live rows are searched exactly with
+    NumPy. Above that an IVF index is trained in the background (and again
+    whenever the rows added since outgrow a quarter of the indexed ones),
+    and queries score the `nprobe` nearest lists plus the untrained tail.
+
+    Rows can be stored quantized: float16 halves the matrix, int8 (with a
+    float32 scale per row) quarters it. Every search scans the quantized
+    rows. With `rescore`, a float32 copy of each row is also written, and
+    the best `top_k * rescore` candidates are re-scored exactly against
+    it. That copy is only read for those few rows, so it stays on disk
+    and not in RAM. `measure_recall` reports what the quantization (and
+    the IVF index) cost against exact full-precision search.
+
+    Files in `path`: vectors.bin (raw matrix in the storage dtype),
+    scales.bin (int8 only), full.bin (float32 copy, with rescore), meta.db
+    (chunk ids, text, document ranges, tombstones) and ivf.npz.
+    """
+
+    name = "mmap"
+
+    DTYPES = ("float32", "float16", "int8")
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS chunks (
+            row INTEGER PRIMARY KEY,
+            chunk_id TEXT NOT NULL UNIQUE,
+            doc_id TEXT NOT NULL,
+            paper_url TEXT,
+            chunk_text TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_chunks_doc_id ON chunks(doc_id);
+        CREATE TABLE IF NOT EXISTS documents (
+            doc_id TEXT PRIMARY KEY,
+            start INTEGER NOT NULL,
+            end INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS deleted (
+            row INTEGER PRIMARY KEY
+        );
+    """
+
+    def __init__(self, path: str = "./data/db/mmap_vectors", dim: int = 384, dtype: str = "float32",
+                 exact_threshold: int = 50_000, nprobe: int = 32, nlist: Optional[int] = None,
+                 rescore: int = 0, initial_capacity: int = 1024):
+        """
+        Parameters:
+            path (str): Directory for the store's files
+            dim (int): Embedding dimension
+            dtype (str): 'float32', 'float16' or 'int8' storage (queries are scored in float32)
+            exact_threshold (int): Live rows up to which search is exact
+            nprobe (int): IVF lists scored per query
+            nlist (int): IVF lists; sqrt(rows) by default
+            rescore (int): Candidates per result re-scored in full precision, 0 to rank on
+                the stored rows alone; ignored for float32
+            initial_capacity (int): Rows allocated when the matrix file is created
+        """
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.exact_threshold = exact_threshold
+        self.nprobe = nprobe
+        self.nlist = nlist
+        self.rescore = rescore if dtype != "float32" else 0
+        self.vectors_path = os.path.join(path, "vectors.bin")
+        self.index_path = os.path.join(path, "ivf.npz")
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(path, "meta.db"), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+            meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+            if meta:
+                if int(meta['dim']) != dim or meta['dtype'] != dtype:
+                    raise ValueError(f"Vector store at {path} holds {meta['dtype']} vectors of dimension "
+                                     f"{meta['dim']}, not {dtype} of dimension {dim}")
+                full_precision = meta.get('full_precision') == '1'
+                if self.rescore and not full_precision:
+                    raise ValueError(f"Vector store at {path} keeps no full-precision copy to re-score "
+                                     f"against; rebuild it with rescore enabled")
+            else:
+                full_precision = bool(self.rescore)
+                self._conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                                       [('dim', str(dim)), ('dtype', dtype), ('rows', '0'),
+                                        ('full_precision', '1' if full_precision else '0')])
+            self._rows = int(meta.get('rows', 0))
+
+        # a store created with a full-precision copy keeps it up to date even while rescoring is off
+        capacity = max(initial_capacity, 1)
+        self._vectors = _MappedRows(self.vectors_path, self.dtype, (dim,), capacity)
+        self._scales = (_MappedRows(os.path.join(path, "scales.bin"), np.float32, (), self._vectors.capacity)
+                        if self.dtype == np.int8 else None)
+        self._full = (_MappedRows(os.path.join(path, "full.bin"), np.float32, (dim,), self._vectors.capacity)
+                      if full_precision else None)
+        for mapped in self._files():
+            # a crash while growing can leave the files with different capacities
+            mapped.grow(self._vectors.capacity)
+        self._capacity = self._vectors.capacity
+        self._deleted = np.zeros(self._capacity, dtype=bool)
+        deleted_rows = [row for (row,) in self._conn.execute("SELECT row FROM deleted")]
+        self._deleted[deleted_rows] = True
+        self._deleted_count = len(deleted_rows)
+
+        self._index = IVFIndex.load(self.index_path)
+        if self._index is not None and self._index.trained_rows > self._rows:
+            logger.warning(f"Discarding IVF index at {self.index_path}: it covers more rows than the store")
+            self._index = None
+        self._generation = 0
+        self._index_thread: Optional[threading.Thread] = None
+        logger.info(f"Opened mmap vector store at {path} ({self.count()} chunks, {self._rows} rows, {dtype}, "
+                    f"index: {'ivf' if self._index is not None else 'none'})")
+
+    # storage
+
+    def _files(self) -> List[_MappedRows]:
+        return [mapped for mapped in (self._vectors, self._scales, self._full) if mapped is not None]
+
+    def _read(self, rows: Any) -> np.ndarray:
+        """Stored rows as float32 (dequantized); called with the lock held."""
+        return _dequantize(self._vectors.array, None if self._scales is None else self._scales.array, rows)
+
+    def _reserve(self, rows: int) -> None:
+        # called with the lock held
+        if rows <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < rows:
+            capacity *= 2
+        for mapped in self._files():
+            mapped.grow(capacity)
+        self._capacity = capacity
+        self._deleted = np.concatenate([self._deleted, np.zeros(self._capacity - len(self._deleted), dtype=bool)])
+
+    def _tombstone(self, rows: List[int]) -> None:
+        # called with the lock held, inside a transaction
+        if not rows:
+            return
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            self._conn.execute(f"DELETE FROM chunks WHERE row IN ({placeholders})", batch)
+        self._conn.executemany("INSERT OR IGNORE INTO deleted (row) VALUES (?)", [(row,) for row in rows])
+        self._deleted[rows] = True
+        self._deleted_count += len(rows)
+
+    def upsert_document(self, doc_id: str, paper_url: str, ids: Sequence[str], embeddings: np.ndarray,
+                        chunks: Sequence[str]) -> None:
+        vectors = _normalize(embeddings).reshape(-1, self.dim) if len(ids) else np.empty((0, self.dim))
+        stored, scales = _quantize(vectors, self.dtype)
+        with self._lock:
+            with self._conn:
+                stale = [row for (row,) in self._conn.execute("SELECT row FROM chunks WHERE doc_id = ?", (doc_id,))]
+                placeholders = ",".join("?" * len(ids))
+                if ids:
+                    # a chunk id moving here from another document
+                    stale += [row for (row,) in self._conn.execute(
+                        f"SELECT row FROM chunks WHERE chunk_id IN ({placeholders}) AND doc_id != ?",
+                        (*ids, doc_id)
+                    )]
+                self._tombstone(stale)
+
+                start = self._rows
+                if ids:
+                    end = start + len(ids)
+                    self._reserve(end)
+                    self._vectors.array[start:end] = stored
+                    if self._scales is not None:
+                        self._scales.array[start:end] = scales
+                    if self._full is not None:
+                        self._full.array[start:end] = vectors
+                    for mapped in self._files():
+                        mapped.flush()
+                    self._conn.executemany(
+                        "INSERT INTO chunks (row, chunk_id, doc_id, paper_url, chunk_text) VALUES (?, ?, ?, ?, ?)",
+                        [(start + i, chunk_id, doc_id, paper_url, chunk)
+                         for i, (chunk_id, chunk) in enumerate(zip(ids, chunks))]
+                    )
+                    self._conn.execute(
+                        "INSERT INTO documents (doc_id, start, end) VALUES (?, ?, ?) "
+                        "ON CONFLICT(doc_id) DO UPDATE SET start = excluded.start, end = excluded.end",
+                        (doc_id, start, end)
+                    )
+                else:
+                    self._conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+                self._rows = start + len(ids)
+                self._conn.execute("UPDATE meta SET value = ? WHERE key = 'rows'", (str(self._rows),))
+            self._maybe_build_index()
+
+    def has_document(self, doc_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM chunks WHERE doc_id = ? LIMIT 1", (doc_id,)).fetchone() is not None
+
+    def document_chunk_ids(self, doc_id: str) -> List[str]:
+        with self._lock:
+            return [chunk_id for (chunk_id,) in self._conn.execute(
+                "SELECT chunk_id FROM chunks WHERE doc_id = ? ORDER BY row", (doc_id,)
+            )]
+
+    def _rows_for(self, ids: Sequence[str]) -> Dict[str, int]:
+        # called with the lock held
+        found = {}
+        for start in range(0, len(ids), 500):
+            batch = list(ids[start:start + 500])
+            placeholders = ",".join("?" * len(batch))
+            found.update(self._conn.execute(
+                f"SELECT chunk_id, row FROM chunks WHERE chunk_id IN ({placeholders})", batch
+            ))
+        return found
+
+    def delete(self, ids: Sequence[str]) -> None:
+        with self._lock, self._conn:
+            self._tombstone(sorted(self._rows_for(ids).values()))
+
+    def get_embeddings(self, ids: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+        with self._lock:
+            found = self._rows_for(ids)
+            found_ids = [chunk_id for chunk_id in ids if chunk_id in found]
+            rows = np.array([found[chunk_id] for chunk_id in found_ids], dtype=np.int64)
+            if self._full is not None:
+                matrix = self._full.read_rows(rows)
+            else:
+                matrix = self._read(rows)
+        return found_ids, matrix.reshape(-1, self.dim)
+
+    def iter_chunks(self, page_size: int = 1000) -> Iterator[ChunkPage]:
+        last_row = -1
+        while True:
+            with self._lock:
+                page = self._conn.execute(
+                    "SELECT row, chunk_id, chunk_text, doc_id, paper_url FROM chunks WHERE row > ? "
+                    "ORDER BY row LIMIT ?", (last_row, page_size)
+                ).fetchall()
+            if not page:
+                return
+            last_row = page[-1][0]
+            yield ([chunk_id for _, chunk_id, _, _, _ in page],
+                   [text or '' for _, _, text, _, _ in page],
+                   [{'doc_id': doc_id, 'paper_url': paper_url or ''} for _, _, _, doc_id, paper_url in page])
+
+    def count(self) -> int:
+        return self._rows - self._deleted_count
+
+    # search
+
+    def _scores(self, start: int, end: int, query: np.ndarray, block: int = 1024) -> np.ndarray:
+        """Dot products of query with rows [start, end), converting quantized blocks to float32."""
+        if self.dtype == np.float32:
+            return np.asarray(self._vectors.array[start:end] @ query)
+        # small blocks keep the float32 copy in cache; converting 64k rows at once is 3-4x slower
+        scores = np.empty(end - start, dtype=np.float32)
+        for offset in range(start, end, block):
+            stop = min(end, offset + block)
+            block_scores = self._vectors.array[offset:stop].astype(np.float32) @ query
+            if self._scales is not None:
+                # scaling the scores is cheaper than scaling the rows
+                block_scores *= self._scales.array[offset:stop]
+            scores[offset - start:stop - start] = block_scores
+        return scores
+
+    def _candidates(self, query: np.ndarray, doc_id: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(row numbers, scores) to rank for a query; called with the lock held."""
+        if doc_id:
+            document = self._conn.execute("SELECT start, end FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+            if document is None:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            start, end = document
+            return np.arange(start, end), self._scores(start, end, query)
+
+        index = self._index
+        if index is None or self.count() <= self.exact_threshold:
+            return np.arange(self._rows), self._scores(0, self._rows, query)
+
+        rows = np.sort(index.probe(query, self.nprobe))
+        scores = self._read(rows) @ query
+        if index.trained_rows < self._rows:
+            rows = np.concatenate([rows, np.arange(index.trained_rows, self._rows)])
+            scores = np.concatenate([scores, self._scores(index.trained_rows, self._rows, query)])
+        return rows, scores
+
+    def _search(self, query: np.ndarray, top_k: int, doc_id: Optional[str],
+                rescore: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, scores) of the best top_k live rows, best first; called with the lock held."""
+        rows, scores = self._candidates(query, doc_id)
+        scores = np.where(self._deleted[rows], -np.inf, scores)
+        keep = top_k * rescore if rescore else top_k
+        if len(rows) > keep:
+            best = np.argpartition(-scores, keep - 1)[:keep]
+        else:
+            best = np.arange(len(rows))
+        best = best[np.isfinite(scores[best])]
+        rows, scores = rows[best], scores[best]
+        if rescore and len(rows):
+            order = np.argsort(rows)
+            rows = rows[order]
+            scores = self._full.read_rows(rows) @ query
+        order = np.argsort(-scores)[:top_k]
+        return rows[order], scores[order]
+
+    def query(self, embedding: np.ndarray, top_k: int, doc_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = _normalize(embedding).reshape(self.dim)
+        with self._lock:
+            rows, scores = self._search(query, top_k, doc_id, self.rescore)
+            if not len(rows):
+                return []
+            top_rows = [int(row) for row in rows]
+            placeholders = ",".join("?" * len(top_rows))
+            metadata = {row: rest for row, *rest in self._conn.execute(
+                f"SELECT row, chunk_id, doc_id, paper_url, chunk_text FROM chunks WHERE row IN ({placeholders})",
+                top_rows
+            )}
+        results = []
+        for row, score in zip(top_rows, scores):
+            chunk_id, doc, paper_url, text = metadata[row]
+            results.append({'id': chunk_id, 'doc_id': doc, 'paper_url': paper_url or '',
+                            'chunk_text': text, 'distance': max(0.0, float(1.0 - score))})
+        return results
+
+    def measure_recall(self, queries: int = 200, top_k: int = 10, seed: int = 0,
+                       block: int = 65536) -> Dict[str, Any]:
+        """
+        Recall@k of search against exact search over the full-precision rows
+
+        The queries are the vectors of randomly sampled stored chunks. Recall
+        covers everything that makes search approximate: quantization and,
+        above exact_threshold, the IVF index.
+
+        Parameters:
+            queries (int): Chunks sampled as queries
+            top_k (int): k of recall@k
+
+        Returns:
+            dict: 'recall' of search as configured, plus 'first_pass_recall' (before
+                  re-scoring) when rescoring is on
+        """
+        with self._lock:
+            if self.dtype != np.float32 and self._full is None:
+                raise ValueError("Measuring recall needs the full-precision copy kept by a store with rescore")
+            exact = self._vectors if self._full is None else self._full
+            live = np.flatnonzero(~self._deleted[:self._rows])
+            if not len(live):
+                return {'queries': 0, 'top_k': top_k, 'dtype': self.dtype.name, 'recall': None}
+            rng = np.random.default_rng(seed)
+            sample = np.sort(rng.choice(live, size=min(queries, len(live)), replace=False))
+            matrix = np.asarray(exact.array[sample], dtype=np.float32)
+
+            # exact top_k of every query, one block of rows at a time
+            best_scores = np.full((len(sample), 0), -np.inf, dtype=np.float32)
+            best_rows = np.empty((len(sample), 0), dtype=np.int64)
+            for start in range(0, self._rows, block):
+                end = min(self._rows, start + block)
+                scores = matrix @ np.asarray(exact.array[start:end], dtype=np.float32).T
+                scores[:, self._deleted[start:end]] = -np.inf
+                best_scores = np.concatenate([best_scores, scores], axis=1)
+                best_rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, end), scores.shape)], axis=1)
+                if best_scores.shape[1] > top_k:
+                    keep = np.argpartition(-best_scores, top_k - 1, axis=1)[:, :top_k]
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+            truth = [set(rows.tolist()) for rows in best_rows]
+
+            def recall(rescore: int) -> float:
+                found = [len(truth[i] & set(self._search(query, top_k, None, rescore)[0].tolist()))
+                         for i, query in enumerate(matrix)]
+                return sum(found) / sum(len(rows) for rows in truth)
+
+            report = {'queries': len(sample), 'top_k': top_k, 'dtype': self.dtype.name, 'recall': recall(self.rescore)}
+            if self.rescore:
+                report['first_pass_recall'] = recall(0)
+        logger.info(f"Measured recall@{top_k} over {len(sample)} queries: {report}")
+        return report
+
+    # approximate index
+
+    def _maybe_build_index(self) -> None:
+        # called with the lock held
+        if self.count() <= self.exact_threshold:
+            return
+        if self._index_thread is not None and self._index_thread.is_alive():
+            return
+        if self._index is not None and self._rows - self._index.trained_rows <= self._index.trained_rows // 4:
+            return
+        self._index_thread = threading.Thread(target=self.build_index, name="vector-index-build", daemon=True)
+        self._index_thread.start()
+
+    def build_index(self) -> IVFIndex:
+        """Train the IVF index over every row stored so far (blocking) and make queries use it."""
+        with self._lock:
+            rows, live, generation = self._rows, ~self._deleted[:self._rows], self._generation
+            read = partial(_dequantize, self._vectors.array, None if self._scales is None else self._scales.array)
+        start = time.monotonic()
+        nlist = self.nlist or int(np.clip(np.sqrt(rows), 16, 4096))
+        # training reads rows that are never rewritten, so it runs without the lock
+        index = IVFIndex.train(read, rows, live, nlist)
+        with self._lock:
+            if generation != self._generation:
+                logger.info("Vector store was vacuumed during index build; discarding the index")
+                return index
+            index.save(self.index_path)
+            self._index = index
+        logger.info(f"Built IVF index ({index.nlist} lists over {rows} rows) in {time.monotonic() - start:.1f}s")
+        return index
+
+    def vacuum(self) -> int:
+        """
+        Rewrite the matrix without tombstoned rows, keeping each document contiguous
+
+        Blocks writes and queries while it runs; the IVF index is rebuilt afterwards.
+        """
+        thread = self._index_thread
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            if not self._deleted_count:
+                return 0
+            reclaimed = self._deleted_count
+            capacity = max(1024, self.count())
+
+            with self._conn:
+                moves, ranges, position = [], [], 0
+                for (doc_id,) in self._conn.execute("SELECT doc_id FROM documents ORDER BY start").fetchall():
+                    rows = [row for (row,) in self._conn.execute(
+                        "SELECT row FROM chunks WHERE doc_id = ? ORDER BY row", (doc_id,)
+                    )]
+                    if not rows:
+                        continue
+                    moves.extend((position + i, row) for i, row in enumerate(rows))
+                    ranges.append((position, position + len(rows), doc_id))
+                    position += len(rows)
+                sources = [row for _, row in moves]
+                tmp_paths = [mapped.copy_rows(sources, capacity) for mapped in self._files()]
+                # rows only ever move down, in ascending order, so no move hits a row that is still in use
+                self._conn.executemany("UPDATE chunks SET row = ? WHERE row = ?", moves)
+                self._conn.execute("DELETE FROM documents WHERE doc_id NOT IN (SELECT doc_id FROM chunks)")
+                self._conn.executemany("UPDATE documents SET start = ?, end = ? WHERE doc_id = ?", ranges)
+                self._conn.execute("DELETE FROM deleted")
+                self._conn.execute("UPDATE meta SET value = ? WHERE key = 'rows'", (str(position),))
+
+            for mapped, tmp_path in zip(self._files(), tmp_paths):
+                mapped.replace(tmp_path)
+            self._capacity = self._vectors.capacity
+            self._rows = position
+            self._deleted = np.zeros(self._capacity, dtype=bool)
+            self._deleted_count = 0
+            self._generation += 1
+            self._index = None
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+            self._maybe_build_index()
+        logger.info(f"Vacuumed mmap vector store: reclaimed {reclaimed} rows, {position} remain")
+        return reclaimed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': self.name,
+                'chunks': self.count(),
+                'rows': self._rows,
+                'deleted': self._deleted_count,
+                'dtype': self.dtype.name,
+                'bytes_per_vector': self._vectors.row_bytes + (self._scales.row_bytes if self._scales else 0),
+                'rescore': self.rescore,
+                'file_mb': round(sum(os.path.getsize(mapped.path) for mapped in self._files()) / 1024 ** 2, 1),
+                'index': None if self._index is None else {
+                    'nlist': self._index.nlist,
+                    'nprobe': self.nprobe,
+                    'indexed_rows': self._index.trained_rows,
+                    'unindexed_rows': self._rows - self._index.trained_rows
+                }
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            for mapped in self._files():
+                mapped.flush()
+            self._conn.close()
+
+
+def get_vector_store(backend: str = "chroma", path: str = "./chroma_storage", **kwargs) -> VectorStore:
+    """
+    Create a vector store for the configured backend
+
+    Parameters:
+        backend (str): 'chroma' (ChromaDB collection) or 'mmap' (in-process memory-mapped matrix)
+        path (str): Storage directory
+
+    Returns:
+        VectorStore: Vector store instance
+    """
+    if backend == "chroma":
+        return ChromaVectorStore(path, **kwargs)
+    if backend == "mmap":
+        return MmapVectorStore(path, **kwargs)
+    raise ValueError(f"Unknown vector store backend: {backend}")
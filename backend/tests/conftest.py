@@ -0,0 +1,113 @@
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+# modules are imported as `modules.x`, relative to backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubSentenceTransformer:
+    """Stands in for the embedding model: fixed-size vectors derived from the text, no download."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 384
+
+    def encode(self, texts, **kwargs):
+        vectors = np.zeros((len(texts), 384), dtype=np.float32)
+        for row, text in enumerate(texts):
+            vectors[row, hash(text) % 384] = 1.0
+        return vectors
+
+
+class StubTextSplitter:
+    def __init__(self, chunk_size: int = 500, **kwargs):
+        self.chunk_size = chunk_size
+
+    def split_text(self, text: str):
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+
+
+class StubPromptTemplate:
+    def __init__(self, template: str):
+        self.template = template
+
+    @classmethod
+    def from_template(cls, template: str) -> "StubPromptTemplate":
+        return cls(template)
+
+    def format(self, **kwargs) -> str:
+        return self.template.format(**kwargs)
+
+
+def stub_modules():
+    """Stand-ins for the model and LLM tooling packages main imports at load time."""
+    def module(name, **attrs):
+        stub = types.ModuleType(name)
+        stub.__dict__.update(attrs)
+        return stub
+
+    return {
+        'sentence_transformers': module('sentence_transformers', SentenceTransformer=StubSentenceTransformer),
+        'langchain': module('langchain'),
+        'langchain.text_splitter': module('langchain.text_splitter',
+                                          RecursiveCharacterTextSplitter=StubTextSplitter),
+        'langchain.prompts': module('langchain.prompts', PromptTemplate=StubPromptTemplate),
+        'langchain_core': module('langchain_core'),
+        'langchain_core.prompts': module('langchain_core.prompts', PromptTemplate=StubPromptTemplate),
+        'nest_asyncio': module('nest_asyncio', apply=lambda *args, **kwargs: None),
+    }
+
+
+@pytest.fixture(scope="session")
+def main(tmp_path_factory):
+    """
+    The FastAPI app module, imported against throwaway stores, the fake model
+    and the in-process vector store. The embedding model and LLM tooling are
+    replaced by stand-ins, so it imports without them installed (and without
+    downloading a model when they are).
+    """
+    data = tmp_path_factory.mktemp("data")
+    (data / "chromadb_config.yaml").write_text("collection_name: test_papers\n")
+    env = {
+        'LLM_PROVIDER': 'fake',
+        'VECTOR_STORE_BACKEND': 'mmap',
+        'MMAP_VECTOR_STORE_PATH': str(data / 'vectors'),
+        'PAPER_STORE_PATH': str(data / 'papers.db'),
+        'LLM_CACHE_PATH': str(data / 'llm_cache.db'),
+        'LLM_CACHE_BYPASS': 'true',
+        'JOB_STORE_PATH': str(data / 'jobs.db'),
+        'LEXICAL_INDEX_PATH': str(data / 'lexical_index.db'),
+        'PARSE_CACHE_DIR': str(data / 'parsed'),
+        'PDF_CACHE_DIR': str(data / 'pdfs'),
+        'PDF_PARSER': 'local',
+    }
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in env.items():
+            mp.setenv(name, value)
+        for name, stub in stub_modules().items():
+            mp.setitem(sys.modules, name, stub)
+        mp.chdir(data)
+        from modules.config import get_settings
+        get_settings.cache_clear()
+        # modules that bind the stand-ins are imported afresh here and put back as they were afterwards
+        rebound = ('main', 'modules.embeddings', 'modules.summarization', 'modules.data_extractor',
+                   'modules.pipeline')
+        previous = {name: sys.modules.pop(name, None) for name in rebound}
+        try:
+            import main
+        finally:
+            for name, module in previous.items():
+                if module is None:
+                    sys.modules.pop(name, None)
+                else:
+                    sys.modules[name] = module
+            get_settings.cache_clear()
+    yield main
+    main.llm_cache.close()
+    main.paper_store.close()
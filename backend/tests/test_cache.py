@@ -0,0 +1,56 @@
+from modules.cache import LRUCache
+
+
+def test_set_is_dropped_after_an_invalidation_since_the_generation_was_read():
+    cache = LRUCache(max_entries=10)
+    generation = cache.generation
+    cache.invalidate(lambda key: False)
+
+    cache.set('query', ['stale'], generation=generation)
+
+    assert cache.get('query') is None
+
+
+def test_set_with_the_current_generation_is_kept():
+    cache = LRUCache(max_entries=10)
+    cache.set('other', 1)
+
+    cache.set('query', ['fresh'], generation=cache.generation)
+
+    assert cache.get('query') == ['fresh']
+
+
+def test_clear_starts_a_new_generation():
+    cache = LRUCache(max_entries=10)
+    generation = cache.generation
+    cache.clear()
+
+    cache.set('query', ['stale'], generation=generation)
+
+    assert len(cache) == 0
+
+
+def test_search_result_stored_during_an_invalidation_is_not_cached(main, monkeypatch):
+    manager = main.embeddings_manager
+    query = manager.vector_store.query
+
+    def query_while_a_paper_is_stored(*args, **kwargs):
+        results = query(*args, **kwargs)
+        manager.invalidate_search_cache(manager.generate_doc_id("http://arxiv.org/abs/2411.09566v1"))
+        return results
+
+    monkeypatch.setattr(manager.vector_store, "query", query_while_a_paper_is_stored)
+    manager.search_cache.clear()
+
+    manager.search_similar_chunks("stellar flares", hybrid=False)
+    assert len(manager.search_cache) == 0
+
+    monkeypatch.undo()
+    manager.search_similar_chunks("stellar flares", hybrid=False)
+    assert len(manager.search_cache) == 1
+
+
+def test_search_results_are_sized_in_bytes(main):
+    results = [{'chunk_text': 'é' * 100, 'distance': 0.1, 'doc_id': 'd', 'paper_url': 'u'}]
+
+    assert main.embeddings_manager.search_cache.sizeof(results) == 200 + 256
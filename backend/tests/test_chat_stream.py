@@ -0,0 +1,73 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from modules.chat import Chat
+from modules.llm import FakeProvider
+
+CHUNKS = [
+    {'chunk_text': 'Phase change materials store latent heat.', 'distance': 0.12,
+     'doc_id': 'http://arxiv.org/abs/2411.09566v1_0', 'paper_url': 'http://arxiv.org/abs/2411.09566v1'},
+    {'chunk_text': 'Nano-enhanced media retain more energy.', 'distance': 0.31,
+     'doc_id': 'http://arxiv.org/abs/2411.09567v1_3', 'paper_url': 'http://arxiv.org/abs/2411.09567v1'},
+]
+RESPONSE = "Latent heat storage with phase change materials is the main advance."
+
+
+class FailingProvider(FakeProvider):
+    def stream(self, prompt, timeout=None):
+        yield "Latent "
+        raise RuntimeError("model went away")
+
+
+@pytest.fixture
+def client(main, monkeypatch):
+    searches = []
+
+    def search_similar_chunks(query, top_k=5, url="", hybrid=None):
+        searches.append(query)
+        return CHUNKS[:top_k]
+
+    monkeypatch.setattr(main.embeddings_manager, "search_similar_chunks", search_similar_chunks)
+    monkeypatch.setattr(main, "chat", Chat(model_name="fake", provider=FakeProvider(response=RESPONSE)))
+    client = TestClient(main.app)
+    client.searches = searches
+    return client
+
+
+def read_events(response):
+    return [json.loads(line) for line in response.iter_lines() if line]
+
+
+def test_streams_chunks_then_tokens_then_done(client):
+    with client.stream("POST", "/chat/stream", json={"query": "thermal storage", "top_k": 2}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        events = read_events(response)
+
+    assert events[0] == {"type": "chunks", "similar_chunks": [dict(chunk, score=None) for chunk in CHUNKS]}
+    tokens = events[1:-1]
+    assert len(tokens) > 1
+    assert all(event["type"] == "token" for event in tokens)
+    assert "".join(event["text"] for event in tokens) == RESPONSE
+    assert events[-1] == {"type": "done"}
+    assert client.searches == ["thermal storage"]
+
+
+def test_model_failure_ends_the_stream_with_an_error_event(client, main, monkeypatch):
+    monkeypatch.setattr(main, "chat", Chat(model_name="fake", provider=FailingProvider()))
+
+    with client.stream("POST", "/chat/stream", json={"query": "thermal storage"}) as response:
+        assert response.status_code == 200
+        events = read_events(response)
+
+    assert [event["type"] for event in events] == ["chunks", "token", "error"]
+    assert "model went away" in events[-1]["detail"]
+
+
+def test_empty_query_is_rejected_before_searching(client):
+    response = client.post("/chat/stream", json={"query": ""})
+
+    assert response.status_code == 422
+    assert client.searches == []
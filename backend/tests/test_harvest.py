@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+import modules.api
+from modules.api import ArxivHarvester
+from modules.jobs import JobStore
+from modules.store import JSONPaperStore, SQLitePaperStore
+
+
+def paper(number: int, published: str) -> dict:
+    link = f"http://arxiv.org/abs/2411.{number:05d}v1"
+    return {'id': link, 'link': link, 'title': f"Paper {number}", 'authors': [], 'published': published,
+            'abstract': "", 'primary_category': 'astro-ph.SR'}
+
+
+def ids(papers) -> list:
+    return [p['link'].rsplit('/', 1)[-1] for p in papers]
+
+
+class Feed:
+    """Stands in for the arXiv listing: the papers published so far, newest first."""
+
+    def __init__(self, monkeypatch):
+        self.papers = []
+        monkeypatch.setattr(modules.api, "iter_search", self.search)
+
+    def search(self, *args, **kwargs):
+        yield from self.papers
+
+    def publish(self, *papers):
+        self.papers = sorted(self.papers + list(papers), key=lambda p: p['published'], reverse=True)
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        store = SQLitePaperStore(str(tmp_path / "papers.db"))
+    else:
+        store = JSONPaperStore(str(tmp_path / "results.json"), str(tmp_path / "summaries.json"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    return Feed(monkeypatch)
+
+
+def test_failed_paper_is_retried_in_the_next_pass(store, feed):
+    harvester = ArxivHarvester(store, delay=0)
+    feed.publish(paper(1, "2024-11-01T00:00:00Z"), paper(2, "2024-11-02T00:00:00Z"), paper(3, "2024-11-03T00:00:00Z"))
+
+    first = harvester.harvest_new('astro-ph.SR', commit=False)
+    assert ids(first) == ['2411.00003v1', '2411.00002v1', '2411.00001v1']
+    # the oldest paper fails, the watermark still moves to the newest one
+    assert harvester.record_outcome('astro-ph.SR', first, {'2411.00001v1': "PDF download timed out"}) == []
+    assert store.get_watermark('astro-ph.SR')['published'] == "2024-11-03T00:00:00Z"
+
+    feed.publish(paper(4, "2024-11-04T00:00:00Z"))
+    second = harvester.harvest_new('astro-ph.SR', commit=False)
+    assert ids(second) == ['2411.00004v1', '2411.00001v1']
+
+    harvester.record_outcome('astro-ph.SR', second, {})
+    assert store.get_harvest_failures('astro-ph.SR') == []
+    assert harvester.harvest_new('astro-ph.SR', commit=False) == []
+
+
+def test_paper_is_given_up_on_after_max_attempts(store, feed):
+    harvester = ArxivHarvester(store, delay=0, max_attempts=2)
+    feed.publish(paper(1, "2024-11-01T00:00:00Z"), paper(2, "2024-11-02T00:00:00Z"))
+
+    first = harvester.harvest_new('astro-ph.SR', commit=False)
+    assert harvester.record_outcome('astro-ph.SR', first, {'2411.00001v1': "withdrawn"}) == []
+
+    second = harvester.harvest_new('astro-ph.SR', commit=False)
+    assert ids(second) == ['2411.00001v1']
+    assert harvester.record_outcome('astro-ph.SR', second, {'2411.00001v1': "withdrawn"}) == ['2411.00001v1']
+
+    assert harvester.harvest_new('astro-ph.SR', commit=False) == []
+    assert [failure['attempts'] for failure in store.get_harvest_failures('astro-ph.SR')] == [2]
+
+
+def test_committed_pass_hands_off_the_retried_papers(store, feed):
+    harvester = ArxivHarvester(store, delay=0)
+    feed.publish(paper(1, "2024-11-01T00:00:00Z"))
+    harvester.record_outcome('astro-ph.SR', harvester.harvest_new('astro-ph.SR', commit=False),
+                             {'2411.00001v1': "rate limited"})
+
+    assert ids(harvester.harvest_new('astro-ph.SR')) == ['2411.00001v1']
+    assert harvester.harvest_new('astro-ph.SR') == []
+
+
+def test_incremental_job_picks_up_a_paper_that_failed_once(main, feed, monkeypatch, tmp_path):
+    failing = {'2411.00011v1'}
+    processed = []
+
+    async def process(papers, on_progress=None):
+        results = []
+        for p in papers:
+            processed.append(p['link'].rsplit('/', 1)[-1])
+            if processed[-1] in failing:
+                results.append(RuntimeError("429 Too Many Requests"))
+            else:
+                results.append(dict(p, summary="summary", insights="insights"))
+        return results
+
+    monkeypatch.setattr(main.pipeline, "process", process)
+    jobs = JobStore(str(tmp_path / "jobs.db"))
+    params = {'category': 'astro-ph.EP', 'incremental': True}
+
+    feed.publish(paper(11, "2024-11-01T00:00:00Z"), paper(12, "2024-11-02T00:00:00Z"))
+    note = asyncio.run(main.run_processing_job(jobs.create_job(params), params, jobs))
+    assert note.startswith("1 of 2 papers failed")
+    assert processed == ['2411.00012v1', '2411.00011v1']
+
+    failing.clear()
+    processed.clear()
+    feed.publish(paper(13, "2024-11-03T00:00:00Z"))
+    assert asyncio.run(main.run_processing_job(jobs.create_job(params), params, jobs)) is None
+    assert processed == ['2411.00013v1', '2411.00011v1']
+    assert main.paper_store.get_harvest_failures('astro-ph.EP') == []
+    jobs.close()
@@ -0,0 +1,69 @@
+import pytest
+
+pytest.importorskip("pypdf")
+
+from modules.parsing import LocalPDFParser
+
+
+def write_pdf(path, pages):
+    """A minimal PDF with one line of Helvetica text per page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+@pytest.fixture
+def parser():
+    parser = LocalPDFParser(workers=2, pages_per_task=4)
+    yield parser
+    parser.close()
+
+
+def test_pages_come_back_in_order_across_workers(parser, tmp_path):
+    pdf = tmp_path / "paper.pdf"
+    write_pdf(pdf, [f"Text of page {number}" for number in range(1, 11)])
+
+    documents = parser.parse(str(pdf))
+
+    assert [document.metadata['page'] for document in documents] == list(range(1, 11))
+    assert [document.text for document in documents] == [f"Text of page {number}" for number in range(1, 11)]
+    assert parser._page_ranges(10) == [(0, 5), (5, 10)]
+
+
+def test_short_paper_is_extracted_without_the_pool(parser, tmp_path):
+    pdf = tmp_path / "letter.pdf"
+    write_pdf(pdf, ["CONCLUSIONS", "Text"])
+
+    documents = parser.parse(str(pdf))
+
+    assert [document.text for document in documents] == ["# CONCLUSIONS", "Text"]
+    assert parser._executor is None
+
+
+def test_close_shuts_the_pool_down(parser, tmp_path):
+    pdf = tmp_path / "paper.pdf"
+    write_pdf(pdf, [f"Page {number}" for number in range(1, 9)])
+
+    parser.parse(str(pdf))
+    assert parser._executor is not None
+    parser.close()
+    assert parser._executor is None
+    # the pool is started again on demand
+    assert len(parser.parse(str(pdf))) == 8
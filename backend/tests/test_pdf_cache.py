@@ -0,0 +1,179 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from modules.pdf_cache import PDFCache
+
+
+class StubArxiv:
+    """Serves /pdf/<id>.pdf from a dict, with ETags and 304s on a matching If-None-Match."""
+
+    def __init__(self):
+        self.pdfs = {}
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                arxiv_id = self.path[len('/pdf/'):-len('.pdf')]
+                stub.requests.append((arxiv_id, self.headers.get('If-None-Match')))
+                if arxiv_id not in stub.pdfs:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body, etag = stub.pdfs[arxiv_id]
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/pdf')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/pdf"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def publish(self, arxiv_id, body, etag):
+        self.pdfs[arxiv_id] = (body, etag)
+
+
+@pytest.fixture
+def arxiv():
+    stub = StubArxiv()
+    stub.thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+@pytest.fixture
+def make_cache(tmp_path, arxiv):
+    sessions = []
+
+    def make(**kwargs):
+        session = requests.Session()
+        sessions.append(session)
+        return PDFCache(directory=str(tmp_path / "pdfs"), base_url=arxiv.base_url, session=session, **kwargs)
+
+    yield make
+    for session in sessions:
+        session.close()
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_versioned_id_is_served_from_disk_after_the_first_download(arxiv, make_cache):
+    arxiv.publish('2411.09566v1', b'%PDF-1 v1', '"a"')
+    cache = make_cache()
+
+    first = cache.fetch('2411.09566v1')
+    second = cache.fetch('https://arxiv.org/abs/2411.09566v1')
+
+    assert first == second
+    assert read(first) == b'%PDF-1 v1'
+    assert arxiv.requests == [('2411.09566v1', None)]
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'revalidated': 0, 'evictions': 0}
+
+
+def test_unversioned_id_revalidates_with_etag(arxiv, make_cache):
+    arxiv.publish('2411.09566', b'%PDF-1 latest', '"a"')
+    cache = make_cache()
+
+    path = cache.fetch('2411.09566')
+    assert cache.fetch('2411.09566') == path
+
+    assert arxiv.requests == [('2411.09566', None), ('2411.09566', '"a"')]
+    assert read(path) == b'%PDF-1 latest'
+    assert cache.stats()['revalidated'] == 1
+
+
+def test_changed_etag_downloads_the_new_copy(arxiv, make_cache):
+    arxiv.publish('2411.09566', b'%PDF-1 old', '"a"')
+    cache = make_cache()
+    cache.fetch('2411.09566')
+
+    arxiv.publish('2411.09566', b'%PDF-1 new', '"b"')
+    path = cache.fetch('2411.09566')
+
+    assert read(path) == b'%PDF-1 new'
+    assert cache.stats()['misses'] == 2
+    assert cache.stats()['revalidated'] == 0
+
+
+def test_revalidate_after_expires_versioned_entries(arxiv, make_cache):
+    arxiv.publish('2411.09566v1', b'%PDF-1 v1', '"a"')
+    cache = make_cache(revalidate_after=0)
+
+    cache.fetch('2411.09566v1')
+    cache.fetch('2411.09566v1')
+
+    assert arxiv.requests == [('2411.09566v1', None), ('2411.09566v1', '"a"')]
+    assert cache.stats()['revalidated'] == 1
+
+
+def test_invalidate_forces_a_fresh_download(arxiv, make_cache):
+    arxiv.publish('2411.09566v1', b'%PDF-1 v1', '"a"')
+    cache = make_cache()
+
+    cache.fetch('2411.09566v1')
+    cache.invalidate('2411.09566v1')
+    cache.fetch('2411.09566v1')
+
+    assert arxiv.requests == [('2411.09566v1', None), ('2411.09566v1', None)]
+    assert cache.stats()['misses'] == 2
+
+
+def test_evicts_least_recently_used_pdf_over_budget(arxiv, make_cache):
+    for arxiv_id in ('0001.00001v1', '0001.00002v1', '0001.00003v1'):
+        arxiv.publish(arxiv_id, b'x' * 100, f'"{arxiv_id}"')
+    cache = make_cache(max_bytes=250)
+
+    first = cache.fetch('0001.00001v1')
+    second = cache.fetch('0001.00002v1')
+    # touch the first PDF so the second becomes the least recently used
+    cache.fetch('0001.00001v1')
+    third = cache.fetch('0001.00003v1')
+
+    assert cache.stats()['evictions'] == 1
+    assert os.path.exists(first) and os.path.exists(third)
+    assert not os.path.exists(second)
+
+
+def test_pdf_in_use_is_not_evicted(arxiv, make_cache):
+    for arxiv_id in ('0001.00001v1', '0001.00002v1', '0001.00003v1'):
+        arxiv.publish(arxiv_id, b'x' * 100, f'"{arxiv_id}"')
+    cache = make_cache(max_bytes=150)
+
+    with cache.checkout('0001.00001v1') as in_use:
+        # another worker's downloads push the cache over budget while the first PDF is being parsed
+        second = cache.fetch('0001.00002v1')
+        cache.fetch('0001.00003v1')
+        assert os.path.exists(in_use)
+        assert not os.path.exists(second)
+
+    cache.fetch('0001.00002v1')
+    assert not os.path.exists(in_use)
+    assert cache._in_use == {}
+
+
+def test_pin_is_dropped_when_the_download_fails(arxiv, make_cache):
+    cache = make_cache()
+
+    with pytest.raises(requests.HTTPError):
+        cache.fetch('0001.99999v1', pin=True)
+
+    assert cache._in_use == {}
@@ -0,0 +1,36 @@
+import re
+
+from modules.sections import count_in_text_citations, count_references
+
+# mostly author-year citations, whose years also appear as bare years in the text
+PARAGRAPH = (
+    "Thermal storage has been studied widely (Smith et al., 2020; Jones, 2019). Phase change "
+    "materials were first characterised in 2004 and revisited by (Lee, 2021), (Garcia et al., 2022) "
+    "and (Chen, 2020b), building on surveys from 2018 and 2015 [1]. Later work (Patel, 2023) "
+    "and [2] confirmed the 2020 results."
+)
+
+
+def count_separately(text: str) -> int:
+    """The fallback as it was before the patterns were precompiled: each style scanned on its own."""
+    patterns = [
+        r'\[\d+\]',
+        r'\(\w+\s*(?:et\s+al\.?)?\s*,\s*\d{4}\w?\)',
+        r'(?<!\w)(?:20)\d{2}[a-z]?(?!\d)'
+    ]
+    return max(len(set(re.findall(pattern, text))) for pattern in patterns)
+
+
+def test_in_text_count_matches_the_separate_scans():
+    # bare years: 2020, 2019, 2004, 2021, 2022, 2020b, 2018, 2015, 2023
+    assert count_in_text_citations(PARAGRAPH) == count_separately(PARAGRAPH) == 9
+
+
+def test_years_inside_author_year_citations_are_counted():
+    text = "As in (Smith et al., 2020), (Jones, 2019) and (Lee, 2021), we use the 2018 release."
+
+    assert count_in_text_citations(text) == count_separately(text) == 4
+
+
+def test_references_without_a_bibliography_fall_back_to_in_text_citations():
+    assert count_references(PARAGRAPH) == 9